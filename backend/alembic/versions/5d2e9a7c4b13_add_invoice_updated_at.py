@@ -0,0 +1,28 @@
+"""Add updated_at to invoices
+
+Revision ID: 5d2e9a7c4b13
+Revises: 3b8f0d6a1c42
+Create Date: 2026-10-18 14:22:48.905317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2e9a7c4b13'
+down_revision: Union[str, None] = '3b8f0d6a1c42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('invoices', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    # Для существующих счетов версией служит время создания
+    op.execute("UPDATE invoices SET updated_at = created_at")
+
+
+def downgrade() -> None:
+    op.drop_column('invoices', 'updated_at')
@@ -0,0 +1,72 @@
+"""Add hot-path composite and partial indexes
+
+Revision ID: 6c515360552e
+Revises: ed22ad3b588d
+Create Date: 2026-10-18 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6c515360552e'
+down_revision: Union[str, None] = 'ed22ad3b588d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (имя индекса, таблица, колонки, условие частичного индекса)
+HOT_PATH_INDEXES = [
+    # GET /orders/assigned, фильтр technician_id (+ status) в GET /orders/
+    ('ix_orders_technician_id_status', 'orders', ['technician_id', 'status'], 'technician_id IS NOT NULL'),
+    # GET /orders/my, фильтр client_id в GET /orders/
+    ('ix_orders_client_id_created_at', 'orders', ['client_id', 'created_at'], None),
+    # Подсчеты по статусу за период в отчетах, фильтр status в GET /orders/
+    ('ix_orders_status_created_at', 'orders', ['status', 'created_at'], None),
+    # Окна дат в отчетах и сортировка списков по (created_at, id)
+    ('ix_orders_created_at_id', 'orders', ['created_at', 'id'], None),
+    # Фильтр start_date/end_date в GET /orders/
+    ('ix_orders_preferred_start_time_id', 'orders', ['preferred_start_time', 'id'], None),
+    # /reports/employee-performance: только завершенные заказы
+    ('ix_orders_completed_technician_id_end_time', 'orders', ['technician_id', 'actual_end_time'], "status = 'completed'"),
+    # История сообщений чата
+    ('ix_messages_conversation_id_sent_at', 'messages', ['conversation_id', 'sent_at'], None),
+    # Уведомления пользователя и отдельно непрочитанные
+    ('ix_notifications_user_id_is_read', 'notifications', ['user_id', 'is_read'], None),
+    ('ix_notifications_user_id_unread', 'notifications', ['user_id', 'created_at'], 'is_read = false'),
+    # Медиафайлы и платежи заказа
+    ('ix_media_order_id', 'media', ['order_id'], None),
+    ('ix_payments_order_id', 'payments', ['order_id'], None),
+    # Сметы клиента и техника
+    ('ix_estimates_client_id', 'estimates', ['client_id'], None),
+    ('ix_estimates_technician_id', 'estimates', ['technician_id'], None),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in HOT_PATH_INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(where) if where else None,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in reversed(HOT_PATH_INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                if_exists=True,
+                postgresql_concurrently=True,
+            )
@@ -0,0 +1,115 @@
+"""Partition messages and notifications by month
+
+Revision ID: 7e5031ac21f7
+Revises: 6c515360552e
+Create Date: 2026-10-18 11:40:07.552183
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.partitions import create_default_partition, ensure_partitions
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e5031ac21f7'
+down_revision: Union[str, None] = '6c515360552e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Таблицы и ключи секционирования на момент этой ревизии. Не берем PARTITIONED_TABLES из
+# приложения: позже туда добавляются таблицы, которые создаются более поздними ревизиями
+TABLES = (
+    ('messages', 'sent_at'),
+    ('notifications', 'created_at'),
+)
+
+# Внешние ключи и индексы, которые нужно пересоздать на секционированной таблице
+FOREIGN_KEYS = {
+    'messages': [
+        ('messages_conversation_id_fkey', 'conversation_id', 'conversations'),
+        ('messages_sender_id_fkey', 'sender_id', 'users'),
+    ],
+    'notifications': [
+        ('notifications_user_id_fkey', 'user_id', 'users'),
+    ],
+}
+
+INDEXES = {
+    'messages': [
+        ('ix_messages_id', ['id'], None),
+        ('ix_messages_conversation_id_sent_at', ['conversation_id', 'sent_at'], None),
+    ],
+    'notifications': [
+        ('ix_notifications_id', ['id'], None),
+        ('ix_notifications_user_id_is_read', ['user_id', 'is_read'], None),
+        ('ix_notifications_user_id_unread', ['user_id', 'created_at'], 'is_read = false'),
+    ],
+}
+
+
+def create_indexes_and_keys(table: str):
+    for name, column, referred_table in FOREIGN_KEYS[table]:
+        op.create_foreign_key(name, table, referred_table, [column], ['id'])
+    for name, columns, where in INDEXES[table]:
+        op.create_index(name, table, columns, postgresql_where=sa.text(where) if where else None)
+
+
+def swap_tables(table: str, new_table: str):
+    # Последовательность id переживает удаление старой таблицы и переходит к новой
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY NONE")
+    op.execute(f"DROP TABLE {table}")
+    op.execute(f"ALTER TABLE {new_table} RENAME TO {table}")
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    for table, key in TABLES:
+        new_table = f'{table}_partitioned'
+
+        # Ключ секционирования не может быть NULL
+        op.execute(f"UPDATE {table} SET {key} = now() WHERE {key} IS NULL")
+        op.execute(
+            f"CREATE TABLE {new_table} (LIKE {table} INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE ({key})"
+        )
+        op.execute(f"ALTER TABLE {new_table} ALTER COLUMN {key} SET NOT NULL")
+        # Первичный ключ секционированной таблицы обязан включать ключ секционирования
+        op.execute(f"ALTER TABLE {new_table} ADD CONSTRAINT {new_table}_pkey PRIMARY KEY (id, {key})")
+
+        # Секции от самого старого месяца с данными до PARTITION_MONTHS_AHEAD месяцев вперед
+        oldest = connection.execute(sa.text(f"SELECT min({key}) FROM {table}")).scalar()
+        ensure_partitions(connection, new_table, start=oldest)
+        create_default_partition(connection, new_table)
+
+        op.execute(f"INSERT INTO {new_table} SELECT * FROM {table}")
+        swap_tables(table, new_table)
+        op.execute(f"ALTER TABLE {table} RENAME CONSTRAINT {new_table}_pkey TO {table}_pkey")
+        create_indexes_and_keys(table)
+
+        # Секции получили имена по временной таблице; приводим их к имени основной
+        partitions = connection.execute(sa.text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :table"
+        ), {'table': table}).scalars().all()
+        for name in partitions:
+            op.execute(f"ALTER TABLE {name} RENAME TO {name.replace(new_table, table, 1)}")
+
+
+def downgrade() -> None:
+    for table, key in TABLES:
+        new_table = f'{table}_unpartitioned'
+
+        op.execute(f"CREATE TABLE {new_table} (LIKE {table} INCLUDING DEFAULTS)")
+        op.execute(f"ALTER TABLE {new_table} ALTER COLUMN {key} DROP NOT NULL")
+        op.execute(f"INSERT INTO {new_table} SELECT * FROM {table}")
+        # DROP секционированной таблицы удаляет и все ее секции
+        swap_tables(table, new_table)
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id)")
+        create_indexes_and_keys(table)
@@ -0,0 +1,71 @@
+"""Add full-text and trigram search on orders
+
+Revision ID: 8a4c2e61f0d9
+Revises: 5d2e9a7c4b13
+Create Date: 2026-10-18 15:03:17.220641
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.db.search import SEARCH_CONFIG
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a4c2e61f0d9'
+down_revision: Union[str, None] = '5d2e9a7c4b13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Взвешенный документ заказа: тип услуги (A), адрес (B), описание (C)
+SEARCH_DOCUMENT = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({{row}}.service_type, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({{row}}.address, '')), 'B') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({{row}}.description, '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column('orders', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+
+    # Триггер пересчитывает документ только при изменении полей, по которым идет поиск
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION orders_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {SEARCH_DOCUMENT.format(row='NEW')};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER orders_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF service_type, address, description ON orders
+        FOR EACH ROW EXECUTE FUNCTION orders_search_vector_update()
+    """)
+    op.execute(f"UPDATE orders SET search_vector = {SEARCH_DOCUMENT.format(row='orders')}")
+
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_orders_search_vector', 'orders', ['search_vector'],
+            unique=False, if_not_exists=True, postgresql_concurrently=True, postgresql_using='gin',
+        )
+        op.create_index(
+            'ix_orders_address_trgm', 'orders', ['address'],
+            unique=False, if_not_exists=True, postgresql_concurrently=True, postgresql_using='gin',
+            postgresql_ops={'address': 'gin_trgm_ops'},
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_orders_address_trgm', table_name='orders', if_exists=True, postgresql_concurrently=True)
+        op.drop_index('ix_orders_search_vector', table_name='orders', if_exists=True, postgresql_concurrently=True)
+    op.execute("DROP TRIGGER IF EXISTS orders_search_vector_trigger ON orders")
+    op.execute("DROP FUNCTION IF EXISTS orders_search_vector_update()")
+    op.drop_column('orders', 'search_vector')
@@ -0,0 +1,61 @@
+"""Add outbox_events table
+
+Revision ID: 9f1b7d3e2a65
+Revises: 8a4c2e61f0d9
+Create Date: 2026-10-18 16:11:54.371902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.outbox import OUTBOX_CHANNEL
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9f1b7d3e2a65'
+down_revision: Union[str, None] = '8a4c2e61f0d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('outbox_events',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('aggregate_type', sa.String(length=50), nullable=False),
+    sa.Column('aggregate_id', sa.Integer(), nullable=False),
+    sa.Column('event_type', sa.String(length=100), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('published_at', sa.DateTime(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_outbox_events_published_at'), 'outbox_events', ['published_at'], unique=False)
+    op.create_index('ix_outbox_events_unpublished', 'outbox_events', ['id'], unique=False,
+                    postgresql_where=sa.text('published_at IS NULL'))
+
+    # Один NOTIFY на оператор INSERT будит relay сразу после COMMIT транзакции с событием
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION outbox_events_notify() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('{OUTBOX_CHANNEL}', '');
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER outbox_events_notify_trigger
+        AFTER INSERT ON outbox_events
+        FOR EACH STATEMENT EXECUTE FUNCTION outbox_events_notify()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS outbox_events_notify_trigger ON outbox_events")
+    op.execute("DROP FUNCTION IF EXISTS outbox_events_notify()")
+    op.drop_index('ix_outbox_events_unpublished', table_name='outbox_events')
+    op.drop_index(op.f('ix_outbox_events_published_at'), table_name='outbox_events')
+    op.drop_table('outbox_events')
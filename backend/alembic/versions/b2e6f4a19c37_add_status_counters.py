@@ -0,0 +1,36 @@
+"""Add status_counters table
+
+Revision ID: b2e6f4a19c37
+Revises: 9f1b7d3e2a65
+Create Date: 2026-10-18 17:02:19.604518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.db.counters import rebuild_status_counters
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2e6f4a19c37'
+down_revision: Union[str, None] = '9f1b7d3e2a65'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('status_counters',
+    sa.Column('entity', sa.String(length=20), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('entity', 'day', 'status')
+    )
+    # Начальные значения по существующим заказам и сметам
+    rebuild_status_counters(op.get_bind())
+
+
+def downgrade() -> None:
+    op.drop_table('status_counters')
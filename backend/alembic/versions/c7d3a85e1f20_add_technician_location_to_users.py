@@ -0,0 +1,31 @@
+"""Add technician location columns to users
+
+Revision ID: c7d3a85e1f20
+Revises: b2e6f4a19c37
+Create Date: 2026-10-18 17:48:36.215077
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d3a85e1f20'
+down_revision: Union[str, None] = 'b2e6f4a19c37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Колонки были удалены в ed22ad3b588d, но POST /technicians/{id}/location продолжал их использовать
+    op.add_column('users', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('users', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('users', sa.Column('location_updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'location_updated_at')
+    op.drop_column('users', 'longitude')
+    op.drop_column('users', 'latitude')
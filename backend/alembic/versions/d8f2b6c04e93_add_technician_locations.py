@@ -0,0 +1,44 @@
+"""Add partitioned technician_locations table
+
+Revision ID: d8f2b6c04e93
+Revises: c7d3a85e1f20
+Create Date: 2026-10-18 18:20:51.730642
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.db.partitions import create_default_partition, ensure_partitions
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8f2b6c04e93'
+down_revision: Union[str, None] = 'c7d3a85e1f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Первичный и уникальный ключи секционированной таблицы обязаны включать ключ секционирования
+    op.execute("""
+        CREATE TABLE technician_locations (
+            id BIGSERIAL NOT NULL,
+            technician_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            latitude DOUBLE PRECISION NOT NULL,
+            longitude DOUBLE PRECISION NOT NULL,
+            accuracy DOUBLE PRECISION,
+            recorded_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            received_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+            CONSTRAINT technician_locations_pkey PRIMARY KEY (id, recorded_at),
+            CONSTRAINT uq_technician_locations_technician_id_recorded_at UNIQUE (technician_id, recorded_at)
+        ) PARTITION BY RANGE (recorded_at)
+    """)
+    connection = op.get_bind()
+    ensure_partitions(connection, 'technician_locations')
+    create_default_partition(connection, 'technician_locations')
+
+
+def downgrade() -> None:
+    # DROP секционированной таблицы удаляет и все ее секции
+    op.drop_table('technician_locations')
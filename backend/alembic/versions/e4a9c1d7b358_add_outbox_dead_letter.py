@@ -0,0 +1,35 @@
+"""Add dead-letter state to outbox_events
+
+Revision ID: e4a9c1d7b358
+Revises: d8f2b6c04e93
+Create Date: 2026-10-18 20:05:12.418903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a9c1d7b358'
+down_revision: Union[str, None] = 'd8f2b6c04e93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('outbox_events', sa.Column('dead_at', sa.DateTime(), nullable=True))
+    op.drop_index('ix_outbox_events_unpublished', table_name='outbox_events')
+    op.create_index('ix_outbox_events_unpublished', 'outbox_events', ['id'], unique=False,
+                    postgresql_where=sa.text('published_at IS NULL AND dead_at IS NULL'))
+    op.create_index('ix_outbox_events_dead', 'outbox_events', ['id'], unique=False,
+                    postgresql_where=sa.text('dead_at IS NOT NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outbox_events_dead', table_name='outbox_events')
+    op.drop_index('ix_outbox_events_unpublished', table_name='outbox_events')
+    op.create_index('ix_outbox_events_unpublished', 'outbox_events', ['id'], unique=False,
+                    postgresql_where=sa.text('published_at IS NULL'))
+    op.drop_column('outbox_events', 'dead_at')
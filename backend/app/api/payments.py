@@ -12,6 +12,7 @@ from app.enums import UserRole
 from datetime import datetime
 from app.core.config import settings
 from app.core.email import send_receipt
+from app.core.order_events import record_order_event, ORDER_PAID
 import paypalrestsdk
 
 # Настройка Stripe API ключа
@@ -116,13 +117,14 @@ def capture_paypal_order(
             created_at=datetime.utcnow()
         )
         db.add(payment)
-        db.commit()
 
-        # Обновление статуса заказа
+        # Платеж, статус заказа и событие outbox — одна транзакция
         order = db.query(Order).filter(Order.id == payment.order_id).first()
         if order and capture.state == 'completed':
+            previous_status = order.status
             order.status = 'paid'
-            db.commit()
+            record_order_event(db, ORDER_PAID, order, previous_status, payment_method=payment.payment_method, amount=payment.amount)
+        db.commit()
 
         # Отправка квитанции по электронной почте
         background_tasks.add_task(
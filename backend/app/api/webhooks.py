@@ -7,6 +7,7 @@ from app.dependencies import get_db
 from sqlalchemy.orm import Session
 from app.models.payment import Payment as PaymentModel
 from app.models.order import Order
+from app.core.order_events import record_order_event, ORDER_PAID
 import json
 from datetime import datetime
 
@@ -51,13 +52,14 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
             created_at=datetime.utcnow()
         )
         db.add(payment)
-        db.commit()
 
-        # Обновляем статус заказа
+        # Платеж, статус заказа и событие outbox — одна транзакция
         order = db.query(Order).filter(Order.id == order_id).first()
         if order:
+            previous_status = order.status
             order.status = 'paid'
-            db.commit()
+            record_order_event(db, ORDER_PAID, order, previous_status, payment_method=payment.payment_method, amount=amount)
+        db.commit()
 
     return {"status": "success"}
 
@@ -85,12 +87,13 @@ async def paypal_webhook(request: Request, db: Session = Depends(get_db)):
             created_at=datetime.utcnow()
         )
         db.add(payment)
-        db.commit()
 
-        # Обновляем статус заказа
+        # Платеж, статус заказа и событие outbox — одна транзакция
         order = db.query(Order).filter(Order.id == order_id).first()
         if order:
+            previous_status = order.status
             order.status = 'paid'
-            db.commit()
+            record_order_event(db, ORDER_PAID, order, previous_status, payment_method=payment.payment_method, amount=amount)
+        db.commit()
 
     return {"status": "success"}
\ No newline at end of file
@@ -1,14 +1,113 @@
 # app/core/config.py
 
 from pydantic import BaseSettings
+from typing import Optional
 import os
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    # URL для асинхронного движка (postgresql+asyncpg://...); если не задан, выводится из DATABASE_URL
+    ASYNC_DATABASE_URL: Optional[str] = None
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # Настройки пула соединений (на каждый процесс uvicorn и на каждый движок)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0  # секунд ожидания свободного соединения
+    DB_POOL_RECYCLE: int = 1800  # секунд жизни соединения до переподключения
+    DB_POOL_PRE_PING: bool = True
+
+    # Read-реплика для отчетов и списков; если не задана, чтение идет с primary
+    DATABASE_REPLICA_URL: Optional[str] = None
+    ASYNC_DATABASE_REPLICA_URL: Optional[str] = None
+    REPLICA_MAX_LAG_SECONDS: float = 5.0  # допустимое отставание реплики
+    REPLICA_LAG_CHECK_INTERVAL: float = 10.0  # как часто перепроверять отставание
+    REPLICA_FALLBACK_TO_PRIMARY: bool = True  # при отставании читать с primary, иначе отвечать 503
+
+    # Подсчет запросов к БД на каждый HTTP-запрос (заголовок Server-Timing и статистика по маршрутам)
+    DB_QUERY_STATS_ENABLED: bool = True
+    DB_QUERY_COUNT_WARNING: int = 50  # логировать запросы, сделавшие больше обращений к БД
+    DB_RAISE_ON_LAZY_LOAD: bool = False  # тестовый режим: ленивая загрузка связей вызывает ошибку (поиск N+1)
+
+    # Помесячное секционирование messages и notifications
+    PARTITION_MONTHS_AHEAD: int = 3  # сколько будущих секций держать созданными
+    PARTITION_MAINTENANCE_INTERVAL_HOURS: float = 24.0
+    PARTITION_ARCHIVE_SCHEMA: Optional[str] = "archive"  # куда переносить отсоединенные секции; None — удалять
+    MESSAGES_RETAIN_MONTHS: int = 24  # 0 — хранить все секции
+    NOTIFICATIONS_RETAIN_MONTHS: int = 6
+    TECHNICIAN_LOCATIONS_RETAIN_MONTHS: int = 3
+
+    # Кэш пользователей для get_current_user (на процесс; сбрасывается через PostgreSQL NOTIFY)
+    IDENTITY_CACHE_SIZE: int = 10000
+    IDENTITY_CACHE_TTL_SECONDS: float = 60.0
+
+    # Хэширование паролей (bcrypt) в отдельном пуле процессов
+    BCRYPT_ROUNDS: int = 12  # хэши с меньшей стоимостью пересчитываются при успешном логине
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 64  # сверх этого запросы получают 503
+
+    # Отзыв токенов (logout, ротация refresh-токенов)
+    TOKEN_REVOCATION_SYNC_SECONDS: float = 60.0
+    TOKEN_REVOCATION_BLOOM_ENABLED: bool = False  # экономит память при сотнях тысяч отозванных токенов
+    TOKEN_REVOCATION_BLOOM_CAPACITY: int = 100000
+    TOKEN_REVOCATION_BLOOM_ERROR_RATE: float = 0.001
+
+    # Redis для состояния, общего для всех воркеров (необязателен)
+    REDIS_URL: Optional[str] = None
+
+    # Ограничение частоты запросов и допуск запросов в воркер
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # memory — в памяти процесса, redis — общий для всех воркеров
+    RATE_LIMIT_DEFAULT_RATE: float = 20.0  # запросов в секунду на пользователя (или IP без токена)
+    RATE_LIMIT_DEFAULT_BURST: int = 40
+    RATE_LIMIT_AUTH_ATTEMPTS: int = 10  # логин, регистрация, сброс пароля — на IP за окно
+    RATE_LIMIT_AUTH_WINDOW_SECONDS: float = 60.0
+    RATE_LIMIT_LOCATION_RATE: float = 1.0  # обновлений местоположения в секунду на техника
+    RATE_LIMIT_LOCATION_BURST: int = 5
+    RATE_LIMIT_MAX_INFLIGHT: int = 256  # одновременных запросов на воркер; 0 — без ограничения
+
+    # Постраничная выдача списков (keyset-курсоры)
+    PAGE_SIZE_DEFAULT: int = 50
+    PAGE_SIZE_MAX: int = 500
+
+    # Массовое создание заказов (POST /orders/bulk)
+    ORDER_BULK_MAX_ORDERS: int = 5000  # заказов в одном запросе
+    ORDER_BULK_BATCH_SIZE: int = 500  # строк в одном INSERT
+    ORDER_BATCH_MAX_ITEMS: int = 1000  # изменений в одном POST /orders/batch-update
+
+    # Потоковая выгрузка заказов (GET /orders/export)
+    EXPORT_YIELD_PER: int = 1000  # строк, читаемых из серверного курсора за раз
+
+    # Пространственный индекс техников (GET /technicians/nearby)
+    TECHNICIAN_INDEX_H3_RESOLUTION: int = 7  # ребро ячейки ~1.2 км
+    NEARBY_RADIUS_KM_DEFAULT: float = 10.0
+    NEARBY_RADIUS_KM_MAX: float = 100.0
+
+    # Пакетная загрузка GPS-точек техников (POST /technicians/{id}/locations)
+    TECHNICIAN_LOCATION_BATCH_MAX: int = 1000  # точек в одном запросе
+    TECHNICIAN_LOCATION_MAX_SKEW_SECONDS: int = 300  # точки из будущего дальше этого отбрасываются
+
+    # Последние координаты техников: хранилище с отложенной записью в users
+    LOCATION_STORE_BACKEND: str = "memory"  # memory — в памяти воркера (+ NOTIFY), redis — общее
+    LOCATION_STORE_FLUSH_SECONDS: float = 5.0  # как часто переносить координаты в users
+    LOCATION_STORE_FLUSH_MAX: int = 5000  # техников за один сброс (redis)
+    LOCATION_STORE_REPLAY_HOURS: int = 24  # насколько назад смотреть журнал при старте
+
+    # Поток координат техника для клиента (SSE)
+    LOCATION_STREAM_MIN_INTERVAL_SECONDS: float = 2.0  # не чаще одного события на подписчика
+    LOCATION_STREAM_HEARTBEAT_SECONDS: float = 15.0
+    LOCATION_STREAM_MAX_SECONDS: float = 3600.0  # затем клиент переподключается (и заново проходит авторизацию)
+    LOCATION_STREAM_RETRY_SECONDS: float = 3.0  # пауза перед переподключением EventSource
+    LOCATION_STREAM_MAX_SUBSCRIBERS: int = 5000  # на воркер; сверх этого 503
+
+    # Transactional outbox: доставка событий заказов подписчикам
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 5.0  # опрос на случай пропущенного NOTIFY
+    OUTBOX_MAX_ATTEMPTS: int = 5
+    OUTBOX_RETAIN_DAYS: int = 7  # сколько хранить доставленные события
+
     # Stripe API keys
     STRIPE_API_KEY: str = os.getenv('STRIPE_API_KEY')
     STRIPE_WEBHOOK_SECRET: str = os.getenv('STRIPE_WEBHOOK_SECRET')
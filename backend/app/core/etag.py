@@ -0,0 +1,31 @@
+# app/core/etag.py
+
+import hashlib
+from fastapi import Request, Response
+
+
+def make_etag(*parts) -> str:
+    # Слабый ETag: одинаковая версия данных дает одинаковый ответ, побайтовое совпадение не гарантируется
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Для If-None-Match используется слабое сравнение: префикс W/ не учитывается
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+
+def set_etag(response: Response, etag: str):
+    # no-cache: клиент хранит ответ, но перед использованием перепроверяет его через If-None-Match
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
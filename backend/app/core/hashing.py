@@ -0,0 +1,96 @@
+# app/core/hashing.py
+
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException, status
+from app.core.config import settings
+from app.core.security import pwd_context
+
+
+def _hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_password(password: str, password_hash: str):
+    # (пароль верный, новый хэш или None); новый хэш возвращается, если стоимость хэша ниже BCRYPT_ROUNDS
+    return pwd_context.verify_and_update(password, password_hash)
+
+
+class PasswordHasher:
+    """Отдельный пул процессов для bcrypt, чтобы всплеск логинов не занимал потоки обработчиков запросов.
+
+    Очередь ограничена PASSWORD_HASH_MAX_PENDING задачами на процесс: сверх этого запрос сразу
+    получает 503 с Retry-After вместо бесконечного ожидания.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: форк процесса с фоновыми потоками и открытыми соединениями небезопасен
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    async def _run(self, func, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many authentication requests, try again later",
+                    headers={"Retry-After": "1"},
+                )
+            self.pending += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+                self.total_time += elapsed
+                self.max_time = max(self.max_time, elapsed)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash_password, password)
+
+    async def verify(self, password: str, password_hash: str):
+        return await self._run(_verify_password, password, password_hash)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "rounds": settings.BCRYPT_ROUNDS,
+                "pending": self.pending,
+                "max_pending": self.max_pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_ms": self.total_time * 1000 / self.completed if self.completed else 0.0,
+                "max_ms": self.max_time * 1000,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING)
@@ -0,0 +1,96 @@
+# app/core/identity_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from app.core.config import settings
+from app.db.notify import pg_listener, pg_notify
+from app.models.user import User
+
+# Канал NOTIFY, по которому воркеры сообщают друг другу об изменении пользователя
+IDENTITY_CHANNEL = "identity_invalidate"
+
+
+class IdentityCache:
+    """Ограниченный LRU-кэш с TTL: subject токена (email) -> значения колонок пользователя."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._items[key]
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: str, value: dict):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._items), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+identity_cache = IdentityCache(settings.IDENTITY_CACHE_SIZE, settings.IDENTITY_CACHE_TTL_SECONDS)
+
+# Изменения из других процессов приходят через NOTIFY; после разрыва соединения кэш сбрасывается целиком
+pg_listener.subscribe(IDENTITY_CHANNEL, identity_cache.invalidate)
+pg_listener.on_reconnect(identity_cache.clear)
+
+
+def user_snapshot(user: User) -> dict:
+    return {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+
+
+def cached_user(db: Session, snapshot: dict) -> User:
+    # Восстанавливаем пользователя в сессии без SQL-запроса (merge с load=False)
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+
+def _invalidation_statements(db, subjects):
+    for subject in {subject for subject in subjects if subject}:
+        identity_cache.invalidate(subject)
+        statement = pg_notify(db, IDENTITY_CHANNEL, subject)
+        if statement is not None:
+            yield statement
+
+
+def invalidate_identity(db: Session, *subjects: str):
+    # Локально удаляем сразу, остальным воркерам сообщаем в той же транзакции (дойдет после COMMIT)
+    for statement in _invalidation_statements(db, subjects):
+        db.execute(statement)
+
+
+async def invalidate_identity_async(db, *subjects: str):
+    for statement in _invalidation_statements(db, subjects):
+        await db.execute(statement)
@@ -0,0 +1,150 @@
+# app/core/location_hub.py
+
+import asyncio
+import json
+import time
+from collections import defaultdict
+from typing import Optional
+from app.core.config import settings
+from app.core.location_store import LatestLocation
+from app.core.technician_index import TECHNICIAN_POSITION_CHANNEL, parse_position
+from app.db.notify import pg_listener
+
+
+class Subscription:
+    """Подписка одного клиента на координаты техника.
+
+    Хранится только последняя позиция: если клиент не успевает, промежуточные точки
+    пропускаются, а отправка идет не чаще раза в min_interval секунд.
+    """
+
+    def __init__(self, technician_id: int, min_interval: float):
+        self.technician_id = technician_id
+        self.min_interval = min_interval
+        self.latest = None
+        self._event = asyncio.Event()
+        self._sent_at = 0.0
+
+    def offer(self, location: LatestLocation):
+        # Повтор той же точки (локальная публикация и эхо NOTIFY) и опоздавшие точки отбрасываем
+        if self.latest is None or location.recorded_at > self.latest.recorded_at:
+            self.latest = location
+            self._event.set()
+
+    async def next(self, timeout: float) -> Optional[LatestLocation]:
+        # Новая позиция или None, если за timeout ничего не пришло
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        delay = self._sent_at + self.min_interval - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self._event.clear()
+        self._sent_at = time.monotonic()
+        return self.latest
+
+
+class LocationHub:
+    """Раздача координат техников подписчикам воркера (SSE-потоки клиентов).
+
+    Источник — NOTIFY technician_position, который получают все воркеры, поэтому клиент
+    видит пинги, принятые любым воркером; точки, принятые этим воркером, публикуются сразу.
+    """
+
+    def __init__(self, min_interval: float, max_subscribers: int):
+        self.min_interval = min_interval
+        self.max_subscribers = max_subscribers
+        self.loop = None
+        self._subscriptions = defaultdict(set)
+        self.subscribers = 0
+        self.published = 0
+        self.rejected = 0
+
+    def start(self, loop):
+        self.loop = loop
+
+    def full(self) -> bool:
+        if self.subscribers >= self.max_subscribers:
+            self.rejected += 1
+            return True
+        return False
+
+    def subscribe(self, technician_id: int) -> Optional[Subscription]:
+        if self.full():
+            return None
+        subscription = Subscription(technician_id, self.min_interval)
+        self._subscriptions[technician_id].add(subscription)
+        self.subscribers += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._subscriptions.get(subscription.technician_id)
+        if subscriptions is None or subscription not in subscriptions:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscriptions[subscription.technician_id]
+        self.subscribers -= 1
+
+    def publish(self, location: LatestLocation):
+        for subscription in list(self._subscriptions.get(location.technician_id, ())):
+            subscription.offer(location)
+            self.published += 1
+
+    def on_notify(self, payload: str):
+        # Вызывается в потоке слушателя; техников без подписчиков отсекаем, не трогая event loop
+        data = parse_position(payload)
+        if self.loop is None or data["updated_at"] is None or data["technician_id"] not in self._subscriptions:
+            return
+        location = LatestLocation(data["technician_id"], data["latitude"], data["longitude"], data["updated_at"])
+        self.loop.call_soon_threadsafe(self.publish, location)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self.subscribers,
+            "technicians": len(self._subscriptions),
+            "published": self.published,
+            "rejected": self.rejected,
+        }
+
+
+def sse_event(event: str, data: dict, event_id: str = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def location_events(technician_id: int, current_location):
+    """Поток Server-Sent Events с координатами техника.
+
+    Подписка создается внутри генератора: если клиент отключился до начала ответа, ее не будет,
+    а начатую гарантированно снимет finally. Комментарий-heartbeat не дает прокси закрыть
+    простаивающее соединение; через LOCATION_STREAM_MAX_SECONDS поток завершается,
+    и клиент переподключается с новым токеном.
+    """
+    yield f"retry: {int(settings.LOCATION_STREAM_RETRY_SECONDS * 1000)}\n\n"
+    subscription = location_hub.subscribe(technician_id)
+    if subscription is None:
+        return
+    deadline = time.monotonic() + settings.LOCATION_STREAM_MAX_SECONDS
+    try:
+        # Текущую позицию читаем после подписки, чтобы не пропустить точку между ними
+        initial = await current_location(technician_id)
+        if initial is not None:
+            subscription.offer(initial)
+        while time.monotonic() < deadline:
+            location = await subscription.next(settings.LOCATION_STREAM_HEARTBEAT_SECONDS)
+            if location is None:
+                yield ": keepalive\n\n"
+                continue
+            yield sse_event("location", location.as_dict(), location.recorded_at.isoformat())
+    finally:
+        location_hub.unsubscribe(subscription)
+
+
+location_hub = LocationHub(settings.LOCATION_STREAM_MIN_INTERVAL_SECONDS, settings.LOCATION_STREAM_MAX_SUBSCRIBERS)
+
+pg_listener.subscribe(TECHNICIAN_POSITION_CHANNEL, location_hub.on_notify)
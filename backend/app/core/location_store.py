@@ -0,0 +1,238 @@
+# app/core/location_store.py
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.core.technician_index import TECHNICIAN_POSITION_CHANNEL, parse_position
+from app.db.locations import flush_latest_locations, replay_location_history
+from app.db.notify import pg_listener
+from app.enums import UserRole
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LatestLocation:
+    technician_id: int
+    latitude: float
+    longitude: float
+    recorded_at: datetime
+
+    def as_dict(self) -> dict:
+        return {
+            "technician_id": self.technician_id,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "updated_at": self.recorded_at.isoformat(),
+        }
+
+
+class MemoryLocationBackend:
+    """Последние координаты в памяти процесса.
+
+    Каждый воркер получает чужие обновления через NOTIFY (без пометки к записи), а записывает
+    в users только точки, принятые им самим. Блокировки не нужны: все вызовы идут из event loop.
+    """
+
+    def __init__(self):
+        self._latest = {}
+        self._dirty = set()
+        self.loop = None
+
+    async def record(self, location: LatestLocation, dirty: bool = True) -> bool:
+        current = self._latest.get(location.technician_id)
+        if current is not None and current.recorded_at > location.recorded_at:
+            return False
+        # Собственный NOTIFY может дойти раньше локальной записи той же точки: пометку к записи не теряем
+        if current is None or current.recorded_at < location.recorded_at:
+            self._latest[location.technician_id] = location
+        if dirty:
+            self._dirty.add(location.technician_id)
+        return True
+
+    async def get(self, technician_id: int) -> Optional[LatestLocation]:
+        return self._latest.get(technician_id)
+
+    async def take_dirty(self) -> list:
+        dirty, self._dirty = self._dirty, set()
+        return [self._latest[technician_id] for technician_id in dirty]
+
+    async def restore_dirty(self, locations: list):
+        self._dirty.update(location.technician_id for location in locations)
+
+    def on_notify(self, payload: str):
+        # Вызывается в потоке слушателя: запись передаем в event loop
+        data = parse_position(payload)
+        if self.loop is None or data["updated_at"] is None:
+            return
+        location = LatestLocation(data["technician_id"], data["latitude"], data["longitude"], data["updated_at"])
+        self.loop.call_soon_threadsafe(asyncio.ensure_future, self.record(location, dirty=False))
+
+    def size(self) -> int:
+        return len(self._latest)
+
+
+# Запись только если точка новее сохраненной; к записи в users помечается атомарно вместе с ней
+RECORD_SCRIPT = """
+local current = tonumber(redis.call('HGET', KEYS[1], 'ts'))
+local ts = tonumber(ARGV[3])
+if current and current >= ts then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'lat', ARGV[1], 'lng', ARGV[2], 'ts', ARGV[3])
+if ARGV[4] == '1' then
+    redis.call('SADD', KEYS[2], ARGV[5])
+end
+return 1
+"""
+
+
+class RedisLocationBackend:
+    """Последние координаты в Redis: общие для всех воркеров и переживают их перезапуск."""
+
+    DIRTY_KEY = "techloc:dirty"
+
+    def __init__(self, client):
+        self._client = client
+        self._record = client.register_script(RECORD_SCRIPT)
+
+    @staticmethod
+    def _key(technician_id: int) -> str:
+        return f"techloc:{technician_id}"
+
+    async def record(self, location: LatestLocation, dirty: bool = True) -> bool:
+        args = [location.latitude, location.longitude, location.recorded_at.replace(tzinfo=timezone.utc).timestamp(),
+                "1" if dirty else "0", location.technician_id]
+        return bool(await self._record(keys=[self._key(location.technician_id), self.DIRTY_KEY], args=args))
+
+    async def get(self, technician_id: int) -> Optional[LatestLocation]:
+        data = await self._client.hgetall(self._key(technician_id))
+        if not data:
+            return None
+        return self._location(technician_id, data)
+
+    @staticmethod
+    def _location(technician_id: int, data: dict) -> LatestLocation:
+        recorded_at = datetime.fromtimestamp(float(data["ts"]), timezone.utc).replace(tzinfo=None)
+        return LatestLocation(technician_id, float(data["lat"]), float(data["lng"]), recorded_at)
+
+    async def take_dirty(self) -> list:
+        # SPOP забирает id атомарно: один и тот же техник не попадет в сбросы двух воркеров сразу
+        technician_ids = [int(technician_id) for technician_id in
+                          await self._client.spop(self.DIRTY_KEY, settings.LOCATION_STORE_FLUSH_MAX) or ()]
+        async with self._client.pipeline(transaction=False) as pipe:
+            for technician_id in technician_ids:
+                pipe.hgetall(self._key(technician_id))
+            results = await pipe.execute()
+        return [self._location(technician_id, data) for technician_id, data in zip(technician_ids, results) if data]
+
+    async def restore_dirty(self, locations: list):
+        if locations:
+            await self._client.sadd(self.DIRTY_KEY, *[location.technician_id for location in locations])
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+class LocationStore:
+    """Последние координаты техников с отложенной записью в users.
+
+    Каждая точка сразу попадает в журнал technician_locations (append-only INSERT), а горячие
+    колонки users обновляются раз в LOCATION_STORE_FLUSH_SECONDS одним UPDATE на всех техников.
+    Журнал служит write-ahead log: при старте воркера точки новее users переносятся в users,
+    так что потерянные при падении процесса несброшенные координаты восстанавливаются.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.flushed = 0
+        self.flush_failures = 0
+
+    async def record(self, technician_id: int, latitude: float, longitude: float, recorded_at: datetime) -> bool:
+        return await self.backend.record(LatestLocation(technician_id, latitude, longitude, recorded_at))
+
+    async def get(self, technician_id: int) -> Optional[LatestLocation]:
+        return await self.backend.get(technician_id)
+
+    async def flush(self, session_factory) -> int:
+        locations = await self.backend.take_dirty()
+        if not locations:
+            return 0
+        try:
+            async with session_factory() as db:
+                await flush_latest_locations(db, locations)
+                await db.commit()
+        except Exception:
+            # Не записанные позиции вернутся в следующий сброс
+            await self.backend.restore_dirty(locations)
+            self.flush_failures += 1
+            raise
+        self.flushed += len(locations)
+        return len(locations)
+
+    async def run(self, session_factory):
+        # Фоновая задача воркера: периодический сброс и финальный сброс при остановке
+        try:
+            while True:
+                await asyncio.sleep(settings.LOCATION_STORE_FLUSH_SECONDS)
+                try:
+                    await self.flush(session_factory)
+                except Exception:
+                    logger.exception("Technician location flush failed")
+        except asyncio.CancelledError:
+            await self.flush(session_factory)
+            raise
+
+    def load(self, sync_session_factory) -> list:
+        """Восстановление после перезапуска: журнал -> users, затем users -> хранилище."""
+        since = datetime.utcnow() - timedelta(hours=settings.LOCATION_STORE_REPLAY_HOURS)
+        with sync_session_factory() as db:
+            replayed = replay_location_history(db, since)
+            db.commit()
+            rows = db.execute(
+                select(User.id, User.latitude, User.longitude, User.location_updated_at).where(
+                    User.role == UserRole.technician,
+                    User.latitude.isnot(None),
+                    User.longitude.isnot(None),
+                    User.location_updated_at.isnot(None),
+                )
+            ).all()
+        logger.info("Technician locations replayed from history: %s, loaded: %s", replayed, len(rows))
+        return [LatestLocation(*row) for row in rows]
+
+    async def start(self, session_factory, sync_session_factory) -> asyncio.Task:
+        if isinstance(self.backend, MemoryLocationBackend):
+            self.backend.loop = asyncio.get_running_loop()
+        locations = await asyncio.to_thread(self.load, sync_session_factory)
+        for location in locations:
+            await self.backend.record(location, dirty=False)
+        return asyncio.create_task(self.run(session_factory))
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "technicians": self.backend.size(),
+            "flushed": self.flushed,
+            "flush_failures": self.flush_failures,
+        }
+
+
+def create_location_store() -> LocationStore:
+    # Redis, если задан REDIS_URL (одно хранилище на все воркеры), иначе память процесса + NOTIFY
+    client = get_redis() if settings.LOCATION_STORE_BACKEND == "redis" else None
+    if settings.LOCATION_STORE_BACKEND == "redis" and client is None:
+        raise RuntimeError("LOCATION_STORE_BACKEND=redis requires REDIS_URL")
+    if client is not None:
+        return LocationStore(RedisLocationBackend(client))
+    backend = MemoryLocationBackend()
+    pg_listener.subscribe(TECHNICIAN_POSITION_CHANNEL, backend.on_notify)
+    return LocationStore(backend)
+
+
+location_store = create_location_store()
@@ -0,0 +1,52 @@
+# app/core/order_events.py
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.outbox import add_event, subscribe
+from app.models.client import Client
+from app.models.notification import Notification
+from app.models.order import Order
+
+# Типы событий жизненного цикла заказа
+ORDER_STATUS_CHANGED = "order.status_changed"
+ORDER_TECHNICIAN_ASSIGNED = "order.technician_assigned"
+ORDER_CANCELLED = "order.cancelled"
+ORDER_PAID = "order.paid"
+
+
+def record_order_event(db, event_type: str, order: Order, previous_status: str = None, **extra):
+    # Снимок заказа на момент события: подписчикам не нужно перечитывать orders
+    payload = {
+        "order_id": order.id,
+        "client_id": order.client_id,
+        "technician_id": order.technician_id,
+        "status": order.status,
+        "previous_status": previous_status,
+        **extra,
+    }
+    return add_event(db, "order", order.id, event_type, payload)
+
+
+NOTIFICATION_TEXT = {
+    ORDER_STATUS_CHANGED: ("Статус заказа изменен", "Заказ #{order_id}: статус «{status}»."),
+    ORDER_TECHNICIAN_ASSIGNED: ("Назначен техник", "На заказ #{order_id} назначен техник."),
+    ORDER_CANCELLED: ("Заказ отменен", "Заказ #{order_id} отменен клиентом."),
+    ORDER_PAID: ("Заказ оплачен", "Оплата по заказу #{order_id} получена."),
+}
+
+
+async def notify_order_participants(db: AsyncSession, events: list):
+    """Уведомления клиенту и технику заказа; пишутся в транзакции relay вместе с отметкой о доставке."""
+    client_ids = {event.payload["client_id"] for event in events}
+    result = await db.execute(select(Client.id, Client.user_id).where(Client.id.in_(client_ids)))
+    client_users = dict(result.all())
+    for event in events:
+        title, template = NOTIFICATION_TEXT[event.event_type]
+        message = template.format(**event.payload)
+        recipients = {client_users.get(event.payload["client_id"]), event.payload["technician_id"]}
+        for user_id in recipients - {None}:
+            db.add(Notification(user_id=user_id, title=title, message=message, created_at=event.created_at))
+
+
+for _event_type in NOTIFICATION_TEXT:
+    subscribe(_event_type, notify_order_participants)
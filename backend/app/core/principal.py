@@ -0,0 +1,60 @@
+# app/core/principal.py
+
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.enums import UserRole
+from app.models.client import Client
+from app.models.user import User
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Вызывающий пользователь, восстановленный только из подписанных claims access-токена.
+
+    Достаточен для проверок роли и владения заказом без обращения к БД.
+    """
+    user_id: int
+    email: str
+    role: UserRole
+    client_id: Optional[int] = None
+    technician_id: Optional[int] = None
+
+    @classmethod
+    def from_claims(cls, payload: dict) -> Optional["Principal"]:
+        # Токены, выпущенные до появления claims uid/role, не подходят: клиент обновит их через /auth/refresh
+        try:
+            return cls(
+                user_id=int(payload["uid"]),
+                email=payload["sub"],
+                role=UserRole(payload["role"]),
+                client_id=payload.get("cid"),
+                technician_id=payload.get("tid"),
+            )
+        except (KeyError, TypeError, ValueError):
+            return None
+
+
+def client_id_query(user: User):
+    # id профиля клиента отдельным запросом: ленивая загрузка user.client_profile падает при DB_RAISE_ON_LAZY_LOAD
+    return select(Client.id).where(Client.user_id == user.id).order_by(Client.id).limit(1)
+
+
+def build_claims(user: User, client_id: Optional[int]) -> dict:
+    # Claims для create_access_token: id профиля клиента и id техника (техник — это сам пользователь)
+    return {
+        "sub": user.email,
+        "uid": user.id,
+        "role": user.role.value,
+        "cid": client_id,
+        "tid": user.id if user.role == UserRole.technician else None,
+    }
+
+
+def principal_claims(db: Session, user: User) -> dict:
+    return build_claims(user, db.execute(client_id_query(user)).scalar())
+
+
+async def principal_claims_async(db, user: User) -> dict:
+    return build_claims(user, (await db.execute(client_id_query(user))).scalar())
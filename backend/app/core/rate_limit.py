@@ -0,0 +1,290 @@
+# app/core/rate_limit.py
+
+import logging
+import math
+import re
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Optional
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from jose import JWTError, jwt
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+TOKEN_BUCKET = "token_bucket"
+SLIDING_WINDOW = "sliding_window"
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    """Политика ограничения для маршрута.
+
+    token_bucket: rate запросов в секунду с запасом burst.
+    sliding_window: не более limit запросов за window секунд (оценка по двум соседним окнам).
+    by_principal: ключ — пользователь из токена (без токена — IP), иначе всегда IP.
+    """
+    name: str
+    algorithm: str
+    rate: float = 0.0
+    burst: int = 0
+    limit: int = 0
+    window: float = 0.0
+    by_principal: bool = True
+
+    @property
+    def capacity(self) -> int:
+        return self.burst if self.algorithm == TOKEN_BUCKET else self.limit
+
+    @property
+    def ttl(self) -> float:
+        # Сколько хранить состояние ключа без обращений
+        return self.burst / self.rate if self.algorithm == TOKEN_BUCKET else 2 * self.window
+
+
+def route_pattern(method: str, path: str):
+    # "/technicians/{technician_id}/location" -> регулярное выражение по сегментам пути
+    regex = re.sub(r"\\{[^/]+?\\}", "[^/]+", re.escape(path))
+    return method, re.compile(f"^{regex}/?$")
+
+
+AUTH_POLICY = RateLimitPolicy(
+    "auth", SLIDING_WINDOW,
+    limit=settings.RATE_LIMIT_AUTH_ATTEMPTS, window=settings.RATE_LIMIT_AUTH_WINDOW_SECONDS, by_principal=False,
+)
+LOCATION_POLICY = RateLimitPolicy(
+    "technician_location", TOKEN_BUCKET,
+    rate=settings.RATE_LIMIT_LOCATION_RATE, burst=settings.RATE_LIMIT_LOCATION_BURST,
+)
+DEFAULT_POLICY = RateLimitPolicy(
+    "default", TOKEN_BUCKET,
+    rate=settings.RATE_LIMIT_DEFAULT_RATE, burst=settings.RATE_LIMIT_DEFAULT_BURST,
+)
+
+# (метод, шаблон пути) -> политика; остальные маршруты попадают под DEFAULT_POLICY
+RATE_LIMIT_POLICIES = [
+    (route_pattern("POST", "/auth/login"), AUTH_POLICY),
+    (route_pattern("POST", "/auth/register"), AUTH_POLICY),
+    (route_pattern("POST", "/auth/refresh"), AUTH_POLICY),
+    (route_pattern("POST", "/auth/reset-password-request"), AUTH_POLICY),
+    (route_pattern("POST", "/auth/update-password"), AUTH_POLICY),
+    (route_pattern("POST", "/technicians/{technician_id}/location"), LOCATION_POLICY),
+    (route_pattern("POST", "/technicians/{technician_id}/locations"), LOCATION_POLICY),
+]
+
+
+class MemoryBackend:
+    """Состояние в памяти процесса.
+
+    Блокировки не нужны: проверка выполняется в event loop без await между чтением и записью.
+    Ключи хранятся в порядке последнего обращения, поэтому вытеснение работает с головой
+    OrderedDict и стоит O(1) на запрос, а не полный проход по всем ключам.
+    """
+
+    # Сколько истекших ключей из головы очереди удаляется за один запрос
+    EXPIRE_STEP = 2
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._state = OrderedDict()
+
+    async def hit(self, key: str, policy: RateLimitPolicy, now: float):
+        state = self._state.get(key)
+        if policy.algorithm == TOKEN_BUCKET:
+            tokens, updated = state[:2] if state else (policy.burst, now)
+            tokens = min(policy.burst, tokens + (now - updated) * policy.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            retry_after = 0.0 if allowed else (1 - tokens) / policy.rate
+            self._state[key] = (tokens, now, now + policy.ttl)
+            remaining = int(tokens)
+        else:
+            window_start = now - now % policy.window
+            started, count, previous = state[:3] if state else (window_start, 0, 0)
+            if started != window_start:
+                previous = count if started == window_start - policy.window else 0
+                count = 0
+            elapsed = now - window_start
+            estimate = previous * (1 - elapsed / policy.window) + count
+            allowed = estimate + 1 <= policy.limit
+            if allowed:
+                count += 1
+                retry_after = 0.0
+            elif previous and count < policy.limit:
+                # Ждем, пока вес предыдущего окна упадет достаточно, чтобы пропустить еще один запрос
+                retry_after = policy.window * (1 - (policy.limit - count - 1) / previous) - elapsed
+            else:
+                retry_after = policy.window - elapsed
+            self._state[key] = (window_start, count, previous, now + policy.ttl)
+            remaining = max(0, int(policy.limit - estimate - (1 if allowed else 0)))
+        self._state.move_to_end(key)
+        self._evict(now)
+        return allowed, remaining, max(0.0, retry_after)
+
+    def _evict(self, now: float):
+        # В голове — ключи, к которым дольше всего не обращались: сначала снимаем истекшие,
+        # затем, сверх max_keys, самые давние (их состояние ближе всего к исходному)
+        for _ in range(self.EXPIRE_STEP):
+            oldest = next(iter(self._state.items()), None)
+            if oldest is None or oldest[1][-1] > now:
+                break
+            del self._state[oldest[0]]
+        while len(self._state) > self.max_keys:
+            self._state.popitem(last=False)
+
+
+# Те же алгоритмы атомарно на стороне Redis: общее состояние для всех воркеров и хостов
+TOKEN_BUCKET_SCRIPT = """
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local allowed, retry_after = 0, (1 - tokens) / rate
+if tokens >= 1 then
+    tokens, allowed, retry_after = tokens - 1, 1, 0
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return {allowed, math.floor(tokens), tostring(retry_after)}
+"""
+
+SLIDING_WINDOW_SCRIPT = """
+local limit, window, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local window_start = now - now % window
+local current_key = KEYS[1] .. ':' .. window_start
+local previous_key = KEYS[1] .. ':' .. (window_start - window)
+local count = tonumber(redis.call('GET', current_key)) or 0
+local previous = tonumber(redis.call('GET', previous_key)) or 0
+local elapsed = now - window_start
+local estimate = previous * (1 - elapsed / window) + count
+if estimate + 1 <= limit then
+    redis.call('INCR', current_key)
+    redis.call('PEXPIRE', current_key, math.ceil(window * 2000))
+    return {1, math.floor(limit - estimate - 1), '0'}
+end
+local retry_after = window - elapsed
+if previous > 0 and count < limit then
+    retry_after = window * (1 - (limit - count - 1) / previous) - elapsed
+end
+return {0, 0, tostring(retry_after)}
+"""
+
+
+class RedisBackend:
+    def __init__(self, client):
+        self._client = client
+        self._scripts = {
+            TOKEN_BUCKET: client.register_script(TOKEN_BUCKET_SCRIPT),
+            SLIDING_WINDOW: client.register_script(SLIDING_WINDOW_SCRIPT),
+        }
+
+    async def hit(self, key: str, policy: RateLimitPolicy, now: float):
+        if policy.algorithm == TOKEN_BUCKET:
+            args = [policy.rate, policy.burst, now]
+        else:
+            # Границы окон считаем в целых секундах, чтобы ключи совпадали у всех воркеров
+            args = [policy.limit, policy.window, math.floor(now)]
+        allowed, remaining, retry_after = await self._scripts[policy.algorithm](keys=[f"ratelimit:{key}"], args=args)
+        return bool(allowed), int(remaining), max(0.0, float(retry_after))
+
+
+class RateLimiter:
+    """Ограничение частоты запросов по маршрутам и пользователям плюс предел одновременных запросов на воркер."""
+
+    def __init__(self, backend, max_inflight: int = 0):
+        self.backend = backend
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.allowed = defaultdict(int)
+        self.rejected = defaultdict(int)
+        self.shed = 0
+
+    def policy_for(self, request: Request) -> RateLimitPolicy:
+        for (method, pattern), policy in RATE_LIMIT_POLICIES:
+            if request.method == method and pattern.match(request.url.path):
+                return policy
+        return DEFAULT_POLICY
+
+    def client_key(self, request: Request, policy: RateLimitPolicy) -> str:
+        if policy.by_principal:
+            authorization = request.headers.get("authorization", "")
+            if authorization.lower().startswith("bearer "):
+                try:
+                    payload = jwt.decode(authorization[7:], settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+                    subject = payload.get("uid") or payload.get("sub")
+                    if subject is not None:
+                        return f"user:{subject}"
+                except JWTError:
+                    pass
+        return f"ip:{request.client.host if request.client else 'unknown'}"
+
+    async def check(self, request: Request) -> Optional[JSONResponse]:
+        policy = self.policy_for(request)
+        key = f"{policy.name}:{self.client_key(request, policy)}"
+        try:
+            allowed, remaining, retry_after = await self.backend.hit(key, policy, time.time())
+        except Exception:
+            # Недоступность общего хранилища не должна останавливать API
+            logger.exception("Rate limit backend failed, letting request through")
+            return None
+        if allowed:
+            self.allowed[policy.name] += 1
+            return None
+        self.rejected[policy.name] += 1
+        return JSONResponse(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            content={"detail": "Too many requests, try again later"},
+            headers={
+                "Retry-After": str(max(1, math.ceil(retry_after))),
+                "X-RateLimit-Limit": str(policy.capacity),
+                "X-RateLimit-Remaining": str(remaining),
+            },
+        )
+
+    async def dispatch(self, request: Request, call_next):
+        if self.max_inflight and self.inflight >= self.max_inflight:
+            # Воркер перегружен: отказываем сразу, а не копим очередь с растущими задержками
+            self.shed += 1
+            return JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={"detail": "Server is busy, try again later"},
+                headers={"Retry-After": "1"},
+            )
+        rejection = await self.check(request)
+        if rejection is not None:
+            return rejection
+        self.inflight += 1
+        try:
+            return await call_next(request)
+        finally:
+            self.inflight -= 1
+
+    def stats(self) -> dict:
+        policies = sorted(set(self.allowed) | set(self.rejected))
+        return {
+            "backend": type(self.backend).__name__,
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight,
+            "shed": self.shed,
+            "policies": [
+                {"policy": name, "allowed": self.allowed[name], "rejected": self.rejected[name]}
+                for name in policies
+            ],
+        }
+
+
+def create_rate_limiter() -> RateLimiter:
+    # Redis, если задан REDIS_URL (общие лимиты для всех воркеров), иначе память процесса
+    client = get_redis() if settings.RATE_LIMIT_BACKEND == "redis" else None
+    if settings.RATE_LIMIT_BACKEND == "redis" and client is None:
+        raise RuntimeError("RATE_LIMIT_BACKEND=redis requires REDIS_URL")
+    backend = RedisBackend(client) if client is not None else MemoryBackend()
+    return RateLimiter(backend, settings.RATE_LIMIT_MAX_INFLIGHT)
+
+
+rate_limiter = create_rate_limiter()
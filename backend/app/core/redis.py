@@ -0,0 +1,26 @@
+# app/core/redis.py
+
+from app.core.config import settings
+
+_client = None
+
+
+def get_redis():
+    """Общий асинхронный клиент Redis или None, если REDIS_URL не задан.
+
+    Пакет redis нужен только при заданном REDIS_URL, поэтому импортируется лениво.
+    """
+    global _client
+    if not settings.REDIS_URL:
+        return None
+    if _client is None:
+        import redis.asyncio as aioredis
+        _client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _client
+
+
+async def close_redis():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
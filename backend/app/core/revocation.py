@@ -0,0 +1,206 @@
+# app/core/revocation.py
+
+import asyncio
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.notify import pg_listener, pg_notify
+from app.db.session import SessionLocal
+from app.models.revoked_token import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+# Канал NOTIFY, по которому воркеры получают только что отозванные jti
+REVOCATION_CHANNEL = "token_revoked"
+
+
+def to_timestamp(value: datetime) -> float:
+    # В БД время хранится как naive UTC (datetime.utcnow)
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class BloomFilter:
+    """Компактный фильтр Блума: «точно нет» без обращения к множеству отозванных jti."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationStore:
+    """Множество отозванных jti с временем истечения, синхронизируемое с таблицей revoked_tokens.
+
+    Проверка в каждом запросе — поиск в dict без блокировок и без обращения к БД. Новые отзывы
+    приходят через PostgreSQL NOTIFY сразу после COMMIT, периодическая синхронизация добирает
+    пропущенное и выбрасывает истекшие записи.
+    """
+
+    def __init__(self, bloom_capacity: Optional[int] = None, bloom_error_rate: float = 0.001):
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+        self._expiry = {}
+        self._bloom = self._new_bloom()
+        self._lock = threading.Lock()
+        self._synced_at = None
+
+    def _new_bloom(self) -> Optional[BloomFilter]:
+        if not self.bloom_capacity:
+            return None
+        return BloomFilter(self.bloom_capacity, self.bloom_error_rate)
+
+    def is_revoked(self, jti: str) -> bool:
+        bloom = self._bloom
+        if bloom is not None and jti not in bloom:
+            return False
+        return jti in self._expiry
+
+    def add(self, jti: str, expires_at: float):
+        with self._lock:
+            self._expiry[jti] = expires_at
+            if self._bloom is not None:
+                self._bloom.add(jti)
+
+    def _swap(self, expiry: dict):
+        # Вызывается под блокировкой; фильтр Блума не умеет удалять, поэтому пересобирается целиком
+        bloom = self._new_bloom()
+        if bloom is not None:
+            for jti in expiry:
+                bloom.add(jti)
+        self._expiry, self._bloom = expiry, bloom
+
+    def prune(self):
+        now = time.time()
+        with self._lock:
+            self._swap({jti: expires_at for jti, expires_at in self._expiry.items() if expires_at > now})
+
+    def load(self, db: Session):
+        # Полная загрузка действующих отзывов (при старте и после переподключения слушателя)
+        now = datetime.utcnow()
+        rows = db.execute(
+            select(RevokedToken.jti, RevokedToken.expires_at).where(RevokedToken.expires_at > now)
+        ).all()
+        expiry = {jti: to_timestamp(expires_at) for jti, expires_at in rows}
+        with self._lock:
+            # Записи, пришедшие через NOTIFY во время загрузки, не теряем
+            expiry.update(self._expiry)
+            self._swap(expiry)
+        self._synced_at = now
+
+    def sync(self, db: Session):
+        # Догружаем отзывы после прошлой синхронизации (с запасом на разницу часов) и чистим истекшие
+        if self._synced_at is None:
+            self.load(db)
+            return
+        now = datetime.utcnow()
+        since = self._synced_at - timedelta(seconds=settings.TOKEN_REVOCATION_SYNC_SECONDS)
+        rows = db.execute(
+            select(RevokedToken.jti, RevokedToken.expires_at).where(
+                RevokedToken.revoked_at >= since, RevokedToken.expires_at > now
+            )
+        ).all()
+        for jti, expires_at in rows:
+            self.add(jti, to_timestamp(expires_at))
+        self.prune()
+        db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+        db.commit()
+        self._synced_at = now
+
+    def on_notify(self, payload: str):
+        jti, _, expires_at = payload.partition(" ")
+        self.add(jti, float(expires_at))
+
+    def reload(self):
+        with SessionLocal() as db:
+            self.load(db)
+
+    def stats(self) -> dict:
+        return {
+            "revoked": len(self._expiry),
+            "bloom_bits": self._bloom.size if self._bloom is not None else 0,
+            "synced_at": self._synced_at,
+        }
+
+
+revocation_store = RevocationStore(
+    bloom_capacity=settings.TOKEN_REVOCATION_BLOOM_CAPACITY if settings.TOKEN_REVOCATION_BLOOM_ENABLED else None,
+    bloom_error_rate=settings.TOKEN_REVOCATION_BLOOM_ERROR_RATE,
+)
+
+pg_listener.subscribe(REVOCATION_CHANNEL, revocation_store.on_notify)
+# Отзывы, сделанные пока слушатель был отключен, подгружаем из таблицы
+pg_listener.on_reconnect(revocation_store.reload)
+
+
+def _revocation(db, payload: dict):
+    # Строка revoked_tokens и NOTIFY для остальных воркеров (None вне PostgreSQL); None, если у токена нет jti
+    jti = payload.get("jti")
+    if not jti:
+        return None
+    expires_at = datetime.utcfromtimestamp(payload["exp"])
+    token = RevokedToken(jti=jti, user_id=payload.get("uid"), expires_at=expires_at)
+    return token, pg_notify(db, REVOCATION_CHANNEL, f"{jti} {payload['exp']}")
+
+
+def revoke_token(db: Session, payload: dict):
+    """Отзывает токен по его claims в текущей транзакции.
+
+    Повторный отзыв того же jti нарушает первичный ключ при flush — так ротация refresh-токена
+    остается одноразовой даже при гонке между воркерами.
+    """
+    revocation = _revocation(db, payload)
+    if revocation is None:
+        return
+    token, notify = revocation
+    db.add(token)
+    db.flush()
+    # Вне PostgreSQL хватает локального revocation_store и периодической синхронизации
+    if notify is not None:
+        db.execute(notify)
+    revocation_store.add(token.jti, float(payload["exp"]))
+
+
+async def revoke_token_async(db, payload: dict):
+    revocation = _revocation(db, payload)
+    if revocation is None:
+        return
+    token, notify = revocation
+    db.add(token)
+    await db.flush()
+    if notify is not None:
+        await db.execute(notify)
+    revocation_store.add(token.jti, float(payload["exp"]))
+
+
+async def run_revocation_sync():
+    # Фоновая задача: первичная загрузка при старте и далее раз в TOKEN_REVOCATION_SYNC_SECONDS
+    while True:
+        try:
+            await asyncio.to_thread(_sync_once)
+        except Exception:
+            logger.exception("Token revocation sync failed")
+        await asyncio.sleep(settings.TOKEN_REVOCATION_SYNC_SECONDS)
+
+
+def _sync_once():
+    with SessionLocal() as db:
+        revocation_store.sync(db)
@@ -0,0 +1,173 @@
+# app/core/technician_index.py
+
+import json
+import logging
+import math
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+import h3
+from geopy.distance import geodesic
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.notify import pg_listener, pg_notify
+from app.db.session import SessionLocal
+from app.enums import UserRole
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Канал, по которому воркеры сообщают друг другу о новых координатах техников
+TECHNICIAN_POSITION_CHANNEL = "technician_position"
+
+# Пинги местоположения не знают статус техника: в индексе остается прежний
+KEEP_STATUS = object()
+
+
+@dataclass
+class TechnicianPosition:
+    technician_id: int
+    latitude: float
+    longitude: float
+    cell: str
+    status: Optional[str]
+    updated_at: Optional[datetime]
+
+
+class TechnicianIndex:
+    """Пространственный индекс последних координат техников по ячейкам H3 (на процесс).
+
+    Поиск ближайших смотрит только ячейки k-кольца вокруг точки, а не всех техников;
+    точное расстояние считается лишь для кандидатов из этих ячеек.
+    """
+
+    def __init__(self, resolution: int):
+        self.resolution = resolution
+        # Длина ребра ячейки: по ней подбирается k для заданного радиуса
+        self.edge_km = h3.edge_length(resolution, unit="km")
+        self._positions = {}
+        self._cells = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def update(self, technician_id: int, latitude: float, longitude: float,
+               updated_at: Optional[datetime] = None, status=KEEP_STATUS):
+        cell = h3.geo_to_h3(latitude, longitude, self.resolution)
+        with self._lock:
+            previous = self._positions.get(technician_id)
+            # Устаревшее уведомление (пришло позже более свежего) не откатывает позицию назад
+            if previous is not None and previous.updated_at and updated_at and updated_at < previous.updated_at:
+                return
+            if status is KEEP_STATUS:
+                status = previous.status if previous is not None else None
+            if previous is not None and previous.cell != cell:
+                self._discard(previous)
+            self._positions[technician_id] = TechnicianPosition(
+                technician_id, latitude, longitude, cell, status, updated_at
+            )
+            self._cells[cell].add(technician_id)
+
+    def _discard(self, position: TechnicianPosition):
+        # Вызывается под блокировкой
+        members = self._cells.get(position.cell)
+        if members is not None:
+            members.discard(position.technician_id)
+            if not members:
+                del self._cells[position.cell]
+
+    def ring_size(self, radius_km: float) -> int:
+        # Точки на расстоянии r лежат в ячейках, центры которых не дальше r + 2 ребер;
+        # шаг между центрами соседних колец не меньше 1.5 ребра
+        return math.ceil((radius_km + 2 * self.edge_km) / (1.5 * self.edge_km))
+
+    def nearby(self, latitude: float, longitude: float, radius_km: float,
+               statuses: Optional[List[str]] = None, limit: Optional[int] = None) -> list:
+        """Техники в радиусе radius_km, ближайшие первыми: список (расстояние в км, TechnicianPosition)."""
+        k = self.ring_size(radius_km)
+        with self._lock:
+            # Большое кольцо дороже полного обхода занятых ячеек
+            if 3 * k * (k + 1) + 1 > len(self._cells):
+                candidates = list(self._positions.values())
+            else:
+                origin = h3.geo_to_h3(latitude, longitude, self.resolution)
+                candidates = [
+                    self._positions[technician_id]
+                    for cell in h3.k_ring(origin, k)
+                    for technician_id in self._cells.get(cell, ())
+                ]
+        found = []
+        for position in candidates:
+            if statuses and position.status not in statuses:
+                continue
+            distance = geodesic((latitude, longitude), (position.latitude, position.longitude)).km
+            if distance <= radius_km:
+                found.append((distance, position))
+        found.sort(key=lambda item: item[0])
+        return found[:limit] if limit else found
+
+    def load(self, db: Session):
+        # Полная загрузка координат техников (при старте и после переподключения слушателя)
+        rows = db.execute(
+            select(User.id, User.latitude, User.longitude, User.location_updated_at, User.status).where(
+                User.role == UserRole.technician,
+                User.latitude.isnot(None),
+                User.longitude.isnot(None),
+            )
+        ).all()
+        for technician_id, latitude, longitude, updated_at, status in rows:
+            self.update(technician_id, latitude, longitude, updated_at, status)
+        logger.info("Technician index loaded: %s positions", len(rows))
+
+    def reload(self):
+        with SessionLocal() as db:
+            self.load(db)
+
+    def on_notify(self, payload: str):
+        data = parse_position(payload)
+        self.update(
+            data["technician_id"], data["latitude"], data["longitude"], data["updated_at"],
+            data.get("status", KEEP_STATUS),
+        )
+
+    def stats(self) -> dict:
+        return {
+            "technicians": len(self._positions),
+            "cells": len(self._cells),
+            "resolution": self.resolution,
+        }
+
+
+def position_notify(db, technician_id: int, latitude: float, longitude: float, updated_at: Optional[datetime], **extra):
+    # Остальные воркеры обновят свои индексы после COMMIT транзакции с новыми координатами; None вне PostgreSQL
+    payload = {
+        "technician_id": technician_id,
+        "latitude": latitude,
+        "longitude": longitude,
+        "updated_at": updated_at.isoformat() if updated_at else None,
+        **extra,
+    }
+    return pg_notify(db, TECHNICIAN_POSITION_CHANNEL, json.dumps(payload))
+
+
+def parse_position(payload: str) -> dict:
+    data = json.loads(payload)
+    data["updated_at"] = datetime.fromisoformat(data["updated_at"]) if data.get("updated_at") else None
+    return data
+
+
+def index_technician(technician: User):
+    # Локальный индекс обновляем сразу после COMMIT, не дожидаясь NOTIFY
+    if technician.latitude is not None and technician.longitude is not None:
+        technician_index.update(
+            technician.id, technician.latitude, technician.longitude,
+            technician.location_updated_at, technician.status,
+        )
+
+
+technician_index = TechnicianIndex(settings.TECHNICIAN_INDEX_H3_RESOLUTION)
+
+pg_listener.subscribe(TECHNICIAN_POSITION_CHANNEL, technician_index.on_notify)
+# Координаты, обновленные пока слушатель был отключен, подгружаем из таблицы
+pg_listener.on_reconnect(technician_index.reload)
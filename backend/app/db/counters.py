@@ -0,0 +1,143 @@
+# app/db/counters.py
+
+import logging
+from collections import Counter
+from datetime import date, datetime
+from sqlalchemy import delete, event, func, inspect, insert, literal, select, text
+from sqlalchemy.orm import Session
+from app.models.estimate import Estimate
+from app.models.order import Order
+from app.models.status_counter import StatusCounter
+from app.db.upsert import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+# Модели, для которых ведутся счетчики статусов: модель -> значение StatusCounter.entity
+COUNTED_MODELS = {
+    Order: "order",
+    Estimate: "estimate",
+}
+
+
+def counter_key(entity: str, created_at, status):
+    if created_at is None or status is None:
+        return None
+    return entity, created_at.date() if isinstance(created_at, datetime) else created_at, status
+
+
+def counter_upsert(dialect_name: str, deltas: Counter):
+    """INSERT ... ON CONFLICT DO UPDATE, прибавляющий дельты к счетчикам одним запросом.
+
+    Строки сортируются по ключу, чтобы параллельные транзакции блокировали счетчики в одном порядке.
+    """
+    rows = [
+        {"entity": entity, "day": day, "status": status, "count": count}
+        for (entity, day, status), count in sorted(deltas.items())
+        if count
+    ]
+    if not rows:
+        return None
+    statement = dialect_insert(dialect_name, StatusCounter.__table__).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=["entity", "day", "status"],
+        set_={"count": StatusCounter.__table__.c.count + statement.excluded.count},
+    )
+
+
+def _committed_status(state):
+    history = state.attrs.status.history
+    values = history.deleted or history.unchanged
+    return values[0] if values else None
+
+
+def flush_deltas(session) -> Counter:
+    # Изменения статусов, которые записывает текущий flush
+    deltas = Counter()
+    for obj in session.new:
+        entity = COUNTED_MODELS.get(type(obj))
+        key = entity and counter_key(entity, obj.created_at, obj.status)
+        if key:
+            deltas[key] += 1
+    for obj in session.dirty:
+        entity = COUNTED_MODELS.get(type(obj))
+        if entity is None:
+            continue
+        history = inspect(obj).attrs.status.history
+        if not history.has_changes():
+            continue
+        old_key = counter_key(entity, obj.created_at, history.deleted[0] if history.deleted else None)
+        new_key = counter_key(entity, obj.created_at, obj.status)
+        if old_key:
+            deltas[old_key] -= 1
+        if new_key:
+            deltas[new_key] += 1
+    for obj in session.deleted:
+        entity = COUNTED_MODELS.get(type(obj))
+        key = entity and counter_key(entity, obj.created_at, _committed_status(inspect(obj)))
+        if key:
+            deltas[key] -= 1
+    return deltas
+
+
+def _apply_flush_deltas(session, flush_context):
+    deltas = flush_deltas(session)
+    if not deltas:
+        return
+    connection = session.connection()
+    statement = counter_upsert(connection.dialect.name, deltas)
+    if statement is not None:
+        connection.execute(statement)
+
+
+def enable_status_counters():
+    """Счетчики обновляются после каждого ORM flush в той же транзакции (sync и async сессии).
+
+    Изменения в обход ORM (INSERT/UPDATE пачками) передают дельты явно через add_status_deltas.
+    Прежний статус доступен в истории благодаря active_history=True у status в моделях.
+    """
+    if not event.contains(Session, "after_flush", _apply_flush_deltas):
+        event.listen(Session, "after_flush", _apply_flush_deltas)
+
+
+async def add_status_deltas(db, deltas: Counter):
+    # Явные дельты для set-based изменений в AsyncSession
+    statement = counter_upsert(db.get_bind().dialect.name, deltas)
+    if statement is not None:
+        await db.execute(statement)
+
+
+def status_counts(db, entity: str, statuses=None, start: date = None, end: date = None) -> dict:
+    """Суммы счетчиков по статусам за диапазон дней [start, end]; без диапазона — за все время."""
+    query = select(StatusCounter.status, func.sum(StatusCounter.count)).where(StatusCounter.entity == entity)
+    if statuses is not None:
+        query = query.where(StatusCounter.status.in_(statuses))
+    if start is not None:
+        query = query.where(StatusCounter.day >= start)
+    if end is not None:
+        query = query.where(StatusCounter.day <= end)
+    counts = dict(db.execute(query.group_by(StatusCounter.status)).all())
+    return {status: int(counts.get(status) or 0) for status in (statuses or counts)}
+
+
+def rebuild_status_counters(connection) -> dict:
+    """Пересчитывает все счетчики с нуля по таблицам orders и estimates.
+
+    Блокировка таблицы счетчиков ждет транзакции, уже изменившие счетчики, и задерживает новые
+    до COMMIT пересчета, поэтому ни одна дельта не теряется и не учитывается дважды.
+    """
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("LOCK TABLE status_counters IN EXCLUSIVE MODE"))
+    connection.execute(delete(StatusCounter))
+    report = {}
+    for model, entity in COUNTED_MODELS.items():
+        source = (
+            select(literal(entity), func.date(model.created_at), model.status, func.count())
+            .where(model.created_at.isnot(None), model.status.isnot(None))
+            .group_by(func.date(model.created_at), model.status)
+        )
+        result = connection.execute(
+            insert(StatusCounter).from_select(["entity", "day", "status", "count"], source)
+        )
+        report[entity] = result.rowcount
+    logger.info("Status counters rebuilt: %s", report)
+    return report
@@ -0,0 +1,60 @@
+# app/db/export.py
+
+import csv
+import io
+import json
+from typing import List
+from sqlalchemy import inspect
+from app.core.config import settings
+from app.db.projection import json_default
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def export_columns(model) -> List[str]:
+    # Все скалярные колонки модели, кроме отложенных служебных (search_vector)
+    return [attr.key for attr in inspect(model).column_attrs if not attr.deferred]
+
+
+def _ndjson_chunk(rows, fields: List[str]) -> str:
+    return "".join(
+        json.dumps(
+            {name: row._mapping[name] for name in fields},
+            default=json_default,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ) + "\n"
+        for row in rows
+    )
+
+
+def _csv_lines(lines) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(lines)
+    return buffer.getvalue()
+
+
+def _csv_chunk(rows, fields: List[str]) -> str:
+    return _csv_lines(
+        ["" if row._mapping[name] is None else row._mapping[name] for name in fields]
+        for row in rows
+    )
+
+
+async def stream_export(session_factory, query, fields: List[str], export_format: str):
+    """Асинхронный генератор выгрузки: строки читаются серверным курсором по EXPORT_YIELD_PER штук.
+
+    Генератор открывает собственную сессию: сессия запроса закрывается до того, как
+    StreamingResponse начнет отдавать тело, а курсор должен жить до последней строки.
+    Памяти нужно на одну пачку строк независимо от размера выгрузки.
+    """
+    if export_format == "csv":
+        yield _csv_lines([fields])
+    encode = _csv_chunk if export_format == "csv" else _ndjson_chunk
+    async with session_factory() as db:
+        result = await db.stream(query.execution_options(yield_per=settings.EXPORT_YIELD_PER))
+        async for rows in result.partitions():
+            yield encode(rows, fields)
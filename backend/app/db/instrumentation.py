@@ -0,0 +1,125 @@
+# app/db/instrumentation.py
+
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+
+# Длина SQL, сохраняемого для самого медленного запроса
+MAX_STATEMENT_LENGTH = 500
+
+
+class RequestQueryStats:
+    """Запросы к БД, выполненные в рамках одного HTTP-запроса."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement: Optional[str] = None
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.total_time += seconds
+        if seconds > self.slowest_time:
+            self.slowest_time = seconds
+            self.slowest_statement = statement
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.total_time * 1000:.2f};desc="{self.count} queries", '
+            f'db-slowest;dur={self.slowest_time * 1000:.2f}'
+        )
+
+
+class RouteQueryStats:
+    """Накопленная статистика запросов к БД по одному маршруту."""
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.db_time = 0.0
+        self.max_db_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement: Optional[str] = None
+
+    def add(self, stats: RequestQueryStats):
+        self.requests += 1
+        self.queries += stats.count
+        self.max_queries = max(self.max_queries, stats.count)
+        self.db_time += stats.total_time
+        self.max_db_time = max(self.max_db_time, stats.total_time)
+        if stats.slowest_time > self.slowest_time:
+            self.slowest_time = stats.slowest_time
+            self.slowest_statement = (stats.slowest_statement or "")[:MAX_STATEMENT_LENGTH]
+
+    def as_dict(self, route: str) -> dict:
+        return {
+            "route": route,
+            "requests": self.requests,
+            "queries": self.queries,
+            "avg_queries": round(self.queries / self.requests, 2) if self.requests else 0.0,
+            "max_queries": self.max_queries,
+            "avg_db_ms": round(self.db_time * 1000 / self.requests, 3) if self.requests else 0.0,
+            "max_db_ms": round(self.max_db_time * 1000, 3),
+            "slowest_query_ms": round(self.slowest_time * 1000, 3),
+            "slowest_statement": self.slowest_statement,
+        }
+
+
+# Статистика текущего HTTP-запроса; переменная контекста доходит и до потоков threadpool, и до async-движка
+current_request_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("current_request_stats", default=None)
+
+_route_stats = {}
+_route_stats_lock = threading.Lock()
+
+
+def start_request() -> RequestQueryStats:
+    stats = RequestQueryStats()
+    current_request_stats.set(stats)
+    return stats
+
+
+def finish_request(route: str, stats: RequestQueryStats):
+    with _route_stats_lock:
+        _route_stats.setdefault(route, RouteQueryStats()).add(stats)
+
+
+def route_stats() -> list:
+    # Самые «разговорчивые» маршруты первыми
+    with _route_stats_lock:
+        rows = [item.as_dict(route) for route, item in _route_stats.items()]
+    return sorted(rows, key=lambda row: row["avg_queries"], reverse=True)
+
+
+def reset_route_stats():
+    with _route_stats_lock:
+        _route_stats.clear()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start_time"].pop()
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+def _handle_error(exception_context):
+    # Запрос завершился ошибкой: убираем его отметку времени, чтобы стек не рассинхронизировался
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start_time"):
+        connection.info["query_start_time"].pop()
+
+
+def instrument_engine(engine):
+    # Для AsyncEngine события вешаются на синхронное ядро
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
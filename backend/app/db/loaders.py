@@ -0,0 +1,51 @@
+# app/db/loaders.py
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload, raiseload, selectinload
+from app.models.estimate import Estimate
+from app.models.invoice import Invoice
+from app.models.order import Order
+from app.schemas.estimate import EstimateOut
+from app.schemas.invoice import InvoiceOut
+from app.schemas.order import OrderOut
+
+# Стратегии загрузки связей, которые сериализует каждая схема ответа.
+# many-to-one грузим через JOIN, коллекции — отдельным SELECT ... WHERE id IN (...),
+# чтобы список из N объектов стоил фиксированное число запросов, а не N+1.
+LOADER_OPTIONS = {
+    OrderOut: (
+        joinedload(Order.client),
+        joinedload(Order.technician),
+        selectinload(Order.media_files),
+        selectinload(Order.items),
+    ),
+    EstimateOut: (
+        selectinload(Estimate.items),
+    ),
+    InvoiceOut: (
+        selectinload(Invoice.items),
+    ),
+}
+
+
+def loader_options(schema) -> tuple:
+    return LOADER_OPTIONS[schema]
+
+
+def _raise_on_lazy_load(orm_execute_state):
+    # Догрузки связей и колонок пропускаем: запрещаем только ленивую загрузку у объектов из основных SELECT
+    if (
+        orm_execute_state.is_select
+        and not orm_execute_state.is_relationship_load
+        and not orm_execute_state.is_column_load
+    ):
+        orm_execute_state.statement = orm_execute_state.statement.options(raiseload("*"))
+
+
+def enable_raise_on_lazy_load():
+    """Тестовый режим: любая ленивая загрузка связи, не указанной в LOADER_OPTIONS, падает с ошибкой.
+
+    Эквивалентно lazy="raise" на всех relationship; включается настройкой DB_RAISE_ON_LAZY_LOAD.
+    """
+    if not event.contains(Session, "do_orm_execute", _raise_on_lazy_load):
+        event.listen(Session, "do_orm_execute", _raise_on_lazy_load)
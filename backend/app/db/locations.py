@@ -0,0 +1,104 @@
+# app/db/locations.py
+
+from datetime import datetime, timedelta
+from sqlalchemy import DateTime, Float, Integer, column, or_, select, true, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.upsert import dialect_insert
+from app.enums import UserRole
+from app.models.technician_location import TechnicianLocation
+from app.models.user import User
+
+
+def prepare_fixes(fixes: list) -> list:
+    """Убирает дубликаты по времени фикса и точки из будущего, упорядочивает по времени."""
+    latest_allowed = datetime.utcnow() + timedelta(seconds=settings.TECHNICIAN_LOCATION_MAX_SKEW_SECONDS)
+    unique = {}
+    for fix in fixes:
+        if fix.recorded_at <= latest_allowed:
+            unique.setdefault(fix.recorded_at, fix)
+    return [unique[recorded_at] for recorded_at in sorted(unique)]
+
+
+async def append_location_history(db: AsyncSession, technician_id: int, fixes: list) -> int:
+    """Дописывает точки в журнал technician_locations одним INSERT на пачку; возвращает число новых.
+
+    Точки, уже записанные ранее (ретрай той же пачки), пропускаются через ON CONFLICT DO NOTHING.
+    """
+    rows = [
+        {
+            "technician_id": technician_id,
+            "latitude": fix.latitude,
+            "longitude": fix.longitude,
+            "accuracy": fix.accuracy,
+            "recorded_at": fix.recorded_at,
+        }
+        for fix in fixes
+    ]
+    statement = (
+        dialect_insert(db.get_bind().dialect.name, TechnicianLocation.__table__)
+        .on_conflict_do_nothing(index_elements=["technician_id", "recorded_at"])
+        .returning(TechnicianLocation.__table__.c.id)
+    )
+    return len((await db.execute(statement, rows)).all())
+
+
+def newer_location(recorded_at):
+    # Точки могут приходить не по порядку (офлайн-буфер телефона): users хранит только самую свежую
+    return or_(User.location_updated_at.is_(None), User.location_updated_at < recorded_at)
+
+
+async def flush_latest_locations(db: AsyncSession, locations: list):
+    """Переносит последние координаты в users одним UPDATE ... FROM (VALUES ...).
+
+    Строки идут в порядке id, чтобы сбросы разных воркеров блокировали users в одном порядке.
+    """
+    latest = values(
+        column("id", Integer),
+        column("latitude", Float),
+        column("longitude", Float),
+        column("recorded_at", DateTime),
+        name="latest",
+    ).data(sorted(
+        (location.technician_id, location.latitude, location.longitude, location.recorded_at)
+        for location in locations
+    ))
+    await db.execute(
+        update(User)
+        .where(User.id == latest.c.id, newer_location(latest.c.recorded_at))
+        .values(latitude=latest.c.latitude, longitude=latest.c.longitude, location_updated_at=latest.c.recorded_at)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def replay_location_history(db: Session, since: datetime) -> int:
+    """Переносит в users последние точки журнала, которые не успели попасть туда до остановки процесса.
+
+    Для каждого техника берется одна последняя точка после since (обратный проход по уникальному
+    индексу (technician_id, recorded_at)), так что объем работы не зависит от размера журнала.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return 0
+    technicians = User.__table__.alias("technicians")
+    journal = TechnicianLocation.__table__
+    last_fix = (
+        select(journal.c.latitude, journal.c.longitude, journal.c.recorded_at)
+        .where(journal.c.technician_id == technicians.c.id, journal.c.recorded_at >= since)
+        .order_by(journal.c.recorded_at.desc())
+        .limit(1)
+        .lateral("last_fix")
+    )
+    latest = (
+        select(technicians.c.id, last_fix.c.latitude, last_fix.c.longitude, last_fix.c.recorded_at)
+        .select_from(technicians.join(last_fix, true()))
+        .where(technicians.c.role == UserRole.technician)
+        .subquery("latest")
+    )
+    result = db.execute(
+        update(User)
+        .where(User.id == latest.c.id, newer_location(latest.c.recorded_at))
+        .values(latitude=latest.c.latitude, longitude=latest.c.longitude, location_updated_at=latest.c.recorded_at)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
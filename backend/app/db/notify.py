@@ -0,0 +1,113 @@
+# app/db/notify.py
+
+import logging
+import select
+import threading
+from collections import defaultdict
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+
+logger = logging.getLogger(__name__)
+
+
+def pg_notify(db, channel: str, payload: str):
+    """Оператор NOTIFY для выполнения в сессии db (Session или AsyncSession).
+
+    NOTIFY внутри транзакции доставляется слушателям только после COMMIT. На других СУБД
+    (SQLite при локальной разработке) возвращает None: слушателя там нет, и вызывающий код
+    ограничивается обновлением состояния своего процесса.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    return text("SELECT pg_notify(:channel, :payload)").bindparams(channel=channel, payload=payload)
+
+
+class PgListener:
+    """Фоновый поток, слушающий каналы PostgreSQL LISTEN/NOTIFY.
+
+    Позволяет воркерам uvicorn (и разным хостам) узнавать об изменениях, сделанных другими
+    процессами. Колбэки вызываются в потоке слушателя и должны быть быстрыми и потокобезопасными.
+    """
+
+    def __init__(self):
+        self._callbacks = defaultdict(list)
+        self._reconnect_callbacks = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, channel: str, callback):
+        with self._lock:
+            self._callbacks[channel].append(callback)
+
+    def on_reconnect(self, callback):
+        # Вызывается после каждого (пере)подключения: уведомления за время разрыва могли потеряться
+        with self._lock:
+            self._reconnect_callbacks.append(callback)
+
+    def start(self, url):
+        if make_url(url).get_backend_name() != "postgresql" or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(url,), name="pg-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _dispatch(self, channel: str, payload: str):
+        with self._lock:
+            callbacks = list(self._callbacks.get(channel, ()))
+        for callback in callbacks:
+            try:
+                callback(payload)
+            except Exception:
+                logger.exception("Listener callback for channel %s failed", channel)
+
+    def _run(self, url):
+        # Отдельное соединение вне пула: оно занято LISTEN на все время жизни процесса
+        engine = create_engine(url, poolclass=NullPool)
+        backoff = 1
+        while not self._stop.is_set():
+            raw = None
+            try:
+                raw = engine.raw_connection()
+                connection = raw.dbapi_connection
+                connection.autocommit = True
+                cursor = connection.cursor()
+                listening = set()
+                with self._lock:
+                    reconnect_callbacks = list(self._reconnect_callbacks)
+                for callback in reconnect_callbacks:
+                    callback()
+                backoff = 1
+                while not self._stop.is_set():
+                    with self._lock:
+                        channels = set(self._callbacks) - listening
+                    for channel in channels:
+                        cursor.execute(f'LISTEN "{channel}"')
+                        listening.add(channel)
+                    if select.select([connection], [], [], 1.0) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        notification = connection.notifies.pop(0)
+                        self._dispatch(notification.channel, notification.payload)
+            except Exception:
+                logger.exception("PostgreSQL listener connection failed, reconnecting in %ss", backoff)
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                if raw is not None:
+                    try:
+                        raw.close()
+                    except Exception:
+                        pass
+        engine.dispose()
+
+
+pg_listener = PgListener()
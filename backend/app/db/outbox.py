@@ -0,0 +1,187 @@
+# app/db/outbox.py
+
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db.notify import pg_listener
+from app.models.outbox_event import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+# Канал, в который триггер на outbox_events шлет NOTIFY после COMMIT вставки (миграция 9f1b7d3e2a65)
+OUTBOX_CHANNEL = "outbox_events"
+
+# Подписчики: тип события (или "*") -> async-обработчики пачки событий
+_subscribers = defaultdict(list)
+
+
+def add_event(db, aggregate_type: str, aggregate_id: int, event_type: str, payload: dict) -> OutboxEvent:
+    """Добавляет событие в текущую транзакцию (работает и с Session, и с AsyncSession).
+
+    Событие будет доставлено, только если транзакция с изменением данных зафиксирована.
+    """
+    event = OutboxEvent(
+        aggregate_type=aggregate_type,
+        aggregate_id=aggregate_id,
+        event_type=event_type,
+        payload=payload,
+    )
+    db.add(event)
+    return event
+
+
+def subscribe(event_type: str, handler):
+    """Регистрирует обработчик handler(db, events) для типа события или "*" для всех.
+
+    Обработчик получает AsyncSession транзакции relay: изменения в БД, сделанные им,
+    фиксируются вместе с отметкой о доставке событий.
+    """
+    _subscribers[event_type].append(handler)
+
+
+class OutboxRelay:
+    """Фоновая доставка событий из outbox_events подписчикам в процессе.
+
+    Несколько воркеров могут работать одновременно: пачка захватывается через
+    FOR UPDATE SKIP LOCKED. Доставка «хотя бы один раз»: если пачка целиком не прошла,
+    события доставляются по одному, так что ошибка одного события не задерживает остальные.
+    Событие, не доставленное за OUTBOX_MAX_ATTEMPTS попыток, переводится в dead-letter
+    (dead_at) и больше не выбирается; вернуть его в очередь можно, сбросив dead_at.
+    """
+
+    def __init__(self, session_factory, batch_size: int, poll_interval: float, max_attempts: int):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self._wakeup = None
+        self._loop = None
+        self._cleaned_at = None
+
+    def notify(self, _payload: str = ""):
+        # Вызывается из потока слушателя PostgreSQL
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        while True:
+            # Сбрасываем до выборки: NOTIFY, пришедший во время доставки, запустит следующий проход сразу
+            self._wakeup.clear()
+            try:
+                delivered = await self.relay_batch()
+            except Exception:
+                logger.exception("Outbox relay failed")
+                delivered = 0
+            if delivered >= self.batch_size:
+                continue
+            await self.cleanup()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def relay_batch(self) -> int:
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(OutboxEvent)
+                .where(OutboxEvent.published_at.is_(None), OutboxEvent.dead_at.is_(None))
+                .order_by(OutboxEvent.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            events = result.scalars().all()
+            if not events:
+                return 0
+            ids = [event.id for event in events]
+            attempts = events[0].attempts
+            # Изменения подписчиков откатываются до SAVEPOINT, блокировки пачки сохраняются
+            try:
+                async with db.begin_nested():
+                    await dispatch(db, events)
+                delivered = ids
+            except Exception as exc:
+                if len(ids) == 1:
+                    logger.exception("Outbox subscriber failed for event %s", ids[0])
+                    await self._record_failure(db, ids[0], attempts + 1, exc)
+                    delivered = []
+                else:
+                    logger.warning("Outbox batch %s..%s failed, delivering events one by one", ids[0], ids[-1])
+                    delivered = await self._dispatch_each(db, ids)
+            if delivered:
+                await db.execute(
+                    update(OutboxEvent).where(OutboxEvent.id.in_(delivered)).values(published_at=datetime.utcnow())
+                )
+            await db.commit()
+            # При ошибках следующий проход ждет poll_interval, а не повторяет сбойные события сразу
+            return len(delivered)
+
+    async def _dispatch_each(self, db: AsyncSession, ids: list) -> list:
+        delivered = []
+        for event_id in ids:
+            # Откат SAVEPOINT мог сбросить состояние объектов: перечитываем событие
+            event = await db.get(OutboxEvent, event_id, populate_existing=True)
+            attempts = event.attempts
+            try:
+                async with db.begin_nested():
+                    await dispatch(db, [event])
+            except Exception as exc:
+                logger.exception("Outbox subscriber failed for event %s", event_id)
+                await self._record_failure(db, event_id, attempts + 1, exc)
+            else:
+                delivered.append(event_id)
+        return delivered
+
+    async def _record_failure(self, db: AsyncSession, event_id: int, attempts: int, exc: Exception):
+        # Исчерпавшее попытки событие уходит в dead-letter и больше не блокирует очередь
+        values = {"attempts": attempts, "last_error": repr(exc)}
+        if attempts >= self.max_attempts:
+            values["dead_at"] = datetime.utcnow()
+            logger.error("Outbox event %s moved to dead letter after %s attempts", event_id, attempts)
+        await db.execute(update(OutboxEvent).where(OutboxEvent.id == event_id).values(**values))
+
+    async def cleanup(self):
+        # Доставленные события храним OUTBOX_RETAIN_DAYS дней для разбора; чистим не чаще раза в час
+        now = datetime.utcnow()
+        if self._cleaned_at is not None and now - self._cleaned_at < timedelta(hours=1):
+            return
+        self._cleaned_at = now
+        try:
+            async with self.session_factory() as db:
+                await db.execute(
+                    delete(OutboxEvent).where(
+                        OutboxEvent.published_at < now - timedelta(days=settings.OUTBOX_RETAIN_DAYS)
+                    )
+                )
+                await db.commit()
+        except Exception:
+            logger.exception("Outbox cleanup failed")
+
+
+async def dispatch(db: AsyncSession, events: list):
+    # Подписчики получают события своего типа одной пачкой, в порядке id
+    by_type = defaultdict(list)
+    for event in events:
+        by_type[event.event_type].append(event)
+    for handler in _subscribers.get("*", ()):
+        await handler(db, events)
+    for event_type, typed_events in by_type.items():
+        for handler in _subscribers.get(event_type, ()):
+            await handler(db, typed_events)
+
+
+def create_outbox_relay(session_factory) -> OutboxRelay:
+    relay = OutboxRelay(
+        session_factory,
+        batch_size=settings.OUTBOX_BATCH_SIZE,
+        poll_interval=settings.OUTBOX_POLL_INTERVAL_SECONDS,
+        max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+    )
+    # Новые события будят relay сразу, опрос по таймеру остается страховкой
+    pg_listener.subscribe(OUTBOX_CHANNEL, relay.notify)
+    return relay
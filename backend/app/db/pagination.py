@@ -0,0 +1,92 @@
+# app/db/pagination.py
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import and_, func, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.enums import SortDirection
+
+
+def encode_cursor(sort: str, direction: SortDirection, value, last_id: int) -> str:
+    # Непрозрачный курсор: ключ сортировки последней строки страницы
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, direction.value, value, last_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, direction: SortDirection):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, cursor_direction, value, last_id = json.loads(raw)
+        value = datetime.fromisoformat(value) if value is not None else None
+        last_id = int(last_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != sort or cursor_direction != direction.value:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort parameters")
+    return value, last_id
+
+
+def keyset_order_by(column, id_column, direction: SortDirection):
+    # NULL-значения там же, где их ставит обратный/прямой проход по индексу (column, id) в PostgreSQL
+    if direction == SortDirection.desc:
+        return column.desc().nulls_first(), id_column.desc()
+    return column.asc().nulls_last(), id_column.asc()
+
+
+def keyset_condition(column, id_column, direction: SortDirection, value, last_id: int):
+    """Условие «после курсора» для сортировки по (column, id) с допускающей NULL колонкой."""
+    if direction == SortDirection.desc:
+        # NULLS FIRST: сначала строки с NULL по убыванию id, затем остальные
+        if value is None:
+            return or_(and_(column.is_(None), id_column < last_id), column.isnot(None))
+        return tuple_(column, id_column) < tuple_(value, last_id)
+    # NULLS LAST: строки с NULL идут после всех остальных
+    if value is None:
+        return and_(column.is_(None), id_column > last_id)
+    return or_(tuple_(column, id_column) > tuple_(value, last_id), column.is_(None))
+
+
+class KeysetPage:
+    """Параметры страницы: limit, курсор, ключ и направление сортировки."""
+
+    def __init__(self, sort: str, direction: SortDirection, limit: int, cursor: Optional[str], include_total: bool):
+        self.sort = sort
+        self.direction = direction
+        self.limit = limit
+        self.include_total = include_total
+        self.after = decode_cursor(cursor, sort, direction) if cursor else None
+
+    def apply(self, query, column, id_column):
+        if self.after is not None:
+            query = query.where(keyset_condition(column, id_column, self.direction, *self.after))
+        # Лишняя строка показывает, есть ли следующая страница
+        return query.order_by(*keyset_order_by(column, id_column, self.direction)).limit(self.limit + 1)
+
+    def finish(self, rows: list, sort_value, request: Request, response: Response) -> list:
+        # Тело ответа остается списком; курсор следующей страницы — в X-Next-Cursor и Link
+        if len(rows) > self.limit:
+            rows = rows[:self.limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(self.sort, self.direction, sort_value(last), last.id)
+            response.headers["X-Next-Cursor"] = next_cursor
+            response.headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+        return rows
+
+
+async def estimate_count(db: AsyncSession, query) -> int:
+    """Оценка числа строк запроса по плану PostgreSQL (без полного COUNT); на других СУБД — точный COUNT."""
+    connection = await db.connection()
+    if connection.dialect.name != "postgresql":
+        return (await db.execute(select(func.count()).select_from(query.subquery()))).scalar_one()
+    compiled = query.compile(dialect=connection.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup) if compiled.positional else compiled.params
+    result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled.string}", params)
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
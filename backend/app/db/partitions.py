@@ -0,0 +1,127 @@
+# app/db/partitions.py
+
+import asyncio
+import logging
+import re
+from datetime import date, datetime
+from sqlalchemy import text
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Таблицы, секционированные по месяцам: таблица -> (колонка ключа, настройка срока хранения).
+# orders сюда не входит: на orders.id ссылаются внешние ключи order_items, media, payments,
+# invoices, reports и reviews, а PostgreSQL требует, чтобы ключ секционирования входил в
+# уникальный ключ, на который ссылается FK.
+PARTITIONED_TABLES = {
+    "messages": ("sent_at", "MESSAGES_RETAIN_MONTHS"),
+    "notifications": ("created_at", "NOTIFICATIONS_RETAIN_MONTHS"),
+    "technician_locations": ("recorded_at", "TECHNICIAN_LOCATIONS_RETAIN_MONTHS"),
+}
+
+# Ключ advisory-lock, чтобы обслуживание секций из нескольких воркеров не конфликтовало
+MAINTENANCE_LOCK_ID = 7_420_001
+
+PARTITION_NAME_RE = re.compile(r"_p(\d{4})_(\d{2})$")
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    month_index = value.year * 12 + value.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def create_partition(connection, table: str, month: date):
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    ))
+
+
+def create_default_partition(connection, table: str):
+    # Страховка для строк вне созданных диапазонов; при регулярном обслуживании остается пустой
+    connection.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+
+
+def list_partitions(connection, table: str) -> dict:
+    # Месячные секции таблицы: имя -> первый день месяца (по соглашению об именах)
+    rows = connection.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = :table"
+    ), {"table": table}).scalars()
+    partitions = {}
+    for name in rows:
+        match = PARTITION_NAME_RE.search(name)
+        if match:
+            partitions[name] = date(int(match.group(1)), int(match.group(2)), 1)
+    return partitions
+
+
+def ensure_partitions(connection, table: str, months_ahead: int = None, start: date = None):
+    # Создаем секции от start (по умолчанию — текущий месяц) до months_ahead месяцев вперед
+    months_ahead = settings.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    current = month_start(datetime.utcnow())
+    month = month_start(start) if start else current
+    last = add_months(current, months_ahead)
+    while month <= last:
+        create_partition(connection, table, month)
+        month = add_months(month, 1)
+
+
+def detach_old_partitions(connection, table: str, retain_months: int, archive_schema: str = None) -> list:
+    """Отсоединяет секции старше retain_months месяцев.
+
+    Отсоединенная секция переносится в archive_schema (или удаляется, если схема не задана),
+    так что индексы и VACUUM основной таблицы касаются только свежих данных.
+    """
+    if retain_months <= 0:
+        return []
+    cutoff = add_months(month_start(datetime.utcnow()), -retain_months)
+    detached = []
+    for name, month in sorted(list_partitions(connection, table).items(), key=lambda item: item[1]):
+        if month >= cutoff:
+            continue
+        connection.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+        if archive_schema:
+            connection.execute(text(f"CREATE SCHEMA IF NOT EXISTS {archive_schema}"))
+            connection.execute(text(f"ALTER TABLE {name} SET SCHEMA {archive_schema}"))
+        else:
+            connection.execute(text(f"DROP TABLE {name}"))
+        detached.append(name)
+        logger.info("Detached partition %s of %s", name, table)
+    return detached
+
+
+def maintain_partitions(engine) -> dict:
+    # Создание будущих секций и архивирование старых для всех секционированных таблиц
+    if engine.dialect.name != "postgresql":
+        return {}
+    report = {}
+    with engine.begin() as connection:
+        connection.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": MAINTENANCE_LOCK_ID})
+        for table, (_, retain_setting) in PARTITIONED_TABLES.items():
+            ensure_partitions(connection, table)
+            report[table] = detach_old_partitions(
+                connection, table, getattr(settings, retain_setting), settings.PARTITION_ARCHIVE_SCHEMA
+            )
+    return report
+
+
+async def run_partition_maintenance(engine):
+    # Фоновая задача: обслуживание секций при старте и далее раз в PARTITION_MAINTENANCE_INTERVAL_HOURS
+    while True:
+        try:
+            report = await asyncio.to_thread(maintain_partitions, engine)
+            logger.info("Partition maintenance done: %s", report)
+        except Exception:
+            logger.exception("Partition maintenance failed")
+        await asyncio.sleep(settings.PARTITION_MAINTENANCE_INTERVAL_HOURS * 3600)
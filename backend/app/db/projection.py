@@ -0,0 +1,40 @@
+# app/db/projection.py
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import List, Optional
+from fastapi import HTTPException, Response
+from sqlalchemy import inspect
+
+
+def parse_fields(model, fields: Optional[str]) -> Optional[List[str]]:
+    """Разбирает fields=id,status,... в список колонок модели (только скалярные колонки, без связей)."""
+    if not fields:
+        return None
+    # Отложенные колонки (например, search_vector) служебные и в выборку не попадают
+    columns = [attr.key for attr in inspect(model).column_attrs if not attr.deferred]
+    requested = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in requested if name not in columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested or None
+
+
+def json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def projected_response(rows, fields: List[str], response: Response) -> Response:
+    # Строки SELECT сериализуются напрямую, минуя ORM-объекты и валидацию response_model
+    content = json.dumps(
+        [{name: row._mapping[name] for name in fields} for row in rows],
+        default=json_default,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return Response(content=content, media_type="application/json", headers=dict(response.headers))
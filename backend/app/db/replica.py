@@ -0,0 +1,74 @@
+# app/db/replica.py
+
+import logging
+import time
+from typing import Optional
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Отставание реплики в секундах; если весь полученный WAL уже применен, реплика актуальна
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaRouter:
+    """Решает, можно ли читать с реплики, исходя из ее отставания от primary.
+
+    Отставание проверяется не чаще одного раза в check_interval секунд; при ошибке
+    соединения или превышении max_lag чтение уходит на primary до следующей проверки.
+    """
+
+    def __init__(self, max_lag: float, check_interval: float):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag: Optional[float] = None
+        self.healthy = False
+        self.last_error: Optional[str] = None
+        self.checked_at = 0.0
+
+    def _check_due(self) -> bool:
+        return time.monotonic() - self.checked_at >= self.check_interval
+
+    def _record(self, lag: Optional[float], error: Optional[Exception] = None):
+        self.checked_at = time.monotonic()
+        self.lag = float(lag) if lag is not None else None
+        self.healthy = error is None
+        self.last_error = str(error) if error else None
+        if error:
+            logger.warning("Replica lag check failed, reads fall back to primary: %s", error)
+        elif not self.is_fresh():
+            logger.warning("Replica lag %.2fs exceeds %.2fs, reads fall back to primary", self.lag, self.max_lag)
+
+    def is_fresh(self, max_lag: Optional[float] = None) -> bool:
+        limit = self.max_lag if max_lag is None else max_lag
+        return self.healthy and self.lag is not None and self.lag <= limit
+
+    def use_replica(self, engine, max_lag: Optional[float] = None) -> bool:
+        if self._check_due():
+            try:
+                with engine.connect() as connection:
+                    self._record(connection.execute(REPLICA_LAG_QUERY).scalar())
+            except Exception as e:
+                self._record(None, e)
+        return self.is_fresh(max_lag)
+
+    async def use_replica_async(self, async_engine, max_lag: Optional[float] = None) -> bool:
+        if self._check_due():
+            try:
+                async with async_engine.connect() as connection:
+                    self._record((await connection.execute(REPLICA_LAG_QUERY)).scalar())
+            except Exception as e:
+                self._record(None, e)
+        return self.is_fresh(max_lag)
+
+    def status(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "max_lag_seconds": self.max_lag,
+            "fresh": self.is_fresh(),
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,106 @@
+# app/db/search.py
+
+import re
+from sqlalchemy import column, func, literal_column, or_, select, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.order import Order
+
+# Конфигурация to_tsvector/to_tsquery: simple не стеммит слова, зато одинаково работает для
+# русских и английских текстов, номеров домов и артикулов; должна совпадать с триггером в миграции
+SEARCH_CONFIG = "simple"
+
+# Веса полей: service_type (A) > address (B) > description (C); для SQLite — веса bm25 в том же порядке
+FTS5_WEIGHTS = (10.0, 5.0, 1.0)
+
+orders_fts = table("orders_fts", column("rowid"))
+
+SQLITE_FTS_SETUP = [
+    "CREATE VIRTUAL TABLE orders_fts USING fts5("
+    "service_type, address, description, content='orders', content_rowid='id')",
+    "CREATE TRIGGER orders_fts_ai AFTER INSERT ON orders BEGIN "
+    "INSERT INTO orders_fts(rowid, service_type, address, description) "
+    "VALUES (new.id, new.service_type, new.address, new.description); END",
+    "CREATE TRIGGER orders_fts_ad AFTER DELETE ON orders BEGIN "
+    "INSERT INTO orders_fts(orders_fts, rowid, service_type, address, description) "
+    "VALUES ('delete', old.id, old.service_type, old.address, old.description); END",
+    "CREATE TRIGGER orders_fts_au AFTER UPDATE OF service_type, address, description ON orders BEGIN "
+    "INSERT INTO orders_fts(orders_fts, rowid, service_type, address, description) "
+    "VALUES ('delete', old.id, old.service_type, old.address, old.description); "
+    "INSERT INTO orders_fts(rowid, service_type, address, description) "
+    "VALUES (new.id, new.service_type, new.address, new.description); END",
+    "INSERT INTO orders_fts(orders_fts) VALUES ('rebuild')",
+]
+
+
+def ensure_sqlite_fts(engine):
+    """Локальная разработка на SQLite: индекс FTS5 по заказам вместо tsvector/GIN из миграции."""
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as connection:
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'orders_fts'")
+        ).first()
+        if not exists:
+            for statement in SQLITE_FTS_SETUP:
+                connection.execute(text(statement))
+
+
+def search_terms(query: str) -> list:
+    # Только буквы и цифры: спецсимволы синтаксиса tsquery/FTS5 из пользовательского ввода не пропускаем
+    return re.findall(r"\w+", query.lower())
+
+
+def postgres_match(terms: list, conditions: list, limit: int):
+    # Префиксный поиск по каждому слову («лени» найдет «Ленина»), ранжирование по ts_rank_cd
+    tsquery = func.to_tsquery(SEARCH_CONFIG, " & ".join(f"{term}:*" for term in terms))
+    rank = func.ts_rank_cd(Order.search_vector, tsquery)
+    return (
+        select(Order.id)
+        .where(Order.search_vector.op("@@")(tsquery), *conditions)
+        .order_by(rank.desc(), Order.id.desc())
+        .limit(limit)
+    )
+
+
+def postgres_trigram(query: str, conditions: list, limit: int):
+    # Фрагменты и опечатки в адресе: ILIKE и оператор сходства pg_trgm используют GIN-индекс по триграммам
+    return (
+        select(Order.id)
+        .where(or_(Order.address.icontains(query, autoescape=True), Order.address.op("%")(query)), *conditions)
+        .order_by(func.similarity(Order.address, query).desc(), Order.id.desc())
+        .limit(limit)
+    )
+
+
+def sqlite_match(terms: list, conditions: list, limit: int):
+    match = " ".join(f'"{term}"*' for term in terms)
+    return (
+        select(Order.id)
+        .join(orders_fts, orders_fts.c.rowid == Order.id)
+        .where(literal_column("orders_fts").op("MATCH")(match), *conditions)
+        .order_by(func.bm25(literal_column("orders_fts"), *FTS5_WEIGHTS), Order.id.desc())
+        .limit(limit)
+    )
+
+
+def sqlite_substring(query: str, conditions: list, limit: int):
+    return (
+        select(Order.id)
+        .where(Order.address.icontains(query, autoescape=True), *conditions)
+        .order_by(Order.id.desc())
+        .limit(limit)
+    )
+
+
+async def search_order_ids(db: AsyncSession, query: str, conditions: list, limit: int) -> list:
+    """id заказов по релевантности: полнотекстовый поиск, а если он ничего не нашел — поиск по фрагменту адреса."""
+    terms = search_terms(query)
+    if not terms:
+        return []
+    postgres = (await db.connection()).dialect.name == "postgresql"
+    match = postgres_match if postgres else sqlite_match
+    ids = (await db.execute(match(terms, conditions, limit))).scalars().all()
+    if ids:
+        return ids
+    fallback = postgres_trigram if postgres else sqlite_substring
+    return (await db.execute(fallback(query.strip(), conditions, limit))).scalars().all()
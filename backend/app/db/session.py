@@ -1,10 +1,81 @@
 # app/db/session.py
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.db.pool import InstrumentedQueuePool, InstrumentedAsyncQueuePool
+from app.db.replica import ReplicaRouter
+from app.db.instrumentation import instrument_engine
+from app.db.counters import enable_status_counters
 
 DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(DATABASE_URL)
+# Асинхронные драйверы для поддерживаемых СУБД
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def to_async_url(url: str):
+    # Подменяем синхронный драйвер (psycopg2) на асинхронный (asyncpg)
+    sync_url = make_url(url)
+    return sync_url.set(drivername=ASYNC_DRIVERS.get(sync_url.get_backend_name(), sync_url.drivername))
+
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or to_async_url(DATABASE_URL)
+
+def pool_options() -> dict:
+    # Параметры пула берутся из Settings, чтобы подбирать их под число воркеров uvicorn
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+engine = create_engine(DATABASE_URL, poolclass=InstrumentedQueuePool, **pool_options())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Асинхронный движок для async-обработчиков, чтобы запросы не блокировали event loop
+async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=InstrumentedAsyncQueuePool, **pool_options())
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+# Read-реплика (опционально): отдельные движки и маршрутизатор с проверкой отставания
+replica_engine = None
+async_replica_engine = None
+ReplicaSessionLocal = None
+AsyncReplicaSessionLocal = None
+replica_router = None
+
+if settings.DATABASE_REPLICA_URL:
+    replica_engine = create_engine(settings.DATABASE_REPLICA_URL, poolclass=InstrumentedQueuePool, **pool_options())
+    ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+
+    async_replica_engine = create_async_engine(
+        settings.ASYNC_DATABASE_REPLICA_URL or to_async_url(settings.DATABASE_REPLICA_URL),
+        poolclass=InstrumentedAsyncQueuePool,
+        **pool_options()
+    )
+    AsyncReplicaSessionLocal = async_sessionmaker(
+        bind=async_replica_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+    replica_router = ReplicaRouter(settings.REPLICA_MAX_LAG_SECONDS, settings.REPLICA_LAG_CHECK_INTERVAL)
+
+# Подсчет количества и времени SQL-запросов на каждый HTTP-запрос
+if settings.DB_QUERY_STATS_ENABLED:
+    for instrumented_engine in (engine, async_engine, replica_engine, async_replica_engine):
+        if instrumented_engine is not None:
+            instrument_engine(instrumented_engine)
+
+# Счетчики статусов заказов и смет ведутся для любых сессий: API, скриптов и фоновых задач
+enable_status_counters()
@@ -0,0 +1,14 @@
+# app/db/upsert.py
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+# INSERT с поддержкой ON CONFLICT для поддерживаемых СУБД
+DIALECT_INSERTS = {
+    "postgresql": pg_insert,
+    "sqlite": sqlite_insert,
+}
+
+
+def dialect_insert(dialect_name: str, table):
+    return DIALECT_INSERTS[dialect_name](table)
@@ -0,0 +1,49 @@
+# app/db/versions.py
+
+from sqlalchemy import func, select
+from app.models.estimate import Estimate
+from app.models.estimate_item import EstimateItem
+from app.models.invoice import Invoice, InvoiceItem
+from app.models.media import Media
+from app.models.order import Order
+from app.models.order_item import OrderItem
+from app.models.user import User
+
+# Легкие запросы версии для ETag: поля для проверки прав доступа плюс все, от чего зависит ответ
+# (updated_at самой записи и состав дочерних коллекций), без загрузки и сериализации объекта.
+
+
+def _children(column, parent_id):
+    # Число и максимальный id дочерних строк: меняются при добавлении, удалении и пересоздании позиций
+    return (
+        select(func.count()).select_from(column.table).where(column == parent_id).scalar_subquery(),
+        select(func.max(column.table.c.id)).where(column == parent_id).scalar_subquery(),
+    )
+
+
+def order_version_query(order_id: int):
+    return select(
+        Order.client_id,
+        Order.technician_id,
+        Order.updated_at,
+        select(User.updated_at).where(User.id == Order.technician_id).scalar_subquery(),
+        *_children(Media.order_id, Order.id),
+        *_children(OrderItem.order_id, Order.id),
+    ).where(Order.id == order_id)
+
+
+def estimate_version_query(estimate_id: int):
+    return select(
+        Estimate.client_id,
+        Estimate.technician_id,
+        Estimate.updated_at,
+        *_children(EstimateItem.estimate_id, Estimate.id),
+    ).where(Estimate.id == estimate_id)
+
+
+def invoice_version_query(invoice_id: int):
+    return select(
+        Invoice.client_id,
+        Invoice.updated_at,
+        *_children(InvoiceItem.invoice_id, Invoice.id),
+    ).where(Invoice.id == invoice_id)
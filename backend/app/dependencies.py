@@ -6,7 +6,18 @@ from sqlalchemy.orm import Session
 from app.models.user import User
 from app.core.security import oauth2_scheme
 from app.core.config import settings
-from app.db.session import SessionLocal
+from app.core.identity_cache import identity_cache, user_snapshot, cached_user
+from app.core.principal import Principal
+from app.core.revocation import revocation_store
+from app.db.session import (
+    SessionLocal,
+    AsyncSessionLocal,
+    ReplicaSessionLocal,
+    AsyncReplicaSessionLocal,
+    replica_engine,
+    async_replica_engine,
+    replica_router,
+)
 from typing import List
 from app.enums import UserRole
 
@@ -18,34 +29,99 @@ def get_db():
     finally:
         db.close()
 
-# Получение текущего пользователя
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+# Получение асинхронной сессии базы данных для async-обработчиков
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def replica_unavailable():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Read replica is lagging behind, try again later"
+    )
+
+# Сессия только для чтения: реплика, если она настроена и отстает не более чем на REPLICA_MAX_LAG_SECONDS,
+# иначе primary (или 503, если REPLICA_FALLBACK_TO_PRIMARY выключен)
+def get_read_db():
+    session_factory = SessionLocal
+    if replica_router is not None:
+        if replica_router.use_replica(replica_engine):
+            session_factory = ReplicaSessionLocal
+        elif not settings.REPLICA_FALLBACK_TO_PRIMARY:
+            raise replica_unavailable()
+    db = session_factory()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Фабрика async-сессий для чтения: реплика, если она доступна и не отстает, иначе основная БД
+async def get_async_read_session_factory():
+    if replica_router is not None:
+        if await replica_router.use_replica_async(async_replica_engine):
+            return AsyncReplicaSessionLocal
+        if not settings.REPLICA_FALLBACK_TO_PRIMARY:
+            raise replica_unavailable()
+    return AsyncSessionLocal
+
+# Асинхронный вариант get_read_db
+async def get_async_read_db():
+    session_factory = await get_async_read_session_factory()
+    async with session_factory() as db:
+        yield db
+
+def credentials_error():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+# Проверка подписи, срока действия и отзыва токена (отзыв — поиск jti в памяти, без запроса к БД)
+def decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except JWTError:
+        raise credentials_error()
+    jti = payload.get("jti")
+    if jti is not None and revocation_store.is_revoked(jti):
+        raise credentials_error()
+    return payload
+
+# Получение текущего пользователя (синхронная зависимость: FastAPI выполняет ее в пуле потоков).
+# Async-обработчикам, которым хватает id и роли, нужен get_principal — без запроса к БД
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    credentials_exception = credentials_error()
+    payload = decode_token(token)
+    email: str = payload.get("sub")
+    if email is None:
         raise credentials_exception
+    # Сначала кэш: повторные запросы с тем же токеном не обращаются к таблице users
+    snapshot = identity_cache.get(email)
+    if snapshot is not None:
+        return cached_user(db, snapshot)
     user = db.query(User).filter(User.email == email).first()
     if user is None:
         raise credentials_exception
+    identity_cache.set(email, user_snapshot(user))
     return user
 
-# Проверка роли пользователя
+# Текущий пользователь только по claims токена, без запроса к БД
+def get_principal(token: str = Depends(oauth2_scheme)) -> Principal:
+    principal = Principal.from_claims(decode_token(token))
+    if principal is None:
+        raise credentials_error()
+    return principal
+
+# Проверка роли пользователя (по claim role, без загрузки User)
 def role_required(allowed_roles: List[UserRole]):
-    def role_checker(user: User = Depends(get_current_user)):
-        if user.role not in allowed_roles:
+    def role_checker(principal: Principal = Depends(get_principal)):
+        if principal.role not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Insufficient permissions to perform this action"
             )
-        return user
+        return principal
     return role_checker
 
 # Получение текущего администратора
@@ -8,3 +8,15 @@ class UserRole(str, Enum):
     technician = 'technician'
     client = 'client'
     marketer = 'marketer'
+
+class SortDirection(str, Enum):
+    asc = 'asc'
+    desc = 'desc'
+
+class OrderSortKey(str, Enum):
+    created_at = 'created_at'
+    preferred_start_time = 'preferred_start_time'
+
+class ExportFormat(str, Enum):
+    ndjson = 'ndjson'
+    csv = 'csv'
@@ -1,14 +1,57 @@
 # app/main.py
 
-from fastapi import FastAPI
+import asyncio
+import contextlib
+import logging
+from fastapi import FastAPI, Request
 from app.routers import auth, users, admin, order, media, technician, payment, invoice, chat, reports, reviews, estimate
 from app.core.config import settings
+from app.db import instrumentation
+from app.db.loaders import enable_raise_on_lazy_load
+from app.core.hashing import password_hasher
+from app.core.revocation import run_revocation_sync
+from app.core.rate_limit import rate_limiter
+from app.core.redis import close_redis
+from app.core.technician_index import technician_index
+from app.core.location_store import location_store
+from app.core.location_hub import location_hub
+from app.db.notify import pg_listener
+from app.db.partitions import run_partition_maintenance
+from app.db.search import ensure_sqlite_fts
+from app.db.outbox import create_outbox_relay
+from app.db.session import engine, SessionLocal, AsyncSessionLocal
 from fastapi.staticfiles import StaticFiles
 from app.routers import ads, notifications, finance, integrations
 from app.api import payments, webhooks
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI()
 
+# В тестовом режиме любая незапланированная ленивая загрузка связи падает, чтобы N+1 не проходил незамеченным
+if settings.DB_RAISE_ON_LAZY_LOAD:
+    enable_raise_on_lazy_load()
+
+# Учет запросов к БД: заголовок Server-Timing и агрегаты по маршрутам (/admin/db/queries)
+if settings.DB_QUERY_STATS_ENABLED:
+    @app.middleware("http")
+    async def db_query_stats(request: Request, call_next):
+        stats = instrumentation.start_request()
+        response = await call_next(request)
+        route = request.scope.get("route")
+        route_key = f"{request.method} {route.path if route else '<unmatched>'}"
+        instrumentation.finish_request(route_key, stats)
+        response.headers.append("Server-Timing", stats.server_timing())
+        if stats.count > settings.DB_QUERY_COUNT_WARNING:
+            logger.warning("%s made %d DB queries (%.1f ms)", route_key, stats.count, stats.total_time * 1000)
+        return response
+
+# Ограничение частоты запросов и перегрузки воркера; подключается последним, чтобы отсекать запросы раньше остальных middleware
+if settings.RATE_LIMIT_ENABLED:
+    @app.middleware("http")
+    async def rate_limit(request: Request, call_next):
+        return await rate_limiter.dispatch(request, call_next)
+
 # Подключение маршрутов
 app.include_router(auth.router)
 app.include_router(users.router)
@@ -34,6 +77,70 @@ app.include_router(webhooks.router)
 # Подключение статических файлов
 app.mount("/media", StaticFiles(directory=settings.MEDIA_ROOT), name="media")
 
+# Локально на SQLite поиск заказов работает через FTS5 (в PostgreSQL индекс создает миграция)
+@app.on_event("startup")
+async def setup_order_search():
+    await asyncio.to_thread(ensure_sqlite_fts, engine)
+
+# Фоновое создание будущих секций (messages, notifications, technician_locations) и архивирование старых
+@app.on_event("startup")
+async def start_partition_maintenance():
+    app.state.partition_maintenance = asyncio.create_task(run_partition_maintenance(engine))
+
+@app.on_event("shutdown")
+async def stop_partition_maintenance():
+    app.state.partition_maintenance.cancel()
+
+# Слушатель PostgreSQL NOTIFY: сброс кэшей, измененных другими воркерами
+@app.on_event("startup")
+async def start_pg_listener():
+    pg_listener.start(settings.DATABASE_URL)
+
+@app.on_event("shutdown")
+async def stop_pg_listener():
+    pg_listener.stop()
+
+# Загрузка и периодическая синхронизация отозванных токенов
+@app.on_event("startup")
+async def start_revocation_sync():
+    app.state.revocation_sync = asyncio.create_task(run_revocation_sync())
+
+@app.on_event("shutdown")
+async def stop_revocation_sync():
+    app.state.revocation_sync.cancel()
+
+@app.on_event("shutdown")
+async def stop_password_hasher():
+    password_hasher.shutdown()
+
+@app.on_event("shutdown")
+async def shutdown_redis():
+    await close_redis()
+
+# Последние координаты техников: восстановление из журнала, фоновый сброс в users,
+# загрузка пространственного индекса и раздача SSE-подписчикам (дальше — по NOTIFY от воркеров)
+@app.on_event("startup")
+async def start_location_store():
+    location_hub.start(asyncio.get_running_loop())
+    app.state.location_flush = await location_store.start(AsyncSessionLocal, SessionLocal)
+    await asyncio.to_thread(technician_index.reload)
+
+@app.on_event("shutdown")
+async def stop_location_store():
+    # Задача делает финальный сброс при отмене; дожидаемся его
+    app.state.location_flush.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await app.state.location_flush
+
+# Доставка событий заказов из outbox подписчикам (уведомления и др.)
+@app.on_event("startup")
+async def start_outbox_relay():
+    app.state.outbox_relay = asyncio.create_task(create_outbox_relay(AsyncSessionLocal).run())
+
+@app.on_event("shutdown")
+async def stop_outbox_relay():
+    app.state.outbox_relay.cancel()
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the API"}
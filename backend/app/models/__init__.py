@@ -11,10 +11,14 @@ from .material import Material
 from .media import Media
 from .notification import Notification
 from .order import Order
+from .outbox_event import OutboxEvent
 from .payment import Payment
 from .report import Report
 from .review import Review
+from .revoked_token import RevokedToken
 from .service import Service
+from .status_counter import StatusCounter
+from .technician_location import TechnicianLocation
 from .user_device import UserDevice
 from .user import User
 from app.db.base_class import Base
@@ -23,6 +27,7 @@ __all__ = [
     "Base",
     "User",
     "Order",
+    "OutboxEvent",
     "Media",
     "Notification",
     "Ad",
@@ -40,7 +45,10 @@ __all__ = [
     "Payment",
     "Report",
     "Review",
+    "RevokedToken",
     "Service",
+    "StatusCounter",
+    "TechnicianLocation",
     "UserDevice"
 ]
 
@@ -1,6 +1,6 @@
 # models/chat.py
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Table, Index
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
 from datetime import datetime
@@ -22,12 +22,16 @@ class Conversation(Base):
 
 class Message(Base):
     __tablename__ = 'messages'
+    __table_args__ = (
+        Index('ix_messages_conversation_id_sent_at', 'conversation_id', 'sent_at'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, ForeignKey('conversations.id'))
     sender_id = Column(Integer, ForeignKey('users.id'))
     content = Column(String, nullable=True)
-    sent_at = Column(DateTime, default=datetime.utcnow)
+    # Ключ помесячного секционирования таблицы messages
+    sent_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     conversation = relationship('Conversation', back_populates='messages')
     sender = relationship('User')
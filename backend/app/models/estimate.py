@@ -1,5 +1,5 @@
 from sqlalchemy import Column, Integer, Float, String, DateTime, Text, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import column_property, relationship
 from app.db.base_class import Base
 from datetime import datetime
 
@@ -7,14 +7,15 @@ class Estimate(Base):
     __tablename__ = 'estimates'
 
     id = Column(Integer, primary_key=True, index=True)
-    client_id = Column(Integer, ForeignKey('users.id'), nullable=False)  # Связь с таблицей пользователей (клиенты)
-    technician_id = Column(Integer, ForeignKey('users.id'), nullable=False)  # Связь с таблицей пользователей (техники)
+    client_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)  # Связь с таблицей пользователей (клиенты)
+    technician_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)  # Связь с таблицей пользователей (техники)
     
     discount = Column(Float, default=0.0)
     tax = Column(Float, default=0.0)
     total = Column(Float, nullable=False)
     
-    status = Column(String, default='draft')  # Статус сметы: 'draft', 'sent', 'approved', 'rejected'
+    # Статус сметы: 'draft', 'sent', 'approved', 'rejected'; active_history — для счетчиков статусов
+    status = column_property(Column(String, default='draft'), active_history=True)
     description = Column(Text)
     payment_terms = Column(Text)
     
@@ -16,6 +16,7 @@ class Invoice(Base):
     discount = Column(Float, default=0.0)
     notes = Column(String)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
 
     # Связи
     items = relationship("InvoiceItem", back_populates="invoice")
@@ -18,7 +18,7 @@ class Media(Base):
     uploader = relationship('User', back_populates='media_files')
 
     # Связь с заказом
-    order_id = Column(Integer, ForeignKey('orders.id'), nullable=False)
+    order_id = Column(Integer, ForeignKey('orders.id'), nullable=False, index=True)
     order = relationship('Order', back_populates='media_files')
 
     # Добавьте новое поле
@@ -1,18 +1,23 @@
 # models/notification.py
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
 from datetime import datetime
 
 class Notification(Base):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        Index('ix_notifications_user_id_is_read', 'user_id', 'is_read'),
+        Index('ix_notifications_user_id_unread', 'user_id', 'created_at', postgresql_where=text('is_read = false')),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     title = Column(String, nullable=False)
     message = Column(Text, nullable=False)
     is_read = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # Ключ помесячного секционирования таблицы notifications
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     user = relationship('User', back_populates='notifications')
@@ -1,12 +1,25 @@
 # models/order.py
 
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, DECIMAL
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, DECIMAL, Index, Text, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import column_property, deferred, relationship
 from app.db.base_class import Base
 from datetime import datetime
 
 class Order(Base):
     __tablename__ = 'orders'
+    # Индексы под фильтры списков и отчетов (миграция 6c515360552e)
+    __table_args__ = (
+        Index('ix_orders_technician_id_status', 'technician_id', 'status', postgresql_where=text('technician_id IS NOT NULL')),
+        Index('ix_orders_client_id_created_at', 'client_id', 'created_at'),
+        Index('ix_orders_status_created_at', 'status', 'created_at'),
+        Index('ix_orders_created_at_id', 'created_at', 'id'),
+        Index('ix_orders_preferred_start_time_id', 'preferred_start_time', 'id'),
+        Index('ix_orders_completed_technician_id_end_time', 'technician_id', 'actual_end_time', postgresql_where=text("status = 'completed'")),
+        # Полнотекстовый поиск (GET /orders/search) и поиск по фрагменту адреса (миграция 8a4c2e61f0d9)
+        Index('ix_orders_search_vector', 'search_vector', postgresql_using='gin'),
+        Index('ix_orders_address_trgm', 'address', postgresql_using='gin', postgresql_ops={'address': 'gin_trgm_ops'}),
+    )
 
     # Используем id как основной идентификатор (удаляем order_id)
     id = Column(Integer, primary_key=True, index=True)
@@ -33,10 +46,13 @@ class Order(Base):
     equipment_cost = Column(DECIMAL(10, 2), nullable=True)
     total_cost = Column(DECIMAL(10, 2), nullable=True)
 
-    status = Column(String(20), default="pending", nullable=False)
+    # active_history: прежний статус загружается до присваивания (дельты счетчиков статусов)
+    status = column_property(Column(String(20), default="pending", nullable=False), active_history=True)
     notes = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Заполняется триггером из service_type, address и description; в обычных запросах не загружается
+    search_vector = deferred(Column(TSVECTOR().with_variant(Text(), 'sqlite'), nullable=True))
 
     # Отношения
     client = relationship('Client', back_populates='orders')
@@ -0,0 +1,26 @@
+# models/outbox_event.py
+
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, JSON, Index, text
+from app.db.base_class import Base
+from datetime import datetime
+
+class OutboxEvent(Base):
+    __tablename__ = 'outbox_events'
+    __table_args__ = (
+        # Очередь неотправленных событий для relay (миграция 9f1b7d3e2a65)
+        Index('ix_outbox_events_unpublished', 'id', postgresql_where=text('published_at IS NULL AND dead_at IS NULL')),
+        # Dead-letter: события, исчерпавшие OUTBOX_MAX_ATTEMPTS (миграция e4a9c1d7b358)
+        Index('ix_outbox_events_dead', 'id', postgresql_where=text('dead_at IS NOT NULL')),
+    )
+
+    # Пишется в той же транзакции, что и изменение заказа; relay рассылает события по порядку id
+    id = Column(BigInteger().with_variant(Integer(), 'sqlite'), primary_key=True)
+    aggregate_type = Column(String(50), nullable=False)  # Например, 'order'
+    aggregate_id = Column(Integer, nullable=False)
+    event_type = Column(String(100), nullable=False)  # Например, 'order.status_changed'
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    published_at = Column(DateTime, nullable=True, index=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+    dead_at = Column(DateTime, nullable=True)  # не доставлено за OUTBOX_MAX_ATTEMPTS попыток
@@ -9,7 +9,7 @@ class Payment(Base):
     __tablename__ = 'payments'
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey('orders.id'), nullable=False)
+    order_id = Column(Integer, ForeignKey('orders.id'), nullable=False, index=True)
     client_id = Column(Integer, ForeignKey('clients.id'), nullable=False)
     amount = Column(Float, nullable=False)
     payment_method = Column(String, nullable=False)  # 'stripe' или 'paypal'
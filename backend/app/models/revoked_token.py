@@ -0,0 +1,15 @@
+# models/revoked_token.py
+
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from app.db.base_class import Base
+from datetime import datetime
+
+class RevokedToken(Base):
+    __tablename__ = 'revoked_tokens'
+
+    # jti отозванного access- или refresh-токена; первичный ключ защищает от повторного использования refresh-токена
+    jti = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=True, index=True)
+    # После истечения токена запись не нужна: он и так не пройдет проверку exp
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
@@ -0,0 +1,14 @@
+# models/status_counter.py
+
+from sqlalchemy import Column, Integer, String, Date
+from app.db.base_class import Base
+
+class StatusCounter(Base):
+    __tablename__ = 'status_counters'
+
+    # Число заказов/смет в статусе status среди созданных в день day; ведется в той же транзакции,
+    # что и изменение статуса (app/db/counters.py), и пересчитывается scripts/rebuild_status_counters.py
+    entity = Column(String(20), primary_key=True)  # 'order' или 'estimate'
+    day = Column(Date, primary_key=True)  # дата created_at сущности (UTC)
+    status = Column(String(50), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,21 @@
+# models/technician_location.py
+
+from sqlalchemy import Column, BigInteger, Integer, Float, DateTime, ForeignKey, UniqueConstraint
+from app.db.base_class import Base
+from datetime import datetime
+
+class TechnicianLocation(Base):
+    __tablename__ = 'technician_locations'
+    # Повторно присланная точка (ретрай пачки из мобильного приложения) не дублируется
+    __table_args__ = (
+        UniqueConstraint('technician_id', 'recorded_at', name='uq_technician_locations_technician_id_recorded_at'),
+    )
+
+    # Таблица секционирована по месяцам recorded_at; в PostgreSQL первичный ключ — (id, recorded_at)
+    id = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True)
+    technician_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    accuracy = Column(Float, nullable=True)  # точность фикса в метрах, если ее сообщает устройство
+    recorded_at = Column(DateTime, nullable=False)  # время фикса на устройстве (UTC)
+    received_at = Column(DateTime, default=datetime.utcnow, nullable=False)
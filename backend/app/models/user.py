@@ -1,6 +1,6 @@
 # models/user.py
 
-from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Enum, Float, ForeignKey
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
 from datetime import datetime
@@ -39,6 +39,10 @@ class User(Base):
     status = Column(String, nullable=True)
     skills = Column(String, nullable=True)  # Изменено на String для простоты
     profile_photo_url = Column(String, nullable=True)
+    # Последние координаты техника (POST /technicians/{id}/location)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    location_updated_at = Column(DateTime, nullable=True)
 
     # Метод обновления рейтинга (если требуется)
     # def update_rating(self, db: Session):
@@ -5,7 +5,16 @@ from sqlalchemy.orm import Session
 from app.schemas.user import UserCreate, UserOut, UserUpdate, UserRoleUpdate
 from app.models.user import User
 from app.dependencies import get_db, get_current_user, role_required
-from app.core.security import get_password_hash
+from app.core.hashing import password_hasher
+from app.core.identity_cache import invalidate_identity
+from app.db.pool import pool_stats
+from app.db import instrumentation
+from app.db.session import engine, async_engine, replica_engine, async_replica_engine, replica_router
+from app.schemas.monitoring import DatabasePoolsOut, RouteQueryStatsOut, PasswordHasherStatsOut, RateLimitStatsOut, LocationStoreStatsOut
+from app.core.rate_limit import rate_limiter
+from app.core.location_store import location_store
+from app.core.location_hub import location_hub
+from app.core.technician_index import technician_index
 from typing import List
 from app.enums import UserRole
 import logging
@@ -44,7 +53,7 @@ async def create_user(user: UserCreate, db: Session = Depends(get_db)):
     if db_user:
         logger.warning("User with email %s already exists", user.email)
         raise HTTPException(status_code=400, detail="Пользователь с таким email уже существует")
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     new_user = User(
         email=user.email,
         name=user.name,
@@ -67,8 +76,10 @@ async def update_user(user_id: int, user_update: UserUpdate, db: Session = Depen
         logger.warning("User with ID %d not found", user_id)
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     update_data = user_update.dict(exclude_unset=True)
+    old_email = user.email
     for key, value in update_data.items():
         setattr(user, key, value)
+    invalidate_identity(db, old_email, user.email)
     db.commit()
     db.refresh(user)
     logger.info("User with ID %d successfully updated", user_id)
@@ -82,6 +93,7 @@ async def delete_user(user_id: int, db: Session = Depends(get_db)):
     if not user:
         logger.warning("User with ID %d not found", user_id)
         raise HTTPException(status_code=404, detail="Пользователь не найден")
+    invalidate_identity(db, user.email)
     db.delete(user)
     db.commit()
     logger.info("User with ID %d successfully deleted", user_id)
@@ -100,7 +112,57 @@ async def update_user_role(
         logger.warning(f"User with ID {user_id} not found")
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     user.role = role_update.new_role
+    invalidate_identity(db, user.email)
     db.commit()
     db.refresh(user)
     logger.info(f"Role for user with ID {user_id} successfully updated to {role_update.new_role}")
     return user
+
+# Текущее состояние пулов соединений к БД (для подбора размера пула под число воркеров)
+@router.get("/db/pool", response_model=DatabasePoolsOut)
+async def get_db_pool_stats():
+    stats = {
+        "primary": pool_stats(engine),
+        "primary_async": pool_stats(async_engine),
+    }
+    if replica_router is not None:
+        stats["replica"] = pool_stats(replica_engine)
+        stats["replica_async"] = pool_stats(async_replica_engine)
+        stats["replica_status"] = replica_router.status()
+    return stats
+
+# Количество и время запросов к БД по маршрутам (в рамках текущего процесса)
+@router.get("/db/queries", response_model=List[RouteQueryStatsOut])
+async def get_db_query_stats():
+    return instrumentation.route_stats()
+
+# Сброс накопленной статистики запросов
+@router.delete("/db/queries", response_model=dict)
+async def reset_db_query_stats():
+    instrumentation.reset_route_stats()
+    return {"message": "Статистика запросов сброшена"}
+
+# Очередь и время хэширования паролей (пул процессов bcrypt)
+@router.get("/auth/hashing", response_model=PasswordHasherStatsOut)
+async def get_password_hasher_stats():
+    return password_hasher.stats()
+
+# Отказы ограничителя частоты запросов по политикам
+@router.get("/rate-limits", response_model=RateLimitStatsOut)
+async def get_rate_limit_stats():
+    return rate_limiter.stats()
+
+# Отложенная запись координат техников в users, индекс /technicians/nearby и SSE-подписчики
+@router.get("/technicians/locations", response_model=LocationStoreStatsOut)
+async def get_location_store_stats():
+    index = technician_index.stats()
+    streams = location_hub.stats()
+    return {
+        **location_store.stats(),
+        "index_technicians": index["technicians"],
+        "index_cells": index["cells"],
+        "index_resolution": index["resolution"],
+        "stream_subscribers": streams["subscribers"],
+        "stream_published": streams["published"],
+        "stream_rejected": streams["rejected"],
+    }
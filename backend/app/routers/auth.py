@@ -1,13 +1,21 @@
 # app/routers/auth.py
 
 from fastapi import APIRouter, HTTPException, Depends, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.schemas.user import UserCreate, UserOut, Token, UserLogin, RefreshToken
 from app.models.user import User
 from app.models.client import Client  # Добавляем импорт модели Client
-from app.dependencies import get_db, get_current_user
-from app.core.security import get_password_hash, verify_password, create_access_token, create_refresh_token
+from app.dependencies import get_db, get_async_db, get_current_user
+from app.core.security import create_access_token, create_refresh_token, oauth2_scheme
+from app.core.hashing import password_hasher
 from app.core.config import settings
+from app.core.identity_cache import invalidate_identity_async
+from app.core.principal import principal_claims, principal_claims_async
+from app.core.revocation import revoke_token, revoke_token_async
+from sqlalchemy.exc import IntegrityError
+from typing import Optional
 from datetime import timedelta
 from jose import JWTError, jwt
 import logging
@@ -21,15 +29,22 @@ router = APIRouter(
     tags=["auth"]
 )
 
+# Поиск пользователя по email в async-сессии
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
 # Регистрация нового пользователя-клиента
 @router.post("/register", response_model=UserOut)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     logger.info("Attempting to register a new user with email: %s", user.email)
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = await get_user_by_email(db, user.email)
     if db_user:
         logger.warning("User with email %s already exists", user.email)
         raise HTTPException(status_code=400, detail="Email уже зарегистрирован")
-    hashed_password = get_password_hash(user.password)
+    # На время bcrypt соединение возвращаем в пул (expire_on_commit=False: объекты остаются загруженными)
+    await db.commit()
+    hashed_password = await password_hasher.hash(user.password)
     db_user = User(
         email=user.email,
         name=user.name,
@@ -38,8 +53,8 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
         password_hash=hashed_password,
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     logger.info("User with email %s successfully registered", user.email)
 
     # Создание профиля клиента и связывание с пользователем
@@ -50,20 +65,29 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
         user_id=db_user.id
     )
     db.add(new_client)
-    db.commit()
-    db.refresh(new_client)
+    await db.commit()
 
     return db_user
 
 # Логин пользователя
 @router.post("/login", response_model=Token)
-def login_user(user_data: UserLogin, db: Session = Depends(get_db)):
+async def login_user(user_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
     logger.info("Attempting to log in user with email: %s", user_data.email)
-    db_user = db.query(User).filter(User.email == user_data.email).first()
-    if not db_user or not verify_password(user_data.password, db_user.password_hash):
+    db_user = await get_user_by_email(db, user_data.email)
+    verified, new_hash = False, None
+    if db_user:
+        await db.commit()
+        verified, new_hash = await password_hasher.verify(user_data.password, db_user.password_hash)
+    if not verified:
         logger.warning("Failed login attempt for email: %s", user_data.email)
         raise HTTPException(status_code=400, detail="Неверный email или пароль")
-    access_token = create_access_token(data={"sub": db_user.email, "role": db_user.role.value})
+    # Хэш со старой стоимостью bcrypt прозрачно пересчитываем с текущей BCRYPT_ROUNDS
+    if new_hash:
+        db_user.password_hash = new_hash
+        await invalidate_identity_async(db, db_user.email)
+        await db.commit()
+        logger.info("Password hash upgraded for user with email: %s", db_user.email)
+    access_token = create_access_token(data=await principal_claims_async(db, db_user))
     refresh_token = create_refresh_token(data={"sub": db_user.email})
     logger.info("User with email %s successfully logged in", user_data.email)
     return {
@@ -79,8 +103,8 @@ def refresh_token(refresh_data: RefreshToken, db: Session = Depends(get_db)):
     try:
         payload = jwt.decode(refresh_data.refresh_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         email = payload.get("sub")
-        if email is None:
-            logger.error("Invalid refresh token: missing subject")
+        if email is None or payload.get("jti") is None:
+            logger.error("Invalid refresh token: missing subject or jti")
             raise HTTPException(status_code=400, detail="Недействительный токен")
     except JWTError:
         logger.error("Invalid refresh token")
@@ -89,7 +113,15 @@ def refresh_token(refresh_data: RefreshToken, db: Session = Depends(get_db)):
     if not db_user:
         logger.warning("User with email %s not found during token refresh", email)
         raise HTTPException(status_code=400, detail="Пользователь не найден")
-    access_token = create_access_token(data={"sub": db_user.email, "role": db_user.role.value})
+    # Ротация: старый refresh-токен отзывается; повторное использование упирается в первичный ключ jti
+    try:
+        revoke_token(db, {**payload, "uid": db_user.id})
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        logger.warning("Reuse of revoked refresh token for user with email: %s", email)
+        raise HTTPException(status_code=400, detail="Недействительный токен")
+    access_token = create_access_token(data=principal_claims(db, db_user))
     refresh_token = create_refresh_token(data={"sub": db_user.email})
     logger.info("Token refreshed for user with email: %s", email)
     return {
@@ -115,7 +147,7 @@ def reset_password_request(email: str, db: Session = Depends(get_db)):
 
 # Сброс пароля
 @router.post("/update-password")
-def reset_password(data: dict, db: Session = Depends(get_db)):
+async def reset_password(data: dict, db: AsyncSession = Depends(get_async_db)):
     token = data.get("token")
     new_password = data.get("new_password")
     if not token or not new_password:
@@ -130,12 +162,21 @@ def reset_password(data: dict, db: Session = Depends(get_db)):
     except JWTError:
         logger.error("Invalid token provided for password reset")
         raise HTTPException(status_code=400, detail="Недействительный токен")
-    user = db.query(User).filter(User.email == email).first()
+    user = await get_user_by_email(db, email)
     if not user:
         logger.warning("User with email %s not found during password reset", email)
         raise HTTPException(status_code=400, detail="Пользователь не найден")
-    user.password_hash = get_password_hash(new_password)
-    db.commit()
+    await db.commit()
+    user.password_hash = await password_hasher.hash(new_password)
+    await invalidate_identity_async(db, user.email)
+    # Ссылка для сброса одноразовая
+    try:
+        await revoke_token_async(db, {**payload, "uid": user.id})
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        logger.warning("Reuse of password reset token for user with email: %s", email)
+        raise HTTPException(status_code=400, detail="Недействительный токен")
     logger.info("Password successfully updated for user with email: %s", email)
     return {"message": "Пароль успешно обновлен."}
 
@@ -146,7 +187,29 @@ def send_reset_email(email: str, token: str):
 
 # Выход из системы
 @router.post("/logout")
-def logout_user(current_user: User = Depends(get_current_user)):
+def logout_user(
+    refresh_data: Optional[RefreshToken] = None,
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    # Отзываем текущий access-токен и, если передан, refresh-токен того же пользователя
+    tokens = [jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])]
+    if refresh_data:
+        try:
+            refresh_payload = jwt.decode(refresh_data.refresh_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError:
+            raise HTTPException(status_code=400, detail="Недействительный токен")
+        if refresh_payload.get("sub") == current_user.email:
+            tokens.append(refresh_payload)
+    try:
+        for payload in tokens:
+            revoke_token(db, {**payload, "uid": current_user.id})
+        db.commit()
+    except IntegrityError:
+        # Refresh-токен уже был отозван: выход все равно считаем успешным
+        db.rollback()
+        revoke_token(db, {**tokens[0], "uid": current_user.id})
+        db.commit()
     logger.info("User with email %s logged out", current_user.email)
-    # Здесь можно добавить токен в черный список или реализовать логику для аннулирования токена
     return {"message": "Вы успешно вышли из системы."}
@@ -1,8 +1,11 @@
 # routers/chat.py
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.dependencies import get_db, get_current_user, role_required
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.core.principal import Principal
+from app.dependencies import get_async_db, get_principal, role_required
 from app.models.chat import Conversation, Message
 from app.schemas.chat import ConversationOut, MessageCreate, MessageOut
 from typing import List
@@ -13,45 +16,59 @@ router = APIRouter(
     tags=["chat"]
 )
 
+async def get_conversation_or_none(db: AsyncSession, conversation_id: int):
+    result = await db.execute(
+        select(Conversation)
+        .options(selectinload(Conversation.participants))
+        .where(Conversation.id == conversation_id)
+    )
+    return result.scalars().first()
+
+# История сообщений в порядке отправки (индекс (conversation_id, sent_at))
+def messages_query(conversation_id: int):
+    return select(Message).where(Message.conversation_id == conversation_id).order_by(Message.sent_at)
+
 @router.get("/", response_model=List[ConversationOut])
 async def get_conversations(
-    db: Session = Depends(get_db),
-    current_user=Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal)
 ):
-    conversations = db.query(Conversation).filter(
-        Conversation.participants.any(id=current_user.id)
-    ).all()
-    return conversations
+    result = await db.execute(
+        select(Conversation)
+        .options(selectinload(Conversation.participants))
+        .where(Conversation.participants.any(id=principal.user_id))
+    )
+    return result.scalars().all()
 
 @router.get("/{conversation_id}", response_model=List[MessageOut])
 async def get_messages(
     conversation_id: int,
-    db: Session = Depends(get_db),
-    current_user=Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal)
 ):
-    conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
-    if not conversation or current_user.id not in [p.id for p in conversation.participants]:
+    conversation = await get_conversation_or_none(db, conversation_id)
+    if not conversation or principal.user_id not in [p.id for p in conversation.participants]:
         raise HTTPException(status_code=403, detail="Недостаточно прав доступа")
-    messages = db.query(Message).filter(Message.conversation_id == conversation_id).all()
-    return messages
+    result = await db.execute(messages_query(conversation_id))
+    return result.scalars().all()
 
 @router.post("/{conversation_id}/messages", response_model=MessageOut)
 async def send_message(
     conversation_id: int,
     message: MessageCreate,
-    db: Session = Depends(get_db),
-    current_user=Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal)
 ):
-    conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
-    if not conversation or current_user.id not in [p.id for p in conversation.participants]:
+    conversation = await get_conversation_or_none(db, conversation_id)
+    if not conversation or principal.user_id not in [p.id for p in conversation.participants]:
         raise HTTPException(status_code=403, detail="Недостаточно прав доступа")
     new_message = Message(
         conversation_id=conversation_id,
-        sender_id=current_user.id,
+        sender_id=principal.user_id,
         content=message.content,
         sent_at=datetime.utcnow()
     )
     db.add(new_message)
-    db.commit()
-    db.refresh(new_message)
+    await db.commit()
+    await db.refresh(new_message)
     return new_message
@@ -1,6 +1,7 @@
 
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.schemas.estimate import EstimateCreate, EstimateOut, EstimateUpdate
 from app.models.estimate import Estimate
@@ -9,6 +10,9 @@ from app.models.user import User
 from app.models.service import Service
 from app.models.material import Material
 from app.dependencies import get_db, get_current_user, role_required
+from app.db.loaders import loader_options
+from app.db.versions import estimate_version_query
+from app.core.etag import make_etag, etag_matches, not_modified, set_etag
 from app.enums import UserRole
 from typing import List
 from datetime import datetime
@@ -108,20 +112,31 @@ async def create_estimate(
 @router.get("/{estimate_id}", response_model=EstimateOut)
 async def get_estimate(
     estimate_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    # Ищем смету в базе данных по ID
-    estimate = db.query(Estimate).filter(Estimate.id == estimate_id).first()
-    if not estimate:
+    # Версия сметы (легкий запрос) для проверки прав и ETag
+    version = db.execute(estimate_version_query(estimate_id)).first()
+    if not version:
         raise HTTPException(status_code=404, detail="Estimate not found")  # Переведено на английский
 
     # Проверка прав доступа для клиентов и техников
-    if current_user.role == UserRole.client and estimate.client_id != current_user.id:
+    if current_user.role == UserRole.client and version.client_id != current_user.id:
         raise HTTPException(status_code=403, detail="You do not have access to this estimate")  # Переведено на английский
-    if current_user.role == UserRole.technician and estimate.technician_id != current_user.id:
+    if current_user.role == UserRole.technician and version.technician_id != current_user.id:
         raise HTTPException(status_code=403, detail="You do not have access to this estimate")  # Переведено на английский
 
+    etag = make_etag("estimate", estimate_id, *version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    # Ищем смету в базе данных по ID
+    estimate = db.query(Estimate).options(*loader_options(EstimateOut)).filter(Estimate.id == estimate_id).first()
+    if not estimate:
+        raise HTTPException(status_code=404, detail="Estimate not found")  # Переведено на английский
+    set_etag(response, etag)
     return estimate  # Возвращаем найденную смету
 
 
@@ -373,20 +388,25 @@ async def convert_estimate_to_order(
 # - Техник видит только те сметы, которые ему назначены.
 # - Клиент видит только свои сметы.
 
+def estimates_query(role: UserRole, user_id: int):
+    # Сметы, доступные пользователю с этой ролью; None — недоступны никакие
+    query = select(Estimate).options(*loader_options(EstimateOut))
+    if role == UserRole.admin:
+        return query
+    if role == UserRole.technician:
+        return query.where(Estimate.technician_id == user_id)
+    if role == UserRole.client:
+        return query.where(Estimate.client_id == user_id)
+    return None
+
 @router.get("/", response_model=List[EstimateOut])
 async def get_estimates(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     # Выбираем сметы в зависимости от роли текущего пользователя
-    if current_user.role == UserRole.admin:
-        estimates = db.query(Estimate).all()
-    elif current_user.role == UserRole.technician:
-        estimates = db.query(Estimate).filter(Estimate.technician_id == current_user.id).all()
-    elif current_user.role == UserRole.client:
-        estimates = db.query(Estimate).filter(Estimate.client_id == current_user.id).all()
-    else:
-        estimates = []
-    
-    return estimates  # Возвращаем все доступные сметы для пользователя
+    query = estimates_query(current_user.role, current_user.id)
+    if query is None:
+        return []
+    return db.execute(query).scalars().all()  # Возвращаем все доступные сметы для пользователя
 
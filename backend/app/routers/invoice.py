@@ -1,11 +1,14 @@
 #app/routers/invoice.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from app.schemas.invoice import InvoiceCreate, InvoiceOut
 from app.models.invoice import Invoice as InvoiceModel, InvoiceItem as InvoiceItemModel
 from app.models.order import Order
 from app.models.user import User
-from app.dependencies import get_db, get_current_user, role_required
+from app.dependencies import get_db, get_read_db, get_current_user, role_required
+from app.db.loaders import loader_options
+from app.db.versions import invoice_version_query
+from app.core.etag import make_etag, etag_matches, not_modified, set_etag
 from app.enums import UserRole
 from typing import List
 from datetime import datetime
@@ -21,6 +24,26 @@ router = APIRouter(
     tags=["invoices"]
 )
 
+# Детали счета с ETag: права и версия проверяются легким запросом, счет грузится только при изменении
+def invoice_detail(invoice_id: int, request: Request, response: Response, db: Session, current_user: User):
+    version = db.execute(invoice_version_query(invoice_id)).first()
+    if not version:
+        raise HTTPException(status_code=404, detail="Счет не найден")
+
+    # Проверка прав доступа
+    if current_user.role == UserRole.client and current_user.id != version.client_id:
+        raise HTTPException(status_code=403, detail="У вас нет прав доступа к этому счету")
+
+    etag = make_etag("invoice", invoice_id, *version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    invoice = db.query(InvoiceModel).options(*loader_options(InvoiceOut)).filter(InvoiceModel.id == invoice_id).first()
+    if not invoice:
+        raise HTTPException(status_code=404, detail="Счет не найден")
+    set_etag(response, etag)
+    return invoice
+
 @router.post("/", response_model=InvoiceOut, dependencies=[Depends(role_required([UserRole.admin, UserRole.client]))])
 def create_invoice(
     invoice: InvoiceCreate,
@@ -66,25 +89,19 @@ def create_invoice(
     return db_invoice
 
 @router.get("/", response_model=List[InvoiceOut], dependencies=[Depends(role_required([UserRole.admin]))])
-def get_invoices(db: Session = Depends(get_db)):
-    invoices = db.query(InvoiceModel).all()
+def get_invoices(db: Session = Depends(get_read_db)):
+    invoices = db.query(InvoiceModel).options(*loader_options(InvoiceOut)).all()
     return invoices
 
 @router.get("/{id}", response_model=InvoiceOut, dependencies=[Depends(role_required([UserRole.admin, UserRole.client]))])
 def get_invoice(
     id: int,  # Заменили invoice_id на id
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    invoice = db.query(InvoiceModel).filter(InvoiceModel.id == id).first()  # Обновлено
-    if not invoice:
-        raise HTTPException(status_code=404, detail="Счет не найден")
-
-    # Проверка прав доступа
-    if current_user.role == UserRole.client and current_user.id != invoice.client_id:
-        raise HTTPException(status_code=403, detail="У вас нет прав доступа к этому счету")
-
-    return invoice
+    return invoice_detail(id, request, response, db, current_user)
 
 @router.put("/{id}", response_model=InvoiceOut, dependencies=[Depends(role_required([UserRole.admin]))])
 def update_invoice(
@@ -156,7 +173,7 @@ def download_invoice_pdf(id: int, db: Session = Depends(get_db), current_user: U
     )
 
 @router.get("/reports/summary", dependencies=[Depends(role_required([UserRole.admin]))])
-def get_invoice_summary(db: Session = Depends(get_db)):
+def get_invoice_summary(db: Session = Depends(get_read_db)):
     total_invoices = db.query(InvoiceModel).count()
     total_amount = db.query(func.sum(InvoiceModel.amount)).scalar()  # Используем func для агрегации
     paid_invoices = db.query(InvoiceModel).filter(InvoiceModel.status == 'paid').count()
@@ -171,15 +188,9 @@ def get_invoice_summary(db: Session = Depends(get_db)):
 @router.get("/{invoice_id}", response_model=InvoiceOut, dependencies=[Depends(role_required([UserRole.admin, UserRole.client]))])
 def get_invoice(
     invoice_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    invoice = db.query(InvoiceModel).filter(InvoiceModel.id == invoice_id).first()
-    if not invoice:
-        raise HTTPException(status_code=404, detail="Счет не найден")
-
-    # Проверка прав доступа
-    if current_user.role == UserRole.client and current_user.id != invoice.client_id:
-        raise HTTPException(status_code=403, detail="У вас нет прав доступа к этому счету")
-
-    return invoice
\ No newline at end of file
+    return invoice_detail(invoice_id, request, response, db, current_user)
\ No newline at end of file
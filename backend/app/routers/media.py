@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.dependencies import get_db, get_current_user, role_required
 from app.models.media import Media
@@ -16,6 +17,9 @@ router = APIRouter(
     tags=["media"],
 )
 
+def order_media_query(order_id: int):
+    return select(Media).where(Media.order_id == order_id)
+
 # Получение всех медиафайлов, связанных с заказом
 @router.get("/order/{order_id}", response_model=List[MediaOut], dependencies=[Depends(role_required([UserRole.admin, UserRole.client, UserRole.technician]))])
 def get_order_media(
@@ -37,7 +41,7 @@ def get_order_media(
         raise HTTPException(status_code=403, detail="Вы не можете просматривать медиафайлы для этого заказа")
     
     # Получаем медиафайлы для заказа
-    media_files = db.query(Media).filter(Media.order_id == order_id).all()
+    media_files = db.execute(order_media_query(order_id)).scalars().all()
     return media_files
 
 # Загрузка медиафайла для заказа
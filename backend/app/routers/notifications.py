@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.notification import Notification
 from app.schemas.notification import NotificationOut
-from app.dependencies import get_db, get_current_user
+from app.core.principal import Principal
+from app.dependencies import get_async_db, get_principal
 from typing import List
 
 router = APIRouter(
@@ -10,31 +12,35 @@ router = APIRouter(
     tags=["notifications"]
 )
 
+def notifications_query(user_id: int):
+    return select(Notification).where(Notification.user_id == user_id)
+
 # Получить все уведомления текущего пользователя
 @router.get("/", response_model=List[NotificationOut])
 async def get_notifications(
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal)
 ):
-    notifications = db.query(Notification).filter(Notification.user_id == current_user.id).all()
-    return notifications
+    result = await db.execute(notifications_query(principal.user_id))
+    return result.scalars().all()
 
 # Пометить уведомление как прочитанное
 @router.put("/{notification_id}/read", response_model=NotificationOut)
 async def mark_notification_as_read(
     notification_id: int,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal)
 ):
-    notification = db.query(Notification).filter(
+    result = await db.execute(select(Notification).where(
         Notification.id == notification_id,
-        Notification.user_id == current_user.id
-    ).first()
+        Notification.user_id == principal.user_id
+    ))
+    notification = result.scalars().first()
     if not notification:
         raise HTTPException(status_code=404, detail="Уведомление не найдено")
     notification.is_read = True
-    db.commit()
-    db.refresh(notification)  # Возвращаем обновленное уведомление
+    await db.commit()
+    await db.refresh(notification)  # Возвращаем обновленное уведомление
     return notification
 
 # Регистрация токена для push-уведомлений
@@ -44,15 +50,18 @@ from app.schemas.user_device import UserDeviceCreate
 @router.post("/token")
 async def register_push_token(
     device: UserDeviceCreate,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal)
 ):
-    db_device = db.query(UserDevice).filter(UserDevice.user_id == current_user.id, UserDevice.device_id == device.device_id).first()
+    result = await db.execute(
+        select(UserDevice).where(UserDevice.user_id == principal.user_id, UserDevice.device_id == device.device_id)
+    )
+    db_device = result.scalars().first()
     if db_device:
         db_device.push_token = device.push_token
     else:
-        db_device = UserDevice(user_id=current_user.id, **device.dict())
+        db_device = UserDevice(user_id=principal.user_id, **device.dict())
         db.add(db_device)
-    db.commit()
+    await db.commit()
     return {"detail": "Токен зарегистрирован"}
 
@@ -1,20 +1,50 @@
 # app/routers/order.py
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from datetime import datetime
 import os
+from collections import Counter, defaultdict
 from uuid import uuid4
 
-from app.dependencies import get_db, get_current_user, role_required
+from app.dependencies import get_async_db, get_async_read_db, get_async_read_session_factory, get_principal, role_required
+from app.core.principal import Principal
+from app.core.config import settings
+from app.db.loaders import loader_options
+from app.db.pagination import KeysetPage, estimate_count
+from app.db.projection import parse_fields, projected_response
+from app.db.export import EXPORT_MEDIA_TYPES, export_columns, stream_export
+from app.db.versions import order_version_query
+from app.db.search import search_order_ids
+from app.db.counters import add_status_deltas, counter_key
+from app.core.order_events import (
+    record_order_event,
+    ORDER_STATUS_CHANGED,
+    ORDER_TECHNICIAN_ASSIGNED,
+    ORDER_CANCELLED,
+)
+from app.core.etag import make_etag, etag_matches, not_modified, set_etag
 from app.models.media import Media
 from app.models.order import Order
 from app.models.user import User
-from app.models.client import Client  # Добавляем импорт модели Client
-from app.schemas.order import OrderCreate, OrderUpdate, OrderOut, StatusUpdate
+from app.models.client import Client
+from app.schemas.order import (
+    OrderCreate,
+    OrderUpdate,
+    OrderOut,
+    StatusUpdate,
+    OrderBulkCreate,
+    OrderBulkResult,
+    OrderBatchItem,
+    OrderBatchUpdate,
+    OrderBatchItemResult,
+    OrderBatchResult,
+)
 from app.schemas.media import MediaOut
-from app.enums import UserRole
+from app.enums import UserRole, OrderSortKey, SortDirection, ExportFormat
 from app.schemas.order_item import OrderItemCreate  # Импорт OrderItemCreate
 from app.models.order_item import OrderItem  # Импортируем OrderItem для работы с позициями заказа
 
@@ -27,122 +57,294 @@ router = APIRouter(
 MEDIA_STORAGE_PATH = "media_storage/"
 os.makedirs(MEDIA_STORAGE_PATH, exist_ok=True)
 
+# Связи, которые сериализует OrderOut; в async-сессии ленивая загрузка недоступна
+ORDER_OUT_OPTIONS = loader_options(OrderOut)
+
+async def get_order_or_none(db: AsyncSession, order_id: int, *options):
+    result = await db.execute(
+        select(Order).options(*options).where(Order.id == order_id).execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
+# Параметры страницы для списков заказов
+def order_page(
+    sort: OrderSortKey = OrderSortKey.created_at,
+    direction: SortDirection = SortDirection.desc,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+) -> KeysetPage:
+    return KeysetPage(sort.value, direction, limit, cursor, include_total)
+
+# Выборочные поля (fields=id,status,latitude,...) для легких списков, например карты диспетчера
+def order_fields(
+    fields: Optional[str] = Query(None, description="Comma-separated order columns; returns only these fields")
+) -> Optional[List[str]]:
+    return parse_fields(Order, fields)
+
+# Запрос страницы списка заказов; его же проверяет scripts/check_indexes.py
+def order_list_query(conditions: list, page: KeysetPage, fields: Optional[List[str]] = None):
+    if fields:
+        # Только нужные колонки (плюс ключ курсора), без ORM-объектов и загрузки связей
+        query = select(*[getattr(Order, name) for name in dict.fromkeys([*fields, "id", page.sort])])
+    else:
+        query = select(Order).options(*ORDER_OUT_OPTIONS)
+    return page.apply(query.where(*conditions), getattr(Order, page.sort), Order.id)
+
+# Страница заказов по keyset-курсору (индексы (created_at, id) и (preferred_start_time, id))
+async def list_orders(
+    db: AsyncSession,
+    conditions: list,
+    page: KeysetPage,
+    request: Request,
+    response: Response,
+    fields: Optional[List[str]] = None,
+):
+    if page.include_total:
+        total = await estimate_count(db, select(Order.id).where(*conditions))
+        response.headers["X-Total-Count-Estimate"] = str(total)
+    result = await db.execute(order_list_query(conditions, page, fields))
+    if fields:
+        rows = page.finish(result.all(), lambda row: getattr(row, page.sort), request, response)
+        return projected_response(rows, fields, response)
+    return page.finish(result.scalars().all(), lambda order: getattr(order, page.sort), request, response)
+
+# Фильтры списка заказов (GET /orders/ и GET /orders/export)
+def order_filters(
+    status: str = None,
+    technician_id: int = None,
+    client_id: int = None,
+    start_date: datetime = None,
+    end_date: datetime = None,
+) -> list:
+    conditions = []
+
+    if technician_id:
+        conditions.append(Order.technician_id == technician_id)
+    if client_id:
+        conditions.append(Order.client_id == client_id)
+    if status:
+        conditions.append(Order.status == status)
+    if start_date:
+        conditions.append(Order.preferred_start_time >= start_date)
+    if end_date:
+        conditions.append(Order.preferred_start_time <= end_date)
+    return conditions
+
+def order_values(order: OrderCreate, client_id: int) -> dict:
+    return {
+        "client_id": client_id,
+        "service_type": order.service_type,
+        "description": order.description,
+        "address": order.address,
+        "preferred_start_time": order.preferred_start_time,
+        "estimated_duration_hours": order.estimated_duration_hours,
+        "status": "pending",
+    }
+
+def order_item_values(order_id: int, item: OrderItemCreate) -> dict:
+    return {
+        "order_id": order_id,
+        "item_type": item.item_type,
+        "item_id": item.item_id,
+        "description": item.description,
+        "quantity": item.quantity,
+        "unit_price": item.unit_price,
+        "total": item.quantity * item.unit_price,
+    }
+
+def batches(rows: list, size: int):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+# Позиции заказов одним INSERT ... VALUES на пачку вместо отдельного INSERT на каждую строку
+async def insert_order_items(db: AsyncSession, item_rows: list):
+    for batch in batches(item_rows, settings.ORDER_BULK_BATCH_SIZE):
+        await db.execute(insert(OrderItem).values(batch))
+
 # 1. Создание нового заказа
 @router.post("/", response_model=OrderOut, dependencies=[Depends(role_required([UserRole.client]))])
 async def create_order(
     order: OrderCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal)
 ):
     try:
-        # Получаем профиль клиента по текущему пользователю
-        client = db.query(Client).filter(Client.user_id == current_user.id).first()
-        if not client:
+        # Профиль клиента берем из claim токена
+        if principal.client_id is None:
             raise HTTPException(status_code=400, detail="Профиль клиента не найден")
 
-        # Создаем новый заказ
-        new_order = Order(
-            client_id=client.id,
-            service_type=order.service_type,
-            description=order.description,
-            address=order.address,
-            preferred_start_time=order.preferred_start_time,
-            estimated_duration_hours=order.estimated_duration_hours,
-            status='pending'
-        )
+        # Заказ и его позиции создаются в одной транзакции: flush выдает id заказа без COMMIT
+        new_order = Order(**order_values(order, principal.client_id))
         db.add(new_order)
-        db.commit()
-        db.refresh(new_order)
-
-        # Добавляем позиции (OrderItem) в заказ
-        for item_data in order.items:
-            db_item = OrderItem(
-                order_id=new_order.id,
-                item_type=item_data.item_type,
-                item_id=item_data.item_id,
-                description=item_data.description,
-                quantity=item_data.quantity,
-                unit_price=item_data.unit_price,
-                total=item_data.quantity * item_data.unit_price
-            )
-            db.add(db_item)
-        
-        db.commit()
-        db.refresh(new_order)
-        return new_order
+        await db.flush()
+
+        if order.items:
+            await insert_order_items(db, [order_item_values(new_order.id, item) for item in order.items])
+
+        await db.commit()
+        return await get_order_or_none(db, new_order.id, *ORDER_OUT_OPTIONS)
+    except HTTPException:
+        raise
     except Exception as e:
+        await db.rollback()
         raise HTTPException(status_code=400, detail=f"Не удалось создать заказ: {str(e)}")
 
+# Массовое создание заказов (импорт из колл-центра): все заказы в одной транзакции, INSERT пачками
+@router.post("/bulk", response_model=OrderBulkResult, dependencies=[Depends(role_required([UserRole.admin, UserRole.dispatcher]))])
+async def create_orders_bulk(
+    bulk: OrderBulkCreate,
+    db: AsyncSession = Depends(get_async_db)
+):
+    if not bulk.orders:
+        return {"created": 0, "order_ids": []}
+    if len(bulk.orders) > settings.ORDER_BULK_MAX_ORDERS:
+        raise HTTPException(status_code=413, detail=f"Не более {settings.ORDER_BULK_MAX_ORDERS} заказов за один запрос")
+
+    client_ids = {order.client_id for order in bulk.orders}
+    existing = set((await db.execute(select(Client.id).where(Client.id.in_(client_ids)))).scalars())
+    missing = sorted(client_ids - existing)
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Клиенты не найдены: {missing}")
+
+    order_ids = []
+    try:
+        for batch in batches(bulk.orders, settings.ORDER_BULK_BATCH_SIZE):
+            # RETURNING с sort_by_parameter_order сопоставляет id с заказами пачки
+            result = await db.execute(
+                insert(Order).returning(Order.id, sort_by_parameter_order=True),
+                [order_values(order, order.client_id) for order in batch],
+            )
+            batch_ids = result.scalars().all()
+            order_ids.extend(batch_ids)
+            item_rows = [
+                order_item_values(order_id, item)
+                for order_id, order in zip(batch_ids, batch)
+                for item in order.items
+            ]
+            if item_rows:
+                await insert_order_items(db, item_rows)
+        # INSERT пачками идет в обход ORM flush, поэтому счетчик статусов пополняем явно
+        await add_status_deltas(db, Counter({counter_key("order", datetime.utcnow(), "pending"): len(order_ids)}))
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=f"Не удалось создать заказы: {str(e)}")
+
+    return {"created": len(order_ids), "order_ids": order_ids}
+
 # 2.  Получение списка всех заказов (администратор и диспетчер)
 @router.get("/", response_model=List[OrderOut], dependencies=[Depends(role_required([UserRole.admin, UserRole.dispatcher]))])
 async def get_all_orders(
+    request: Request,
+    response: Response,
+    conditions: list = Depends(order_filters),
+    page: KeysetPage = Depends(order_page),
+    fields: Optional[List[str]] = Depends(order_fields),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    return await list_orders(db, conditions, page, request, response, fields)
+
+# Потоковая выгрузка заказов для сверки (NDJSON или CSV) с теми же фильтрами, что и GET /orders/
+@router.get("/export", dependencies=[Depends(role_required([UserRole.admin, UserRole.dispatcher]))])
+async def export_orders(
+    export_format: ExportFormat = Query(ExportFormat.ndjson, alias="format"),
+    conditions: list = Depends(order_filters),
+    fields: Optional[List[str]] = Depends(order_fields),
+    session_factory=Depends(get_async_read_session_factory)
+):
+    fields = fields or export_columns(Order)
+    # Только колонки, без ORM-объектов: строки сразу кодируются и отдаются клиенту
+    query = select(*[getattr(Order, name) for name in fields]).where(*conditions).order_by(Order.id)
+    filename = f"orders_{datetime.utcnow():%Y%m%d_%H%M%S}.{export_format.value}"
+    return StreamingResponse(
+        stream_export(session_factory, query, fields, export_format.value),
+        media_type=EXPORT_MEDIA_TYPES[export_format.value],
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+# Полнотекстовый поиск заказов по типу услуги, адресу и описанию (администратор и диспетчер)
+@router.get("/search", response_model=List[OrderOut], dependencies=[Depends(role_required([UserRole.admin, UserRole.dispatcher]))])
+async def search_orders(
+    q: str = Query(..., min_length=2, description="Search text: words, prefixes or an address fragment"),
     status: str = None,
     technician_id: int = None,
-    client_id: int = None,
-    start_date: datetime = None,
-    end_date: datetime = None,
-    db: Session = Depends(get_db)
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    orders_query = db.query(Order)
-
-    if technician_id:
-        orders_query = orders_query.filter(Order.technician_id == technician_id)
-    if client_id:
-        orders_query = orders_query.filter(Order.client_id == client_id)
+    conditions = []
     if status:
-        orders_query = orders_query.filter(Order.status == status)
-    if start_date:
-        orders_query = orders_query.filter(Order.preferred_start_time >= start_date)
-    if end_date:
-        orders_query = orders_query.filter(Order.preferred_start_time <= end_date)
+        conditions.append(Order.status == status)
+    if technician_id:
+        conditions.append(Order.technician_id == technician_id)
 
-    orders = orders_query.all()
-    return orders
+    order_ids = await search_order_ids(db, q, conditions, limit)
+    if not order_ids:
+        return []
+    result = await db.execute(select(Order).options(*ORDER_OUT_OPTIONS).where(Order.id.in_(order_ids)))
+    orders = {order.id: order for order in result.scalars()}
+    # Сохраняем порядок по релевантности
+    return [orders[order_id] for order_id in order_ids if order_id in orders]
 
 # Получение заказов для техника
 @router.get("/assigned", response_model=List[OrderOut], dependencies=[Depends(role_required([UserRole.technician]))])
 async def get_assigned_orders(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    page: KeysetPage = Depends(order_page),
+    fields: Optional[List[str]] = Depends(order_fields),
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal)
 ):
-    orders = db.query(Order).filter(Order.technician_id == current_user.id).all()
-    return orders
+    return await list_orders(db, [Order.technician_id == principal.technician_id], page, request, response, fields)
 
 # Получение заказов для клиента
 @router.get("/my", response_model=List[OrderOut], dependencies=[Depends(role_required([UserRole.client]))])
 async def get_my_orders(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    page: KeysetPage = Depends(order_page),
+    fields: Optional[List[str]] = Depends(order_fields),
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal)
 ):
-    # Получаем профиль клиента
-    client = db.query(Client).filter(Client.user_id == current_user.id).first()
-    if not client:
+    # Профиль клиента берем из claim токена
+    if principal.client_id is None:
         raise HTTPException(status_code=400, detail="Client profile not found")  # Переведено на английский
 
-    orders = db.query(Order).filter(Order.client_id == client.id).all()
-    return orders
+    return await list_orders(db, [Order.client_id == principal.client_id], page, request, response, fields)
 
 # 3. Получение деталей заказа
 @router.get("/{order_id}", response_model=OrderOut, dependencies=[Depends(role_required([UserRole.admin, UserRole.technician, UserRole.client]))])
 async def get_order_detail(
     order_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal)
 ):
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
+    # Сначала легкий запрос версии: права доступа и ETag проверяются без загрузки заказа со связями
+    version = (await db.execute(order_version_query(order_id))).first()
+    if not version:
         raise HTTPException(status_code=404, detail="Order not found")  # Переведено на английский
 
     # Проверка прав доступа
-    if current_user.role == UserRole.admin:
+    if principal.role == UserRole.admin:
         pass  # Админ имеет доступ ко всем заказам
-    elif current_user.role == UserRole.technician and current_user.id != order.technician_id:
+    elif principal.role == UserRole.technician and principal.technician_id != version.technician_id:
         raise HTTPException(status_code=403, detail="You do not have permission to view this order")  # Переведено на английский
-    elif current_user.role == UserRole.client:
-        client = db.query(Client).filter(Client.user_id == current_user.id).first()
-        if not client or client.id != order.client_id:
+    elif principal.role == UserRole.client:
+        if principal.client_id is None or principal.client_id != version.client_id:
             raise HTTPException(status_code=403, detail="You do not have permission to view this order")  # Переведено на английский
 
+    etag = make_etag("order", order_id, *version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    order = await get_order_or_none(db, order_id, *ORDER_OUT_OPTIONS)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")  # Переведено на английский
+    set_etag(response, etag)
     return order
 
 # 4. Обновление заказа
@@ -150,18 +352,18 @@ async def get_order_detail(
 async def update_order(
     order_id: int,
     order_update: OrderUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal)
 ):
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await get_order_or_none(db, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")  # Переведено на английский
 
     # Проверка прав доступа
-    if current_user.role == UserRole.admin:
+    if principal.role == UserRole.admin:
         pass  # Админ может обновлять любой заказ
-    elif current_user.role == UserRole.technician:
-        if current_user.id != order.technician_id:
+    elif principal.role == UserRole.technician:
+        if principal.user_id != order.technician_id:
             raise HTTPException(status_code=403, detail="You do not have permission to update this order")  # Переведено на английский
         # Техник может обновлять только определенные поля
         allowed_fields = {'status', 'actual_start_time', 'actual_end_time'}
@@ -173,6 +375,7 @@ async def update_order(
         raise HTTPException(status_code=403, detail="You do not have permission to update this order")  # Переведено на английский
 
     # Обновление полей заказа
+    previous_status = order.status
     for key, value in order_update.dict(exclude_unset=True).items():
         setattr(order, key, value)
 
@@ -180,33 +383,35 @@ async def update_order(
     if any(field in order_update.dict(exclude_unset=True) for field in ['materials_cost', 'labor_cost', 'equipment_cost']):
         order.total_cost = (order.materials_cost or 0) + (order.labor_cost or 0) + (order.equipment_cost or 0)
 
-    db.commit()
-    db.refresh(order)
-    return order
+    # Смена статуса через общий PUT попадает в outbox так же, как через /status
+    if order.status != previous_status:
+        record_order_event(db, ORDER_STATUS_CHANGED, order, previous_status)
+    await db.commit()
+    return await get_order_or_none(db, order_id, *ORDER_OUT_OPTIONS)
 
 # 5. Отмена заказа клиентом
 @router.put("/{order_id}/cancel", response_model=OrderOut, dependencies=[Depends(role_required([UserRole.client]))])
 async def cancel_order(
     order_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal)
 ):
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await get_order_or_none(db, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")  # Переведено на английский
 
     # Проверка, что заказ принадлежит текущему клиенту
-    client = db.query(Client).filter(Client.user_id == current_user.id).first()
-    if not client or client.id != order.client_id:
+    if principal.client_id is None or principal.client_id != order.client_id:
         raise HTTPException(status_code=403, detail="You cannot cancel this order")  # Переведено на английский
 
     if order.status in ['completed', 'cancelled']:
         raise HTTPException(status_code=400, detail="This order cannot be cancelled")  # Переведено на английский
 
+    previous_status = order.status
     order.status = 'cancelled'
-    db.commit()
-    db.refresh(order)
-    return order
+    record_order_event(db, ORDER_CANCELLED, order, previous_status)
+    await db.commit()
+    return await get_order_or_none(db, order_id, *ORDER_OUT_OPTIONS)
 
 
 # 6. Обновление статуса заказа
@@ -214,23 +419,24 @@ async def cancel_order(
 async def update_order_status(
     order_id: int,
     status_update: StatusUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal)
 ):
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await get_order_or_none(db, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")  # Переведено на английский
 
     # Проверка прав доступа
-    if current_user.role == UserRole.admin:
+    if principal.role == UserRole.admin:
         pass  # Админ может обновлять статус любого заказа
-    elif current_user.role == UserRole.technician:
-        if current_user.id != order.technician_id:
+    elif principal.role == UserRole.technician:
+        if principal.user_id != order.technician_id:
             raise HTTPException(status_code=403, detail="You do not have permission to update this order")  # Переведено на английский
     else:
         raise HTTPException(status_code=403, detail="You do not have permission to update this order")  # Переведено на английский
 
     # Обновление статуса заказа
+    previous_status = order.status
     order.status = status_update.status
 
     if status_update.status == 'in_progress':
@@ -238,31 +444,123 @@ async def update_order_status(
     elif status_update.status == 'completed':
         order.actual_end_time = status_update.actual_end_time or datetime.utcnow()
 
-    db.commit()
-    db.refresh(order)
-    return order
+    # Событие пишется в той же транзакции, что и новый статус
+    record_order_event(db, ORDER_STATUS_CHANGED, order, previous_status)
+    await db.commit()
+    return await get_order_or_none(db, order_id, *ORDER_OUT_OPTIONS)
 
 # 7. Назначение техника на заказ
 @router.post("/{order_id}/assign-technician", response_model=OrderOut, dependencies=[Depends(role_required([UserRole.admin]))])
 async def assign_technician(
     order_id: int,
     technician_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    order = db.query(Order).filter(Order.id == order_id).first()
-    technician = db.query(User).filter(User.id == technician_id, User.role == UserRole.technician).first()
+    order = await get_order_or_none(db, order_id)
+    technician = (await db.execute(
+        select(User).where(User.id == technician_id, User.role == UserRole.technician)
+    )).scalars().first()
 
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")  # Переведено на английский
     if not technician:
         raise HTTPException(status_code=404, detail="Technician not found")  # Переведено на английский
 
+    previous_status = order.status
     order.technician_id = technician_id
     order.status = "assigned"
-    db.commit()
-    db.refresh(order)
+    record_order_event(db, ORDER_TECHNICIAN_ASSIGNED, order, previous_status)
+    await db.commit()
+
+    return await get_order_or_none(db, order_id, *ORDER_OUT_OPTIONS)
+
+# Значения UPDATE для элемента пакета: та же семантика, что у /status и /assign-technician
+def batch_item_values(item: OrderBatchItem, now: datetime) -> dict:
+    values = {}
+    if item.technician_id is not None:
+        values["technician_id"] = item.technician_id
+    values["status"] = item.status or "assigned"
+    if values["status"] == "in_progress":
+        values["actual_start_time"] = item.actual_start_time or now
+    elif values["status"] == "completed":
+        values["actual_end_time"] = item.actual_end_time or now
+    return values
+
+# Пакетное изменение статусов и назначений техников (закрытие дня диспетчером)
+@router.post("/batch-update", response_model=OrderBatchResult, dependencies=[Depends(role_required([UserRole.admin, UserRole.dispatcher]))])
+async def batch_update_orders(
+    batch: OrderBatchUpdate,
+    db: AsyncSession = Depends(get_async_db)
+):
+    items = batch.items
+    if len(items) > settings.ORDER_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Не более {settings.ORDER_BATCH_MAX_ITEMS} изменений за один запрос")
+
+    # Строки блокируются в порядке id до конца транзакции, чтобы previous_status в событиях был точным
+    order_ids = {item.order_id for item in items}
+    locked = (await db.execute(
+        select(Order.id, Order.status, Order.created_at).where(Order.id.in_(order_ids)).order_by(Order.id).with_for_update()
+    )).all() if order_ids else []
+    previous_status = {row.id: row.status for row in locked}
+    created_at = {row.id: row.created_at for row in locked}
+    technician_ids = {item.technician_id for item in items if item.technician_id is not None}
+    technicians = set((await db.execute(
+        select(User.id).where(User.id.in_(technician_ids), User.role == UserRole.technician)
+    )).scalars()) if technician_ids else set()
+
+    # Одинаковые изменения объединяются в один UPDATE ... WHERE id IN (...)
+    now = datetime.utcnow()
+    results = []
+    groups = defaultdict(list)
+    seen = set()
+    for index, item in enumerate(items):
+        error = None
+        if item.order_id in seen:
+            error = "Duplicate order_id in batch"
+        elif item.order_id not in previous_status:
+            error = "Order not found"
+        elif item.status is None and item.technician_id is None:
+            error = "Either status or technician_id is required"
+        elif item.technician_id is not None and item.technician_id not in technicians:
+            error = "Technician not found"
+        seen.add(item.order_id)
+        if error:
+            results.append(OrderBatchItemResult(order_id=item.order_id, ok=False, error=error))
+            continue
+        results.append(None)
+        groups[tuple(sorted(batch_item_values(item, now).items()))].append(index)
+
+    status_deltas = Counter()
+    try:
+        for values, indexes in groups.items():
+            values = dict(values)
+            # updated_at задаем явно: от него зависят ETag заказов
+            result = await db.execute(
+                update(Order)
+                .where(Order.id.in_([items[index].order_id for index in indexes]))
+                .values(**values, updated_at=now)
+                .returning(Order.id, Order.client_id, Order.technician_id, Order.status)
+                .execution_options(synchronize_session=False)
+            )
+            rows = {row.id: row for row in result}
+            event_type = ORDER_TECHNICIAN_ASSIGNED if "technician_id" in values else ORDER_STATUS_CHANGED
+            for index in indexes:
+                row = rows[items[index].order_id]
+                record_order_event(db, event_type, row, previous_status[row.id])
+                status_deltas[counter_key("order", created_at[row.id], previous_status[row.id])] -= 1
+                status_deltas[counter_key("order", created_at[row.id], row.status)] += 1
+                results[index] = OrderBatchItemResult(
+                    order_id=row.id, ok=True, status=row.status, technician_id=row.technician_id
+                )
+        # UPDATE ... WHERE id IN идет в обход ORM flush, поэтому счетчики статусов меняем явно
+        status_deltas.pop(None, None)
+        await add_status_deltas(db, status_deltas)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=f"Не удалось обновить заказы: {str(e)}")
 
-    return order
+    return {"updated": sum(len(indexes) for indexes in groups.values()), "results": results}
 
 # 8. Загрузка медиафайлов с улучшенной обработкой ошибок
 @router.post("/{order_id}/upload", response_model=MediaOut, dependencies=[Depends(role_required([UserRole.admin, UserRole.technician, UserRole.client]))])
@@ -270,8 +568,8 @@ async def upload_media(
     order_id: int,
     file_type: str,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal)
 ):
     allowed_mime_types = {
         'photo': ['image/jpeg', 'image/png', 'image/gif'],
@@ -288,16 +586,15 @@ async def upload_media(
     MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
 
     # Проверяем, что заказ существует
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = await get_order_or_none(db, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")  # Переведено на английский
 
     # Проверка прав доступа
-    if current_user.role == UserRole.client:
-        client = db.query(Client).filter(Client.user_id == current_user.id).first()
-        if not client or client.id != order.client_id:
+    if principal.role == UserRole.client:
+        if principal.client_id is None or principal.client_id != order.client_id:
             raise HTTPException(status_code=403, detail="You cannot upload files for this order")  # Переведено на английский
-    if current_user.role == UserRole.technician and current_user.id != order.technician_id:
+    if principal.role == UserRole.technician and principal.technician_id != order.technician_id:
         raise HTTPException(status_code=403, detail="You cannot upload files for this order")  # Переведено на английский
 
     # Обработка сохранения файла с улучшенной обработкой ошибок
@@ -325,8 +622,8 @@ async def upload_media(
         # Создание записи в базе данных
         new_media = Media(order_id=order_id, file_type=file_type, file_path=file_path)
         db.add(new_media)
-        db.commit()
-        db.refresh(new_media)
+        await db.commit()
+        await db.refresh(new_media)
 
         return new_media
     except HTTPException as he:
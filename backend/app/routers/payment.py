@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.schemas.payment import PaymentCreate, PaymentOut
 from app.models.payment import Payment as PaymentModel
@@ -63,6 +64,9 @@ def get_payment(
 
     return payment
 
+def order_payments_query(order_id: int):
+    return select(PaymentModel).where(PaymentModel.order_id == order_id)
+
 @router.get("/orders/{order_id}/payments", response_model=List[PaymentOut], dependencies=[Depends(role_required([UserRole.admin, UserRole.client]))])
 def get_payments_by_order(
     order_id: int,
@@ -77,6 +81,6 @@ def get_payments_by_order(
     if current_user.role == UserRole.client and current_user.id != order.client_id:
         raise HTTPException(status_code=403, detail="У вас нет прав доступа к этому заказу")
 
-    payments = db.query(PaymentModel).filter(PaymentModel.order_id == order_id).all()
+    payments = db.execute(order_payments_query(order_id)).scalars().all()
     return payments
 
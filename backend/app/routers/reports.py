@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import Float, func, and_, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import GenericFunction
 from datetime import datetime, timedelta
 from typing import List
 
@@ -21,8 +23,8 @@ from app.models.order import Order
 from app.models.media import Media
 from app.models.user import User
 from app.models.client import Client
-from app.models.estimate import Estimate
-from app.dependencies import get_db, get_current_user, role_required
+from app.db.counters import status_counts
+from app.dependencies import get_db, get_read_db, get_current_user, role_required
 from app.enums import UserRole
 
 router = APIRouter(
@@ -31,41 +33,73 @@ router = APIRouter(
 )
 
 
+class days_between(GenericFunction):
+    # Разница двух моментов в днях: julianday в SQLite, эпоха в секундах в PostgreSQL
+    type = Float()
+    inherit_cache = True
 
-#1. GET /api/employees — Получить список сотрудников
-@router.get("/employees", response_model=List[UserOut], dependencies=[Depends(role_required([UserRole.admin, UserRole.finance]))])
-async def get_employees(db: Session = Depends(get_db)):
-    employees = db.query(User).filter(User.role == UserRole.technician).all()
-    return employees
 
-#2. GET /api/reports/employee-performance — Производительность сотрудников
-@router.get("/employee-performance", response_model=List[EmployeePerformanceOut], dependencies=[Depends(role_required([UserRole.admin, UserRole.finance]))])
-async def get_employee_performance(
-    employee_id: int = None,
-    start_date: datetime = None,
-    end_date: datetime = None,
-    db: Session = Depends(get_db)
-):
-    query = db.query(
+@compiles(days_between)
+def _days_between(element, compiler, **kw):
+    end, start = list(element.clauses)
+    return f"(julianday({compiler.process(end, **kw)}) - julianday({compiler.process(start, **kw)}))"
+
+
+@compiles(days_between, "postgresql")
+def _days_between_postgresql(element, compiler, **kw):
+    end, start = list(element.clauses)
+    return f"(EXTRACT(EPOCH FROM ({compiler.process(end, **kw)} - {compiler.process(start, **kw)})) / 86400)"
+
+
+# Запросы отчетов вынесены в функции: их же проверяет scripts/check_indexes.py
+def employee_performance_query(employee_id: int = None, start_date: datetime = None, end_date: datetime = None):
+    query = select(
         User.id.label('employee_id'),
         User.name.label('employee_name'),
         func.count(Order.id).label('completed_tasks'),
-        func.avg(func.julianday(Order.actual_end_time) - func.julianday(Order.actual_start_time)).label('average_completion_time')
-    ).join(Order, Order.technician_id == User.id).filter(Order.status == 'completed')
+        func.avg(days_between(Order.actual_end_time, Order.actual_start_time)).label('average_completion_time')
+    ).join(Order, Order.technician_id == User.id).where(Order.status == 'completed')
 
     if employee_id:
-        query = query.filter(User.id == employee_id)
+        query = query.where(User.id == employee_id)
 
     if start_date and end_date:
-        query = query.filter(
+        query = query.where(
             and_(
                 Order.actual_end_time >= start_date,
                 Order.actual_end_time <= end_date
             )
         )
 
-    query = query.group_by(User.id)
-    results = query.all()
+    return query.group_by(User.id)
+
+
+def revenue_query(start_date: datetime, end_date: datetime):
+    return select(func.sum(Order.total_cost)).where(Order.created_at.between(start_date, end_date))
+
+
+def active_clients_query(since: datetime):
+    # Клиенты с заказами после since
+    clients = select(Client.id).join(Order).where(Order.created_at >= since).distinct()
+    return select(func.count()).select_from(clients.subquery())
+
+
+
+#1. GET /api/employees — Получить список сотрудников
+@router.get("/employees", response_model=List[UserOut], dependencies=[Depends(role_required([UserRole.admin, UserRole.finance]))])
+async def get_employees(db: Session = Depends(get_read_db)):
+    employees = db.query(User).filter(User.role == UserRole.technician).all()
+    return employees
+
+#2. GET /api/reports/employee-performance — Производительность сотрудников
+@router.get("/employee-performance", response_model=List[EmployeePerformanceOut], dependencies=[Depends(role_required([UserRole.admin, UserRole.finance]))])
+async def get_employee_performance(
+    employee_id: int = None,
+    start_date: datetime = None,
+    end_date: datetime = None,
+    db: Session = Depends(get_read_db)
+):
+    results = db.execute(employee_performance_query(employee_id, start_date, end_date)).all()
 
     performance_data = [
         EmployeePerformanceOut(
@@ -83,7 +117,7 @@ async def get_employee_performance(
 @router.get("/financial", response_model=FinancialReportOut, dependencies=[Depends(role_required([UserRole.admin, UserRole.finance]))])
 async def get_financial_reports(
     period: str = 'monthly',
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     end_date = datetime.utcnow()
     if period == 'daily':
@@ -95,28 +129,16 @@ async def get_financial_reports(
     else:
         raise HTTPException(status_code=400, detail="Invalid period")
 
-    total_revenue = db.query(func.sum(Order.total_cost)).filter(Order.created_at.between(start_date, end_date)).scalar() or 0
+    total_revenue = db.execute(revenue_query(start_date, end_date)).scalar() or 0
 
-    paid_orders = db.query(func.count(Order.id)).filter(
-        Order.status == 'paid',
-        Order.created_at.between(start_date, end_date)
-    ).scalar() or 0
-
-    overdue_orders = db.query(func.count(Order.id)).filter(
-        Order.status == 'overdue',
-        Order.created_at.between(start_date, end_date)
-    ).scalar() or 0
-
-    pending_orders = db.query(func.count(Order.id)).filter(
-        Order.status == 'pending',
-        Order.created_at.between(start_date, end_date)
-    ).scalar() or 0
+    # Количества по статусам — из счетчиков по дням создания, без COUNT(*) по orders
+    counts = status_counts(db, "order", ['paid', 'overdue', 'pending'], start_date.date(), end_date.date())
 
     financial_data = FinancialReportOut(
         total_revenue=total_revenue,
-        paid_orders=paid_orders,
-        overdue_orders=overdue_orders,
-        pending_orders=pending_orders
+        paid_orders=counts['paid'],
+        overdue_orders=counts['overdue'],
+        pending_orders=counts['pending']
     )
 
     return financial_data
@@ -126,13 +148,13 @@ async def get_financial_reports(
 async def get_workload_analysis(
     start_date: datetime = None,
     end_date: datetime = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     query = db.query(
         User.id.label('employee_id'),
         User.name.label('employee_name'),
         func.count(Order.id).label('task_count'),
-        func.avg(func.julianday(Order.actual_end_time) - func.julianday(Order.actual_start_time)).label('average_completion_time')
+        func.avg(days_between(Order.actual_end_time, Order.actual_start_time)).label('average_completion_time')
     ).join(Order, Order.technician_id == User.id)
 
     if start_date and end_date:
@@ -157,7 +179,7 @@ async def get_workload_analysis(
 
 #5. GET /api/reports/clients — Отчётность по клиентам
 @router.get("/clients", response_model=List[ClientReportOut], dependencies=[Depends(role_required([UserRole.admin, UserRole.finance]))])
-async def get_client_reports(db: Session = Depends(get_db)):
+async def get_client_reports(db: Session = Depends(get_read_db)):
     total_clients = db.query(func.count(Client.id)).scalar() or 0
 
     new_clients = db.query(func.count(Client.id)).filter(
@@ -177,10 +199,11 @@ async def get_client_reports(db: Session = Depends(get_db)):
 
 #6. GET /api/reports/orders — Отчёты по заказам
 @router.get("/orders", response_model=OrderReportOut, dependencies=[Depends(role_required([UserRole.admin, UserRole.finance]))])
-async def get_order_reports(db: Session = Depends(get_db)):
-    completed = db.query(func.count(Order.id)).filter(Order.status == 'completed').scalar() or 0
-    active = db.query(func.count(Order.id)).filter(Order.status == 'active').scalar() or 0
-    cancelled = db.query(func.count(Order.id)).filter(Order.status == 'cancelled').scalar() or 0
+async def get_order_reports(db: Session = Depends(get_read_db)):
+    counts = status_counts(db, "order", ['completed', 'active', 'cancelled'])
+    completed = counts['completed']
+    active = counts['active']
+    cancelled = counts['cancelled']
 
     average_order_value = db.query(func.avg(Order.total_cost)).scalar() or 0.0
 
@@ -199,7 +222,7 @@ async def get_order_reports(db: Session = Depends(get_db)):
 
 #7. GET /api/reports/kpi — Аналитика и KPI
 @router.get("/kpi", response_model=KPIReportOut, dependencies=[Depends(role_required([UserRole.admin, UserRole.finance]))])
-async def get_kpi(db: Session = Depends(get_db)):
+async def get_kpi(db: Session = Depends(get_read_db)):
     # Средний доход на сотрудника
     total_revenue = db.query(func.sum(Order.total_cost)).scalar() or 0.0
     technician_count = db.query(func.count(User.id)).filter(User.role == UserRole.technician).scalar() or 1
@@ -207,14 +230,13 @@ async def get_kpi(db: Session = Depends(get_db)):
 
     # Показатель удержания клиентов
     total_clients = db.query(func.count(Client.id)).scalar() or 1
-    clients_with_orders = db.query(Client).join(Order).filter(
-        Order.created_at >= datetime.utcnow() - timedelta(days=30)
-    ).distinct().count()
+    clients_with_orders = db.execute(active_clients_query(datetime.utcnow() - timedelta(days=30))).scalar()
     client_retention = (clients_with_orders / total_clients) * 100
 
     # Коэффициент конверсии (например, одобренные сметы к общему числу смет)
-    total_estimates = db.query(func.count(Estimate.id)).scalar() or 1
-    approved_estimates = db.query(func.count(Estimate.id)).filter(Estimate.status == 'approved').scalar() or 0
+    estimate_counts = status_counts(db, "estimate")
+    total_estimates = sum(estimate_counts.values()) or 1
+    approved_estimates = estimate_counts.get('approved', 0)
     conversion_rate = (approved_estimates / total_estimates) * 100
 
     kpi_data = KPIReportOut(
@@ -276,7 +298,7 @@ async def create_report(
 
 @router.get("/", response_model=List[ReportOut], dependencies=[Depends(role_required([UserRole.admin, UserRole.marketer]))])
 async def get_reports(
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     reports = db.query(Report).all()
     return reports
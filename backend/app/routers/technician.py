@@ -1,48 +1,107 @@
 #app/routers/technicians.py
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from geopy.distance import geodesic
-from app.dependencies import get_db, get_current_user
+from app.dependencies import get_async_db, get_principal
+from app.core.principal import Principal
+from app.core.location_store import LatestLocation, location_store
+from app.core.location_hub import location_hub, location_events
+from app.db.locations import prepare_fixes, append_location_history
+from app.core.config import settings
+from app.core.identity_cache import invalidate_identity_async
+from app.core.technician_index import technician_index, position_notify, index_technician
 from app.models.user import User
 from app.models.order import Order
 from app.schemas.user import UserUpdate, UserOut
-from datetime import datetime
-from typing import List
-from pydantic import BaseModel
+from datetime import datetime, timezone
+from typing import List, Optional
+from pydantic import BaseModel, Field, validator
 from app.enums import UserRole
-from app.dependencies import get_current_user, role_required
+from app.dependencies import role_required
 
 router = APIRouter(
     prefix="/technicians",
     tags=["technicians"]
 )
 
+def naive_utc(v: datetime) -> datetime:
+    # Колонки DateTime без часового пояса хранят UTC
+    return v.astimezone(timezone.utc).replace(tzinfo=None) if v.tzinfo else v
+
 class TechnicianLocationUpdate(BaseModel):
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+    updated_at: datetime
+
+    _updated_at_utc = validator('updated_at', allow_reuse=True)(naive_utc)
+
+class LocationFix(BaseModel):
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+    recorded_at: datetime
+    accuracy: Optional[float] = Field(None, ge=0, description="Accuracy in meters")
+
+    _recorded_at_utc = validator('recorded_at', allow_reuse=True)(naive_utc)
+
+class LocationBatch(BaseModel):
+    fixes: List[LocationFix]
+
+class NearbyTechnicianOut(BaseModel):
+    technician_id: int
+    distance_km: float
     latitude: float
     longitude: float
-    updated_at: datetime
+    status: Optional[str] = None
+    updated_at: Optional[datetime] = None
+
+async def get_technician_or_none(db: AsyncSession, technician_id: int):
+    result = await db.execute(select(User).where(User.id == technician_id, User.role == UserRole.technician))
+    return result.scalars().first()
 
 @router.get("/", response_model=List[UserOut], dependencies=[Depends(role_required([UserRole.admin, UserRole.dispatcher]))])
 async def list_technicians(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Доступ только для админа и диспетчера
-    technicians = db.query(User).filter(User.role == UserRole.technician).all()
-    return technicians
+    result = await db.execute(select(User).where(User.role == UserRole.technician))
+    return result.scalars().all()
+
+# Ближайшие к точке техники по пространственному индексу (k-кольцо ячеек H3 вокруг точки)
+@router.get("/nearby", response_model=List[NearbyTechnicianOut], dependencies=[Depends(role_required([UserRole.admin, UserRole.dispatcher]))])
+async def get_nearby_technicians(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius: float = Query(settings.NEARBY_RADIUS_KM_DEFAULT, gt=0, le=settings.NEARBY_RADIUS_KM_MAX, description="Radius in km"),
+    status: Optional[List[str]] = Query(None, description="Only technicians with these statuses"),
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+):
+    return [
+        NearbyTechnicianOut(
+            technician_id=position.technician_id,
+            distance_km=round(distance, 3),
+            latitude=position.latitude,
+            longitude=position.longitude,
+            status=position.status,
+            updated_at=position.updated_at,
+        )
+        for distance, position in technician_index.nearby(lat, lng, radius, status, limit)
+    ]
 
 @router.get("/{technician_id}", response_model=UserOut, dependencies=[Depends(role_required([UserRole.admin, UserRole.dispatcher, UserRole.technician]))])
 async def get_technician(
     technician_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal)
 ):
-    technician = db.query(User).filter(User.id == technician_id, User.role == UserRole.technician).first()
+    technician = await get_technician_or_none(db, technician_id)
     if not technician:
         raise HTTPException(status_code=404, detail="Техник не найден")
 
     # Техник может видеть только себя, админ и диспетчер - любого
-    if current_user.role == UserRole.technician and current_user.id != technician_id:
+    if principal.role == UserRole.technician and principal.user_id != technician_id:
         raise HTTPException(status_code=403, detail="У вас нет прав для просмотра этого профиля")
 
     return technician
@@ -51,96 +110,173 @@ async def get_technician(
 async def update_technician(
     technician_id: int,
     technician_update: UserUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal)
 ):
-    if current_user.id != technician_id:
+    if principal.user_id != technician_id:
         raise HTTPException(status_code=403, detail="У вас нет прав для обновления профиля этого техника")
 
-    technician = db.query(User).filter(User.id == technician_id, User.role == UserRole.technician).first()
+    technician = await get_technician_or_none(db, technician_id)
     if not technician:
         raise HTTPException(status_code=404, detail="Техник не найден")
 
+    old_email = technician.email
     for key, value in technician_update.dict(exclude_unset=True).items():
         setattr(technician, key, value)
-    
-    db.commit()
-    db.refresh(technician)
+    await invalidate_identity_async(db, old_email, technician.email)
+    # Статус техника участвует в фильтре /nearby
+    if technician.latitude is not None and technician.longitude is not None:
+        notify = position_notify(
+            db, technician.id, technician.latitude, technician.longitude, technician.location_updated_at,
+            status=technician.status,
+        )
+        if notify is not None:
+            await db.execute(notify)
+    await db.commit()
+    await db.refresh(technician)
+    index_technician(technician)
     return technician
 
+# Принятые точки: журнал technician_locations, NOTIFY другим воркерам, затем хранилище последних координат
+async def accept_fixes(db: AsyncSession, technician_id: int, fixes: list) -> int:
+    stored = await append_location_history(db, technician_id, fixes)
+    latest = fixes[-1]
+    # Вне PostgreSQL NOTIFY нет: процесс один, локальных обновлений ниже достаточно
+    notify = position_notify(db, technician_id, latest.latitude, latest.longitude, latest.recorded_at)
+    if notify is not None:
+        await db.execute(notify)
+    await db.commit()
+    # users обновится фоновым сбросом хранилища, а не на каждый пинг
+    await location_store.record(technician_id, latest.latitude, latest.longitude, latest.recorded_at)
+    technician_index.update(technician_id, latest.latitude, latest.longitude, latest.recorded_at)
+    # Подписчики этого воркера получают точку сразу; остальные воркеры — по NOTIFY
+    location_hub.publish(LatestLocation(technician_id, latest.latitude, latest.longitude, latest.recorded_at))
+    return stored
+
+# Последние координаты: из хранилища, при промахе — из users
+async def technician_location_or_404(db: AsyncSession, technician_id: int) -> dict:
+    location = await location_store.get(technician_id)
+    if location is not None:
+        return location.as_dict()
+    technician = await get_technician_or_none(db, technician_id)
+    if not technician:
+        raise HTTPException(status_code=404, detail="Техник не найден")
+    if technician.location_updated_at is None:
+        raise HTTPException(status_code=404, detail="Местоположение техника неизвестно")
+    return {
+        "technician_id": technician.id,
+        "latitude": technician.latitude,
+        "longitude": technician.longitude,
+        "updated_at": technician.location_updated_at.isoformat()
+    }
+
 @router.post("/{technician_id}/location", response_model=dict, dependencies=[Depends(role_required([UserRole.technician]))])
 async def update_technician_location(
     technician_id: int,
     location_update: TechnicianLocationUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal)
 ):
-    if current_user.id != technician_id:
+    # Роль техника и id берем из токена: пинг не читает users
+    if principal.user_id != technician_id:
         raise HTTPException(status_code=403, detail="У вас нет прав для обновления местоположения этого техника")
-    
-    technician = db.query(User).filter(User.id == technician_id, User.role == UserRole.technician).first()
-    if not technician:
-        raise HTTPException(status_code=404, detail="Техник не найден")
-    
-    technician.latitude = location_update.latitude
-    technician.longitude = location_update.longitude
-    technician.location_updated_at = location_update.updated_at
-    
-    db.commit()
-    db.refresh(technician)
-    
+
+    # Тот же фильтр, что и для пачек: точка из будущего навсегда заморозила бы позицию техника
+    fixes = prepare_fixes([LocationFix(
+        latitude=location_update.latitude,
+        longitude=location_update.longitude,
+        recorded_at=location_update.updated_at,
+    )])
+    if not fixes:
+        return {"message": "Время точки в будущем, местоположение не обновлено.", "location": None}
+
+    fix = fixes[0]
+    await accept_fixes(db, technician_id, fixes)
+
     return {
         "message": "Местоположение обновлено.",
         "location": {
-            "technician_id": technician.id,
-            "latitude": technician.latitude,
-            "longitude": technician.longitude,
-            "updated_at": technician.location_updated_at.isoformat()
+            "technician_id": technician_id,
+            "latitude": fix.latitude,
+            "longitude": fix.longitude,
+            "updated_at": fix.recorded_at.isoformat()
         }
     }
 
-@router.get("/{technician_id}/location", response_model=dict, dependencies=[Depends(role_required([UserRole.admin, UserRole.dispatcher, UserRole.technician]))])
-async def get_technician_location(
+# Пакетная загрузка GPS-точек: журнал пишется одним INSERT, последняя точка идет в хранилище
+@router.post("/{technician_id}/locations", response_model=dict, dependencies=[Depends(role_required([UserRole.technician]))])
+async def ingest_technician_locations(
     technician_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    batch: LocationBatch,
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal)
 ):
-    technician = db.query(User).filter(User.id == technician_id, User.role == UserRole.technician).first()
-    if not technician:
-        raise HTTPException(status_code=404, detail="Техник не найден")
+    if principal.user_id != technician_id:
+        raise HTTPException(status_code=403, detail="У вас нет прав для обновления местоположения этого техника")
+    if len(batch.fixes) > settings.TECHNICIAN_LOCATION_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"Не более {settings.TECHNICIAN_LOCATION_BATCH_MAX} точек за один запрос")
 
-    # Техник может видеть только свою локацию, админ и диспетчер - любую
-    if current_user.role == UserRole.technician and current_user.id != technician_id:
-        raise HTTPException(status_code=403, detail="У вас нет прав для просмотра местоположения этого техника")
-    
+    fixes = prepare_fixes(batch.fixes)
+    if not fixes:
+        return {"received": len(batch.fixes), "stored": 0, "location": None}
+
+    stored = await accept_fixes(db, technician_id, fixes)
     return {
-        "technician_id": technician.id,
-        "latitude": technician.latitude,
-        "longitude": technician.longitude,
-        "updated_at": technician.location_updated_at.isoformat()
+        "received": len(batch.fixes),
+        "stored": stored,
+        "location": (await location_store.get(technician_id)).as_dict()
     }
-@router.get("/orders/{order_id}/technician-location", dependencies=[Depends(role_required([UserRole.client]))])
-async def get_technician_location_for_order(
-    order_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+
+@router.get("/{technician_id}/location", response_model=dict, dependencies=[Depends(role_required([UserRole.admin, UserRole.dispatcher, UserRole.technician]))])
+async def get_technician_location(
+    technician_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal)
 ):
-    order = db.query(Order).filter(Order.id == order_id).first()
+    # Техник может видеть только свою локацию, админ и диспетчер - любую
+    if principal.role == UserRole.technician and principal.user_id != technician_id:
+        raise HTTPException(status_code=403, detail="У вас нет прав для просмотра местоположения этого техника")
+
+    return await technician_location_or_404(db, technician_id)
+
+# Техник заказа клиента (проверка владения заказом по claim cid)
+async def order_technician_id(db: AsyncSession, order_id: int, principal: Principal) -> int:
+    order = (await db.execute(
+        select(Order.client_id, Order.technician_id).where(Order.id == order_id)
+    )).first()
     if not order:
         raise HTTPException(status_code=404, detail="Заказ не найден")
-    if order.client_id != current_user.id:
+    # Заказ принадлежит профилю клиента, а не пользователю: сравниваем с claim cid
+    if principal.client_id is None or order.client_id != principal.client_id:
         raise HTTPException(status_code=403, detail="У вас нет прав доступа к этому заказу")
     if not order.technician_id:
         raise HTTPException(status_code=400, detail="К заказу не назначен техник")
-    
-    technician = db.query(User).filter(User.id == order.technician_id).first()
-    if not technician:
-        raise HTTPException(status_code=404, detail="Техник не найден")
-    
-    return {
-        "technician_id": technician.id,
-        "latitude": technician.latitude,
-        "longitude": technician.longitude,
-        "updated_at": technician.location_updated_at.isoformat()
-    }
+    return order.technician_id
+
+@router.get("/orders/{order_id}/technician-location", dependencies=[Depends(role_required([UserRole.client]))])
+async def get_technician_location_for_order(
+    order_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal)
+):
+    technician_id = await order_technician_id(db, order_id, principal)
+    return await technician_location_or_404(db, technician_id)
+
+# Поток координат техника по заказу (Server-Sent Events) вместо опроса эндпоинта выше
+@router.get("/orders/{order_id}/technician-location/stream", dependencies=[Depends(role_required([UserRole.client]))])
+async def stream_technician_location_for_order(
+    order_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_principal)
+):
+    technician_id = await order_technician_id(db, order_id, principal)
+    # Соединение с БД потоку не нужно: возвращаем его в пул, не дожидаясь конца ответа
+    await db.close()
 
+    if location_hub.full():
+        raise HTTPException(status_code=503, detail="Слишком много активных подписок, попробуйте позже")
+    return StreamingResponse(
+        location_events(technician_id, location_store.get),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -6,7 +6,8 @@ from app.schemas.user import UserOut, UserUpdate
 from app.models.user import User
 from app.dependencies import get_db, get_current_user, role_required
 from app.enums import UserRole
-from app.core.security import get_password_hash  # Добавляем импорт функции
+from app.core.hashing import password_hasher
+from app.core.identity_cache import invalidate_identity
 
 import logging
 
@@ -32,6 +33,7 @@ async def update_current_user(
     current_user: User = Depends(get_current_user)
 ):
     update_data = user_update.dict(exclude_unset=True)
+    old_email = current_user.email
 
     # Проверка на уникальность email, если пользователь пытается его изменить
     if 'email' in update_data and update_data['email'] != current_user.email:
@@ -41,9 +43,10 @@ async def update_current_user(
 
     for key, value in update_data.items():
         if key == 'password':
-            current_user.password_hash = get_password_hash(value)
+            current_user.password_hash = await password_hasher.hash(value)
         else:
             setattr(current_user, key, value)
+    invalidate_identity(db, old_email, current_user.email)
     db.commit()
     db.refresh(current_user)
     logger.info("User info updated for email: %s", current_user.email)
@@ -0,0 +1,81 @@
+# schemas/monitoring.py
+
+from pydantic import BaseModel
+from typing import List, Optional
+
+# Статистика пула соединений одного движка
+class PoolStatsOut(BaseModel):
+    pool_size: int
+    checked_out: int
+    checked_in: int
+    overflow: int
+    max_overflow: int
+    checkouts: int
+    timeouts: int
+    total_wait_ms: float
+    avg_wait_ms: float
+    max_wait_ms: float
+
+# Состояние read-реплики по последней проверке отставания
+class ReplicaStatusOut(BaseModel):
+    healthy: bool
+    lag_seconds: Optional[float] = None
+    max_lag_seconds: float
+    fresh: bool
+    last_error: Optional[str] = None
+
+class DatabasePoolsOut(BaseModel):
+    primary: PoolStatsOut
+    primary_async: PoolStatsOut
+    replica: Optional[PoolStatsOut] = None
+    replica_async: Optional[PoolStatsOut] = None
+    replica_status: Optional[ReplicaStatusOut] = None
+
+# Накопленная статистика запросов к БД по маршруту
+class RouteQueryStatsOut(BaseModel):
+    route: str
+    requests: int
+    queries: int
+    avg_queries: float
+    max_queries: int
+    avg_db_ms: float
+    max_db_ms: float
+    slowest_query_ms: float
+    slowest_statement: Optional[str] = None
+
+# Пул процессов для bcrypt
+class PasswordHasherStatsOut(BaseModel):
+    workers: int
+    rounds: int
+    pending: int
+    max_pending: int
+    completed: int
+    rejected: int
+    avg_ms: float
+    max_ms: float
+
+# Срабатывания ограничителя частоты запросов (в рамках текущего процесса)
+class RateLimitPolicyStatsOut(BaseModel):
+    policy: str
+    allowed: int
+    rejected: int
+
+class RateLimitStatsOut(BaseModel):
+    backend: str
+    inflight: int
+    max_inflight: int
+    shed: int
+    policies: List[RateLimitPolicyStatsOut]
+
+# Хранилище последних координат техников и пространственный индекс (в рамках текущего процесса)
+class LocationStoreStatsOut(BaseModel):
+    backend: str
+    technicians: Optional[int] = None  # для redis не считается
+    flushed: int
+    flush_failures: int
+    index_technicians: int
+    index_cells: int
+    index_resolution: int
+    stream_subscribers: int
+    stream_published: int
+    stream_rejected: int
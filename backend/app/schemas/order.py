@@ -22,6 +22,17 @@ class OrderBase(BaseModel):
 class OrderCreate(OrderBase):
     items: List[OrderItemCreate] = []  # Добавляем список позиций в заказ
 
+# Заказ для массового импорта (колл-центр): клиент указывается явно
+class OrderBulkItem(OrderCreate):
+    client_id: int
+
+class OrderBulkCreate(BaseModel):
+    orders: List[OrderBulkItem]
+
+class OrderBulkResult(BaseModel):
+    created: int
+    order_ids: List[int]
+
 class OrderUpdate(OrderBase):
     status: Optional[str] = Field(None, description="Статус заказа")
     technician_id: Optional[int] = Field(None, description="ID техника, назначенного на заказ")
@@ -51,4 +62,28 @@ class OrderOut(OrderBase):
     class Config:
         from_attributes = True
 class StatusUpdate(BaseModel):
-    status: str = Field(..., description="Статус заказа")
\ No newline at end of file
+    status: str = Field(..., description="Статус заказа")
+    actual_start_time: Optional[datetime] = None  # для in_progress; по умолчанию текущее время
+    actual_end_time: Optional[datetime] = None  # для completed; по умолчанию текущее время
+
+# Пакетное изменение статусов и назначений (закрытие дня диспетчером)
+class OrderBatchItem(BaseModel):
+    order_id: int
+    status: Optional[str] = Field(None, description="Новый статус; при назначении техника по умолчанию 'assigned'")
+    technician_id: Optional[int] = Field(None, description="ID техника для назначения")
+    actual_start_time: Optional[datetime] = None
+    actual_end_time: Optional[datetime] = None
+
+class OrderBatchUpdate(BaseModel):
+    items: List[OrderBatchItem]
+
+class OrderBatchItemResult(BaseModel):
+    order_id: int
+    ok: bool
+    status: Optional[str] = None
+    technician_id: Optional[int] = None
+    error: Optional[str] = None
+
+class OrderBatchResult(BaseModel):
+    updated: int
+    results: List[OrderBatchItemResult]
@@ -0,0 +1,135 @@
+"""Проверка, что горячие запросы роутеров используют индексы из миграции 6c515360552e.
+
+Запуск из каталога backend:
+
+    python -m scripts.check_indexes            # seq scan отключен: проверяем, что индекс применим
+    python -m scripts.check_indexes --real-plan  # план, который планировщик выбирает на текущих данных
+
+Для каждого запроса выполняется EXPLAIN (FORMAT JSON) и в плане ищется ожидаемый индекс.
+Код возврата 1, если хотя бы один запрос обходится без своего индекса.
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from app.core.config import settings
+from app.db.pagination import KeysetPage
+from app.db.search import postgres_match, postgres_trigram, search_terms
+from app.db.session import engine
+from app.enums import SortDirection, UserRole
+from app.routers.chat import messages_query
+from app.routers.estimate import estimates_query
+from app.routers.media import order_media_query
+from app.routers.notifications import notifications_query
+from app.routers.order import order_filters, order_list_query
+from app.routers.payment import order_payments_query
+from app.routers.reports import active_clients_query, employee_performance_query, revenue_query
+
+NOW = datetime.utcnow()
+MONTH_AGO = NOW - timedelta(days=30)
+
+
+def first_page(sort: str = "created_at") -> KeysetPage:
+    # Первая страница списка с параметрами по умолчанию, как в order_page
+    return KeysetPage(sort, SortDirection.desc, settings.PAGE_SIZE_DEFAULT, None, False)
+
+
+# Списки заказов сортируются по (created_at, id): индекс сортировки тоже подходит для keyset-страницы
+ORDER_PAGE_INDEXES = {"ix_orders_created_at_id"}
+
+# (описание, запрос, допустимые индексы). Запросы строятся теми же функциями, что и в роутерах,
+# поэтому проверяется реальный SQL: keyset ORDER BY/LIMIT, JOIN жадной загрузки, фильтры
+CHECKS = [
+    ("orders.get_assigned_orders",
+     order_list_query(order_filters(technician_id=1), first_page()),
+     {"ix_orders_technician_id_status"} | ORDER_PAGE_INDEXES),
+    ("orders.get_all_orders technician_id + status",
+     order_list_query(order_filters(technician_id=1, status="assigned"), first_page()),
+     {"ix_orders_technician_id_status"} | ORDER_PAGE_INDEXES),
+    ("orders.get_my_orders",
+     order_list_query(order_filters(client_id=1), first_page()),
+     {"ix_orders_client_id_created_at"}),
+    ("orders.get_all_orders status",
+     order_list_query(order_filters(status="pending"), first_page()),
+     {"ix_orders_status_created_at"}),
+    ("orders.get_all_orders start_date/end_date",
+     order_list_query(order_filters(start_date=MONTH_AGO, end_date=NOW), first_page("preferred_start_time")),
+     {"ix_orders_preferred_start_time_id"}),
+    ("orders.get_all_orders fields projection",
+     order_list_query(order_filters(status="pending"), first_page(), ["id", "status", "latitude", "longitude"]),
+     {"ix_orders_status_created_at"}),
+    ("orders.search_orders full text",
+     postgres_match(search_terms("main"), order_filters(status="pending"), settings.PAGE_SIZE_DEFAULT),
+     {"ix_orders_search_vector"}),
+    ("orders.search_orders address fragment",
+     postgres_trigram("main st", [], settings.PAGE_SIZE_DEFAULT),
+     {"ix_orders_address_trgm"}),
+    ("reports.get_financial_reports revenue",
+     revenue_query(MONTH_AGO, NOW),
+     {"ix_orders_created_at_id", "ix_orders_status_created_at"}),
+    ("reports.get_kpi client retention",
+     active_clients_query(MONTH_AGO),
+     {"ix_orders_created_at_id", "ix_orders_client_id_created_at"}),
+    ("reports.get_employee_performance",
+     employee_performance_query(1, MONTH_AGO, NOW),
+     {"ix_orders_completed_technician_id_end_time"}),
+    ("chat.get_messages",
+     messages_query(1),
+     {"ix_messages_conversation_id_sent_at"}),
+    ("notifications.get_notifications",
+     notifications_query(1),
+     {"ix_notifications_user_id_is_read", "ix_notifications_user_id_unread"}),
+    ("media.get_order_media",
+     order_media_query(1),
+     {"ix_media_order_id"}),
+    ("payments.get_payments_by_order",
+     order_payments_query(1),
+     {"ix_payments_order_id"}),
+    ("estimates.get_estimates client",
+     estimates_query(UserRole.client, 1),
+     {"ix_estimates_client_id"}),
+    ("estimates.get_estimates technician",
+     estimates_query(UserRole.technician, 1),
+     {"ix_estimates_technician_id"}),
+]
+
+
+def plan_indexes(plan: dict) -> set:
+    # Рекурсивно собираем имена индексов из всех узлов плана
+    found = set()
+    if "Index Name" in plan:
+        found.add(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        found |= plan_indexes(child)
+    return found
+
+
+def explain(connection, statement) -> set:
+    sql = str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    result = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    return plan_indexes(result[0]["Plan"])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--real-plan", action="store_true", help="не отключать seq scan")
+    args = parser.parse_args()
+
+    failures = 0
+    with engine.connect() as connection:
+        if not args.real_plan:
+            # На маленьких таблицах планировщик предпочитает seq scan; запрещаем его в пределах сессии
+            connection.execute(text("SET enable_seqscan = off"))
+        for name, statement, expected in CHECKS:
+            used = explain(connection, statement)
+            ok = bool(used & expected)
+            failures += not ok
+            print(f"[{'OK' if ok else 'FAIL'}] {name}: uses {sorted(used) or 'no index'}, expected one of {sorted(expected)}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
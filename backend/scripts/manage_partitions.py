@@ -0,0 +1,21 @@
+"""Создание будущих помесячных секций и архивирование старых (messages, notifications, technician_locations).
+
+То же самое приложение делает в фоне при старте; скрипт удобен для cron и ручного запуска
+из каталога backend:
+
+    python -m scripts.manage_partitions
+"""
+import logging
+
+from app.db.partitions import maintain_partitions
+from app.db.session import engine
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    for table, detached in maintain_partitions(engine).items():
+        print(f"{table}: partitions ensured, detached {detached or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
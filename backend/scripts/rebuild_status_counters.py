@@ -0,0 +1,23 @@
+"""Пересчет счетчиков статусов заказов и смет (status_counters) с нуля.
+
+Счетчики ведутся в тех же транзакциях, что и изменения статусов; скрипт нужен для ремонта
+после ручных правок orders/estimates в обход приложения. Запуск из каталога backend:
+
+    python -m scripts.rebuild_status_counters
+"""
+import logging
+
+from app.db.counters import rebuild_status_counters
+from app.db.session import engine
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    with engine.begin() as connection:
+        report = rebuild_status_counters(connection)
+    for entity, rows in report.items():
+        print(f"{entity}: {rows} counters")
+
+
+if __name__ == "__main__":
+    main()